@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+# Predicts locally with the flattened trees exported by the training sample
+# with --export-flat-trees, without deploying the model. It requires the
+# trainer package of the training sample, and MODEL_DIR set to a local copy
+# of the model directory, containing model.npz.
+
+import os
+import logging
+
+from trainer.flat_trees import FlatTreesPredictor
+
+logging.basicConfig()
+
+# In this sample, we will reply on 6 features only:
+# trip_miles            trip_seconds        fare
+# trip_start_month      trip_start_hour     trip_start_day
+instances = [
+    [1.1, 420, 625, 8, 16, 3],
+    [0.3, 960, 1485, 3, 22, 2],
+    [1.0, 300, 505, 1, 1, 1],
+]
+
+MODEL_DIR = os.getenv('MODEL_DIR')
+
+logging.info('MODEL_DIR: %s', MODEL_DIR)
+
+predictor = FlatTreesPredictor.from_path(MODEL_DIR)
+
+# Prints the probabilities of the positive class, as the deployed model.
+print(predictor.predict(instances))
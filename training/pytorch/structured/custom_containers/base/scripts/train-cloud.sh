@@ -32,8 +32,8 @@ JOB_NAME=custom_container_job_$(date +%Y%m%d_%H%M%S)
 # or use the default '`us-central1`'. The region is where the model will be deployed.
 REGION=us-central1
 
-# Build the docker image
-docker build -f Dockerfile -t ${IMAGE_URI} ./
+# Build the docker image, with the trainer package of the python_package sample
+docker build -f Dockerfile -t ${IMAGE_URI} ../../python_package
 
 # Deploy the docker image to Cloud Container Registry
 docker push ${IMAGE_URI}
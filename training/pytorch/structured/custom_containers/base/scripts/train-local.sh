@@ -25,8 +25,8 @@ IMAGE_TAG=taxi_pytorch
 # IMAGE_URI: the complete URI location for Cloud Container Registry
 IMAGE_URI=${IMAGE_REPO_NAME}:${IMAGE_TAG}
 
-# Build the docker image
-docker build -f Dockerfile -t ${IMAGE_URI} ./
+# Build the docker image, with the trainer package of the python_package sample
+docker build -f Dockerfile -t ${IMAGE_URI} ../../python_package
 
 # These variables are passed to the docker image
 # Note: these files have already been copied over when the image was built
@@ -0,0 +1,87 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compares the rows/sec of the `rows`, `columnar` and `streaming` dataset
+formats.
+
+Writes a synthetic, taxi-shaped csv file and iterates once over the training
+data loader returned by `inputs.load_data` for each dataset format.
+
+Run from the `python_package` directory:
+
+    python -m benchmarks.dataset_benchmark --num-rows 1000000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import torch
+
+from benchmarks.synthetic import write_synthetic_csv
+from trainer import inputs
+from trainer import task
+
+
+def benchmark(csv_file, dataset_format, batch_size, device):
+    """Loads `csv_file` and iterates once over the training data loader.
+
+    Returns:
+      A tuple with the load time (seconds) and the rows/sec of the epoch.
+    """
+    args = task.get_args([
+        '--train-files', csv_file,
+        '--eval-files', csv_file,
+        '--batch-size', str(batch_size),
+        '--dataset-format', dataset_format,
+        '--num-workers', '0',
+        '--no-pin-memory',
+    ] + (['--preload-to-device'] if device != 'cpu' else []))
+
+    start = time.time()
+    train_loader, _, _ = inputs.load_data(args, device)
+    load_time = time.time() - start
+
+    num_rows = 0
+    start = time.time()
+    for data in train_loader:
+        num_rows += data['target'].size(0)
+    return load_time, num_rows / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-rows', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    if torch.cuda.is_available():
+        device = torch.device('cuda:{}'.format(torch.cuda.current_device()))
+    else:
+        device = 'cpu'
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_file = os.path.join(tmp_dir, 'taxi_trips_train.csv')
+        write_synthetic_csv(csv_file, args.num_rows)
+
+        print('{:<10} {:>10} {:>14}'.format('format', 'load (s)', 'rows/sec'))
+        for dataset_format in ['rows', 'columnar', 'streaming']:
+            load_time, rows_per_sec = benchmark(
+                csv_file, dataset_format, args.batch_size, device)
+            print('{:<10} {:>10.2f} {:>14.0f}'.format(
+                dataset_format, load_time, rows_per_sec))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Performance regression benchmark of the trainer.
+
+Trains each configuration on synthetic, taxi-shaped data in a new process,
+and reports the time to load the data, the mean epoch time, the training
+rows/sec and the peak RSS of the process (and of its data loader workers).
+With --baseline, exits with an error if a configuration is slower, or uses
+more memory, than in the baseline results by more than --tolerance.
+
+Run from the `python_package` directory:
+
+    python -m benchmarks.epoch_benchmark --output baseline.json
+    # ... change the trainer ...
+    python -m benchmarks.epoch_benchmark --baseline baseline.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+
+import torch
+
+from benchmarks.synthetic import write_synthetic_shards
+from trainer import experiment
+from trainer import inputs
+from trainer import model
+from trainer import task
+
+# The trainer arguments of each configuration, in addition to the data files.
+CONFIGURATIONS = {
+    'rows': ['--dataset-format', 'rows'],
+    'columnar': ['--dataset-format', 'columnar'],
+    'columnar_float32': [
+        '--dataset-format', 'columnar', '--precision', 'float32'],
+    'streaming': ['--dataset-format', 'streaming'],
+    'rows_2_workers': ['--dataset-format', 'rows', '--num-workers', '2'],
+}
+
+# The metrics compared to the baseline, where higher is worse.
+REGRESSION_METRICS = ['epoch_time', 'peak_rss_mb']
+
+
+def _peak_rss_mb(who):
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(who).ru_maxrss / 1024.
+
+
+def _run_configuration(argv, num_epochs, results):
+    """Trains one configuration, and puts its metrics in the `results`
+    queue."""
+    args = task.get_args(argv)
+    if torch.cuda.is_available():
+        device = torch.device('cuda:{}'.format(torch.cuda.current_device()))
+    else:
+        device = 'cpu'
+    torch.manual_seed(args.seed)
+
+    start = time.time()
+    train_loader, _, _ = inputs.load_data(args, device)
+    load_time = time.time() - start
+    sequential_model, criterion, optimizer = model.create(args, device)
+
+    epoch_times = []
+    num_samples = 0
+    for epoch in range(1, num_epochs + 1):
+        start = time.time()
+        _, _, epoch_samples = experiment.train(
+            sequential_model, train_loader, criterion, optimizer, epoch,
+            precision=args.precision)
+        epoch_times.append(time.time() - start)
+        num_samples += epoch_samples
+
+    results.put({
+        'load_time': load_time,
+        'epoch_time': sum(epoch_times) / len(epoch_times),
+        'rows_per_sec': num_samples / sum(epoch_times),
+        'peak_rss_mb': _peak_rss_mb(resource.RUSAGE_SELF),
+        'peak_worker_rss_mb': _peak_rss_mb(resource.RUSAGE_CHILDREN),
+    })
+
+
+def run_configuration(argv, num_epochs):
+    """Trains one configuration in a new process, so its peak RSS doesn't
+    include the memory of the other configurations."""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(
+        target=_run_configuration, args=(argv, num_epochs, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def find_regressions(results, baseline, tolerance):
+    """Returns the (configuration, metric, value, baseline value) of the
+    metrics that are worse than the baseline by more than `tolerance`."""
+    regressions = []
+    for name, result in sorted(results.items()):
+        for metric in REGRESSION_METRICS:
+            if name not in baseline or metric not in baseline[name]:
+                continue
+            if result[metric] > baseline[name][metric] * (1 + tolerance):
+                regressions.append(
+                    (name, metric, result[metric], baseline[name][metric]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-rows', type=int, default=200000)
+    parser.add_argument('--num-shards', type=int, default=4)
+    parser.add_argument('--num-epochs', type=int, default=2)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--configurations', nargs='+',
+                        choices=sorted(CONFIGURATIONS),
+                        default=sorted(CONFIGURATIONS))
+    parser.add_argument('--output', help='Writes the results as json.')
+    parser.add_argument('--baseline',
+                        help='Compares the results to these json results.')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='The allowed relative regression.')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_files = write_synthetic_shards(
+            tmp_dir, args.num_rows, args.num_shards)
+        for name in args.configurations:
+            argv = (['--train-files'] + csv_files +
+                    ['--eval-files'] + csv_files[:1] +
+                    ['--batch-size', str(args.batch_size),
+                     '--num-workers', '0'] + CONFIGURATIONS[name])
+            results[name] = run_configuration(argv, args.num_epochs)
+
+    print('\n{:<18} {:>9} {:>10} {:>10} {:>10} {:>12}'.format(
+        'configuration', 'load (s)', 'epoch (s)', 'rows/sec', 'RSS (MB)',
+        'workers (MB)'))
+    for name, result in sorted(results.items()):
+        print('{:<18} {:>9.2f} {:>10.2f} {:>10.0f} {:>10.0f} {:>12.0f}'.format(
+            name, result['load_time'], result['epoch_time'],
+            result['rows_per_sec'], result['peak_rss_mb'],
+            result['peak_worker_rss_mb']))
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for name, metric, value, baseline_value in regressions:
+            print('REGRESSION: {} {}: {:.2f} (baseline: {:.2f})'.format(
+                name, metric, value, baseline_value))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compares the CPU inference latency of the eager, TorchScript, int8
+quantized and (with PyTorch 2.0 or later) `torch.compile` versions of the
+model, for batch sizes from 1 to 1024.
+
+Run from the `python_package` directory:
+
+    python -m benchmarks.inference_benchmark --model-path model.pth
+"""
+
+import argparse
+import time
+
+import torch
+
+from trainer import model
+
+
+def measure_latency(predict, features, num_iterations):
+    """Returns the median latency (milliseconds) of `predict(features)`."""
+    with torch.no_grad():
+        # Warm up, e.g. for the TorchScript profiling executor.
+        for _ in range(10):
+            predict(features)
+        latencies = []
+        for _ in range(num_iterations):
+            start = time.perf_counter()
+            predict(features)
+            latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return 1000 * latencies[len(latencies) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model-path',
+                        help='State dict of a trained model. Defaults to a '
+                             'model with random weights.')
+    parser.add_argument('--precision', choices=['float64', 'float32'],
+                        default='float64')
+    parser.add_argument('--batch-sizes', type=int, nargs='+',
+                        default=[1, 4, 16, 64, 256, 1024])
+    parser.add_argument('--num-iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    dtype = model.PRECISION_DTYPES[args.precision]
+    eager_model = model.SequentialDNN().to(dtype=dtype).eval()
+    if args.model_path:
+        eager_model.load_state_dict(
+            torch.load(args.model_path, map_location='cpu'))
+
+    versions = [
+        ('eager', eager_model, dtype),
+        ('scripted', model.script(eager_model), dtype),
+        ('int8', model.quantize(eager_model), torch.float32),
+    ]
+    if hasattr(torch, 'compile'):
+        versions.append(('compiled', torch.compile(eager_model), dtype))
+
+    print('{:>10} {}'.format(
+        'batch', ' '.join('{:>12}'.format(name) for name, _, _ in versions)))
+    for batch_size in args.batch_sizes:
+        features = torch.rand(batch_size, 16)
+        latencies = [
+            measure_latency(predict, features.to(input_dtype),
+                            args.num_iterations)
+            for _, predict, input_dtype in versions]
+        print('{:>10} {}'.format(
+            batch_size,
+            ' '.join('{:>10.3f}ms'.format(latency) for latency in latencies)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Reports the time spent waiting on data vs. computing for one training
+epoch, for a range of data loader worker counts.
+
+Run from the `python_package` directory:
+
+    python -m benchmarks.loader_benchmark --num-workers 0 2 4
+"""
+
+import argparse
+import os
+import tempfile
+
+import torch
+
+from benchmarks.synthetic import write_synthetic_csv
+from trainer import experiment
+from trainer import inputs
+from trainer import model
+from trainer import task
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-rows', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument(
+        '--dataset-format',
+        choices=['rows', 'columnar', 'streaming'],
+        default='rows')
+    parser.add_argument('--num-workers', type=int, nargs='+',
+                        default=[0, 1, 2, 4])
+    parser.add_argument('--prefetch-factor', type=int)
+    args = parser.parse_args()
+
+    if torch.cuda.is_available():
+        device = torch.device('cuda:{}'.format(torch.cuda.current_device()))
+    else:
+        device = 'cpu'
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_file = os.path.join(tmp_dir, 'taxi_trips_train.csv')
+        write_synthetic_csv(csv_file, args.num_rows)
+
+        results = []
+        for num_workers in args.num_workers:
+            argv = [
+                '--train-files', csv_file,
+                '--eval-files', csv_file,
+                '--batch-size', str(args.batch_size),
+                '--dataset-format', args.dataset_format,
+                '--num-workers', str(num_workers),
+                '--learning-rate', '0.001',
+            ]
+            if args.prefetch_factor is not None:
+                argv += ['--prefetch-factor', str(args.prefetch_factor)]
+            experiment_args = task.get_args(argv)
+            train_loader, _, _ = inputs.load_data(experiment_args, device)
+            sequential_model, criterion, optimizer = model.create(
+                experiment_args, device)
+            data_time, compute_time, _ = experiment.train(
+                sequential_model, train_loader, criterion, optimizer, 1)
+            results.append((num_workers, data_time, compute_time))
+
+    print('\n{:>8} {:>12} {:>12}'.format('workers', 'data (s)', 'compute (s)'))
+    for num_workers, data_time, compute_time in results:
+        print('{:>8} {:>12.2f} {:>12.2f}'.format(
+            num_workers, data_time, compute_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compares the training step time and the test accuracy of the float64,
+float32 and bfloat16 precisions.
+
+Trains on the taxi data if --train-files and --eval-files are set, and on
+synthetic, taxi-shaped data otherwise. Run from the `python_package`
+directory:
+
+    python -m benchmarks.precision_benchmark \
+        --train-files ${TAXI_TRAIN_SMALL} --eval-files ${TAXI_EVAL_SMALL}
+"""
+
+import argparse
+import os
+import tempfile
+
+import torch
+
+from benchmarks.synthetic import write_synthetic_csv
+from trainer import experiment
+from trainer import inputs
+from trainer import model
+from trainer import task
+
+
+def benchmark(args, precision, device):
+    """Trains the model with `precision`.
+
+    Returns:
+      A tuple with the mean training step time (milliseconds), the test loss
+      and the test accuracy.
+    """
+    experiment_args = task.get_args(
+        ['--train-files'] + args.train_files +
+        ['--eval-files'] + args.eval_files + [
+            '--batch-size', str(args.batch_size),
+            '--precision', precision,
+            '--dataset-format', 'columnar',
+            '--preload-to-device',
+            '--learning-rate', '0.001',
+        ])
+
+    torch.manual_seed(42)
+    train_loader, test_loader, _ = inputs.load_data(experiment_args, device)
+    sequential_model, criterion, optimizer = model.create(
+        experiment_args, device)
+
+    compute_time = 0.0
+    for epoch in range(1, args.num_epochs + 1):
+        _, epoch_compute_time, _ = experiment.train(
+            sequential_model, train_loader, criterion, optimizer, epoch,
+            precision=precision)
+        compute_time += epoch_compute_time
+    test_loss, accuracy = experiment.test(
+        sequential_model, test_loader, criterion, args.num_epochs,
+        precision=precision)
+
+    num_steps = args.num_epochs * len(train_loader)
+    return 1000 * compute_time / num_steps, float(test_loss), accuracy
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--train-files', nargs='+')
+    parser.add_argument('--eval-files', nargs='+')
+    parser.add_argument('--num-rows', type=int, default=100000,
+                        help='Rows of synthetic data, without --train-files.')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--num-epochs', type=int, default=3)
+    parser.add_argument('--precisions', nargs='+',
+                        default=['float64', 'float32', 'bfloat16'])
+    args = parser.parse_args()
+
+    if torch.cuda.is_available():
+        device = torch.device('cuda:{}'.format(torch.cuda.current_device()))
+    else:
+        device = 'cpu'
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if not args.train_files:
+            csv_file = os.path.join(tmp_dir, 'taxi_trips_train.csv')
+            write_synthetic_csv(csv_file, args.num_rows)
+            args.train_files = args.eval_files = [csv_file]
+
+        results = [(precision,) + benchmark(args, precision, device)
+                   for precision in args.precisions]
+
+    print('\n{:<10} {:>10} {:>10} {:>10}'.format(
+        'precision', 'step (ms)', 'loss', 'accuracy'))
+    for precision, step_time, test_loss, accuracy in results:
+        print('{:<10} {:>10.3f} {:>10.4f} {:>10.4f}'.format(
+            precision, step_time, test_loss, accuracy))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Generates synthetic, taxi-shaped csv files for the benchmarks."""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from trainer import metadata
+
+
+def write_synthetic_csv(path, num_rows, seed=42):
+    """Writes a csv file with the columns of `metadata.COLUMN_NAMES`.
+
+    Args:
+      path: the csv file to write.
+      num_rows: the number of rows to write.
+      seed: the seed of the random generator.
+    """
+    rng = np.random.RandomState(seed)
+    columns = {}
+    for name in metadata.COLUMN_NAMES:
+        if name in metadata.CATEGORICAL_COLUMNS:
+            vocabulary = np.array(['{}_{}'.format(name, i) for i in range(20)])
+            columns[name] = vocabulary[rng.randint(0, 20, num_rows)]
+        else:
+            columns[name] = rng.random_sample(num_rows) * 100
+    # Make the target depend on the fare, so that the model can learn it.
+    noise = rng.normal(scale=10, size=num_rows)
+    columns[metadata.TARGET_NAME] = (
+        columns['fare'] + noise > 50).astype(np.int64)
+    pd.DataFrame(columns, columns=metadata.COLUMN_NAMES).to_csv(
+        path, index=False)
+
+
+def write_synthetic_shards(directory, num_rows, num_shards=1, seed=42):
+    """Writes `num_rows` rows in `num_shards` csv files.
+
+    Args:
+      directory: the directory of the csv files.
+      num_rows: the total number of rows to write.
+      num_shards: the number of csv files.
+      seed: the seed of the random generator of the first shard.
+
+    Returns:
+      The paths of the csv files.
+    """
+    paths = []
+    for shard in range(num_shards):
+        path = os.path.join(
+            directory, 'taxi_trips_{:05d}.csv'.format(shard))
+        shard_rows = num_rows // num_shards + (
+            1 if shard < num_rows % num_shards else 0)
+        write_synthetic_csv(path, shard_rows, seed=seed + shard)
+        paths.append(path)
+    return paths
@@ -17,7 +17,13 @@
 from setuptools import find_packages
 from setuptools import setup
 
+# The trainer requires PyTorch 1.2 or later, 1.7 or later for the
+# --prefetch-factor and persistent workers defaults, and 1.10 or later for
+# --precision bfloat16 and the TorchScript exports. The pre-built PyTorch
+# containers already satisfy the requirement, so pip keeps their version.
 REQUIRED_PACKAGES = [
+    'torch>=1.2',
+    'cloudml-hypertune',
     'google-cloud-storage>=1.14.0',
     'pandas>=0.23.4'
 ]
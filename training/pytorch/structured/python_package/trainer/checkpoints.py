@@ -0,0 +1,194 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.\n",
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import queue
+import re
+import shutil
+import tempfile
+import threading
+
+from google.cloud import storage
+import torch
+
+from trainer import inputs
+
+# Checkpoints are saved in this directory of --job-dir, as
+# checkpoint_00001.pt, checkpoint_00002.pt, ...
+CHECKPOINT_DIR = 'checkpoints'
+CHECKPOINT_PATTERN = re.compile(r'checkpoint_(\d+)\.pt$')
+
+
+def _checkpoint_name(epoch):
+    return 'checkpoint_{:05d}.pt'.format(epoch)
+
+
+class CheckpointWriter(object):
+    def __init__(self, job_dir, local_dir=None):
+        """Saves checkpoints locally, and copies them to `job_dir` (a GCS or
+        local path) in a background thread, so the training loop doesn't wait
+        for the uploads. Call `close` to wait for the pending uploads.
+
+        Args:
+          job_dir: the GCS or local directory of the job. The checkpoints are
+            copied to its `checkpoints` directory.
+          local_dir: the local directory where the checkpoints are written
+            before they are copied. Defaults to a temporary directory.
+        """
+        self.job_dir = job_dir
+        self.local_dir = local_dir or tempfile.mkdtemp(prefix='checkpoints_')
+        os.makedirs(self.local_dir, exist_ok=True)
+        if job_dir.startswith('gs://'):
+            bucket_name, bucket_path = inputs.split_gcs_path(job_dir)
+            self._bucket_name = bucket_name
+            self._blob_prefix = '/'.join(
+                path for path in [bucket_path, CHECKPOINT_DIR] if path)
+        self._queue = queue.Queue()
+        self._errors = []
+        self._thread = threading.Thread(target=self._copy_checkpoints)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def save(self, sequential_model, optimizer, epoch):
+        """Saves the state of the model, the optimizer and the random number
+        generators after `epoch`, and queues the copy to the job directory.
+
+        Args:
+          sequential_model: The neural network that you are training.
+          optimizer: The optimizer of the model.
+          epoch: The last completed epoch.
+        """
+        state = {
+            'epoch': epoch,
+            'model_state_dict': sequential_model.state_dict(),
+            'optimizer_state_dict': optimizer.state_dict(),
+            'rng_state': torch.get_rng_state(),
+        }
+        if torch.cuda.is_available():
+            state['cuda_rng_state'] = torch.cuda.get_rng_state_all()
+
+        # Write to a temporary file first, so a preemption never leaves a
+        # partial checkpoint behind.
+        file_name = os.path.join(self.local_dir, _checkpoint_name(epoch))
+        torch.save(state, file_name + '.tmp')
+        os.replace(file_name + '.tmp', file_name)
+        self._queue.put(file_name)
+
+    def close(self):
+        """Waits for the pending copies, and raises the first copy error."""
+        self._queue.put(None)
+        self._thread.join()
+        if self._errors:
+            raise self._errors[0]
+
+    def _copy_checkpoints(self):
+        bucket = None
+        while True:
+            file_name = self._queue.get()
+            if file_name is None:
+                return
+            try:
+                base_name = os.path.basename(file_name)
+                if self.job_dir.startswith('gs://'):
+                    if bucket is None:
+                        bucket = storage.Client().bucket(self._bucket_name)
+                    inputs.upload_file(
+                        bucket, '{}/{}'.format(self._blob_prefix, base_name),
+                        file_name)
+                else:
+                    checkpoint_dir = os.path.join(self.job_dir, CHECKPOINT_DIR)
+                    os.makedirs(checkpoint_dir, exist_ok=True)
+                    shutil.copy(file_name,
+                                os.path.join(checkpoint_dir, base_name))
+                # Only the checkpoints in the job directory are restored.
+                os.remove(file_name)
+            except Exception as error:
+                print('Failed to copy checkpoint {}: {}'.format(
+                    file_name, error))
+                self._errors.append(error)
+
+
+def _find_latest_checkpoint(job_dir):
+    """Returns the path of the latest checkpoint in `job_dir`, or None."""
+    checkpoints = []
+    if job_dir.startswith('gs://'):
+        bucket_name, bucket_path = inputs.split_gcs_path(job_dir)
+        prefix = '/'.join(
+            path for path in [bucket_path, CHECKPOINT_DIR] if path) + '/'
+        for blob in storage.Client().list_blobs(bucket_name, prefix=prefix):
+            match = CHECKPOINT_PATTERN.search(blob.name)
+            if match:
+                checkpoints.append((int(match.group(1)), blob))
+    else:
+        checkpoint_dir = os.path.join(job_dir, CHECKPOINT_DIR)
+        if os.path.isdir(checkpoint_dir):
+            for file_name in os.listdir(checkpoint_dir):
+                match = CHECKPOINT_PATTERN.search(file_name)
+                if match:
+                    checkpoints.append(
+                        (int(match.group(1)),
+                         os.path.join(checkpoint_dir, file_name)))
+    if not checkpoints:
+        return None
+    return max(checkpoints, key=lambda checkpoint: checkpoint[0])[1]
+
+
+def restore_latest(job_dir, sequential_model, optimizer):
+    """Restores the model, the optimizer and the random number generators
+    from the latest checkpoint in `job_dir`, if there is one.
+
+    Only the PyTorch (and CUDA) generators are restored, not the NumPy and
+    Python ones, which the trainer doesn't draw from. The training samplers
+    draw from the PyTorch generator, except `DistributedSubsetSampler`, which
+    shuffles with --seed and the epoch: call `inputs.set_epoch` to resume its
+    order.
+
+    Args:
+      job_dir: the GCS or local directory of the job.
+      sequential_model: The neural network that you are training.
+      optimizer: The optimizer of the model.
+
+    Returns:
+      The last completed epoch of the checkpoint, or 0 if there is none.
+    """
+    checkpoint = _find_latest_checkpoint(job_dir)
+    if checkpoint is None:
+        return 0
+
+    # The random number generator states must be loaded on the CPU. The
+    # model and the optimizer states are copied to the device of the model.
+    if isinstance(checkpoint, str):
+        state = torch.load(checkpoint, map_location='cpu')
+    else:
+        # Every process downloads to its own file, as the processes of a
+        # distributed job may share the VM.
+        file_descriptor, file_name = tempfile.mkstemp(suffix='.pt')
+        os.close(file_descriptor)
+        try:
+            checkpoint.download_to_filename(file_name)
+            state = torch.load(file_name, map_location='cpu')
+        finally:
+            os.remove(file_name)
+        checkpoint = 'gs://{}/{}'.format(checkpoint.bucket.name,
+                                         checkpoint.name)
+
+    sequential_model.load_state_dict(state['model_state_dict'])
+    optimizer.load_state_dict(state['optimizer_state_dict'])
+    torch.set_rng_state(state['rng_state'])
+    if 'cuda_rng_state' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda_rng_state'])
+
+    print('Restored checkpoint {} (epoch {})'.format(
+        checkpoint, state['epoch']))
+    return state['epoch']
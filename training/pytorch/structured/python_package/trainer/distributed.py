@@ -0,0 +1,104 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.\n",
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+
+import torch
+import torch.distributed as dist
+
+# The task types of a CLUSTER_SPEC / TF_CONFIG cluster that train the model,
+# in the order of their ranks. The chief (or master) has rank 0.
+TRAINING_TASK_TYPES = [
+    'chief', 'master', 'workerpool0', 'worker', 'workerpool1', 'workerpool2',
+    'workerpool3'
+]
+
+
+def _cluster_env():
+    """Returns the rank, world size, master address and master port of the
+    process from the CLUSTER_SPEC or TF_CONFIG environment variable set by AI
+    Platform, or None if neither is set."""
+    for variable in ['CLUSTER_SPEC', 'TF_CONFIG']:
+        if os.environ.get(variable):
+            config = json.loads(os.environ[variable])
+            break
+    else:
+        return None
+
+    cluster = config['cluster']
+    task = config['task']
+    task_types = [task_type for task_type in TRAINING_TASK_TYPES
+                  if task_type in cluster]
+    if task['type'] not in task_types:
+        raise ValueError(
+            'Task type {} does not train the model, expected one of '
+            '{}.'.format(task['type'], ', '.join(TRAINING_TASK_TYPES)))
+    rank = 0
+    for task_type in task_types:
+        if task_type == task['type']:
+            rank += task['index']
+            break
+        rank += len(cluster[task_type])
+    world_size = sum(len(cluster[task_type]) for task_type in task_types)
+    master_addr, master_port = cluster[task_types[0]][0].rsplit(':', 1)
+    return rank, world_size, master_addr, master_port
+
+
+def init():
+    """Initializes the process group of a distributed job, using the nccl
+    backend when CUDA is available and gloo otherwise.
+
+    The rank and the world size of the process are read from the RANK,
+    WORLD_SIZE, MASTER_ADDR and MASTER_PORT environment variables (set by
+    `torchrun` and by the AI Platform PyTorch containers), or from the
+    CLUSTER_SPEC / TF_CONFIG environment variable.
+
+    Returns:
+      The local rank of the process on its machine, used to select its GPU.
+    """
+    if 'RANK' not in os.environ or 'WORLD_SIZE' not in os.environ:
+        cluster_env = _cluster_env()
+        if cluster_env is None:
+            raise ValueError(
+                '--distributed requires the RANK and WORLD_SIZE, or the '
+                'CLUSTER_SPEC or TF_CONFIG environment variables.')
+        rank, world_size, master_addr, master_port = cluster_env
+        os.environ['RANK'] = str(rank)
+        os.environ['WORLD_SIZE'] = str(world_size)
+        os.environ.setdefault('MASTER_ADDR', master_addr)
+        os.environ.setdefault('MASTER_PORT', master_port)
+
+    backend = 'nccl' if torch.cuda.is_available() else 'gloo'
+    dist.init_process_group(backend=backend, init_method='env://')
+    print('Initialized the {} process group: rank {} of {}'.format(
+        backend, dist.get_rank(), dist.get_world_size()))
+    return int(os.environ.get('LOCAL_RANK', 0))
+
+
+def is_initialized():
+    """Returns True if the process is part of a distributed job."""
+    return dist.is_available() and dist.is_initialized()
+
+
+def is_chief():
+    """Returns True if the process exports the model, i.e. if the job isn't
+    distributed or if the process has rank 0."""
+    return not is_initialized() or dist.get_rank() == 0
+
+
+def cleanup():
+    """Destroys the process group of a distributed job."""
+    if is_initialized():
+        dist.destroy_process_group()
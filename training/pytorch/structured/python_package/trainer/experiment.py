@@ -12,14 +12,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import time
+
 import hypertune
 import torch
+from torch.nn.parallel import DistributedDataParallel
 
+from trainer import checkpoints
+from trainer import distributed
 from trainer import inputs
+from trainer import metrics
 from trainer import model
 
 
-def train(sequential_model, train_loader, criterion, optimizer, epoch):
+def train(sequential_model, train_loader, criterion, optimizer, epoch,
+          precision='float64'):
     """Create the training loop for one epoch. Read the data from the
      dataloader, calculate the loss, and update the DNN. Lastly, display some
      statistics about the performance of the DNN during training.
@@ -31,30 +39,66 @@ def train(sequential_model, train_loader, criterion, optimizer, epoch):
       criterion: The loss function used during training
       optimizer: The selected optmizer to update parameters and gradients
       epoch: The current epoch that the training loop is on
+      precision: The --precision of the experiment
+
+    Returns:
+      The time (in seconds) spent waiting on the data loader, the time spent
+      computing, and the number of training samples. The times are measured
+      on the host, which only waits for the device at the logging intervals
+      and at the end of the epoch.
     """
     sequential_model.train()
-    running_loss = 0.0
+    device = next(sequential_model.parameters()).device
+    # Keep the loss sums on the device, to only wait for the device when
+    # printing the statistics.
+    running_metrics = metrics.MetricsAccumulator()
+    epoch_metrics = metrics.MetricsAccumulator()
+    data_time = 0.0
+    compute_time = 0.0
+    start = time.time()
     for batch_index, data in enumerate(train_loader):
-        features = data['features']
-        target = data['target']
+        fetched = time.time()
+        data_time += fetched - start
+
+        # copy the batch to the device, if the data loader didn't
+        features = data['features'].to(device, non_blocking=True)
+        target = data['target'].to(device, non_blocking=True)
 
         # zero the parameter gradients
         optimizer.zero_grad()
         # forward + backward + optimize
-        outputs = sequential_model(features)
-        loss = criterion(outputs, target)
+        with model.autocast(precision, device):
+            outputs = sequential_model(features)
+            loss = criterion(outputs, target)
         loss.backward()
         optimizer.step()
 
         # print statistics
-        running_loss += loss.item()
+        running_metrics.update(target.size(0), loss=loss)
+        epoch_metrics.update(target.size(0), loss=loss)
         if batch_index % 10 == 9:  # print every 10 mini-batches
+            results = running_metrics.results()
             print('[epoch: %d, batch: %5d] loss: %.3f' %
-                  (epoch, batch_index + 1, running_loss / 10))
-            running_loss = 0.0
+                  (epoch, batch_index + 1,
+                   results['loss'] / results['num_batches']))
+            running_metrics.reset()
 
+        start = time.time()
+        compute_time += start - fetched
 
-def test(sequential_model, test_loader, criterion, epoch, report_metric=False):
+    # Copying the sums to the host waits for the device to finish the queued
+    # batches, so count the wait as computing time.
+    results = epoch_metrics.results()
+    compute_time += time.time() - start
+    print('[epoch: %d] train: %d samples in %.2fs (%.0f samples/sec), '
+          'waiting on data: %.2fs, computing: %.2fs' %
+          (epoch, results['num_samples'], results['elapsed_time'],
+           results['samples_per_sec'], data_time, compute_time))
+    return data_time, compute_time, results['num_samples']
+
+
+def test(sequential_model, test_loader, criterion, epoch, report_metric=False,
+         precision='float64'):
     """Test / Evaluate the DNNs performance with a test / eval dataset.
      Read the data from the dataloader and calculate the loss. Lastly,
      display some statistics about the performance of the DNN during testing.
@@ -66,27 +110,43 @@ def test(sequential_model, test_loader, criterion, epoch, report_metric=False):
       criterion: The loss function
       epoch: The current epoch that the training loop is on
       report_metric: Whether to report metrics for hyperparameter tuning
+      precision: The --precision of the experiment
+
+    Returns:
+      The average loss and the accuracy on the test set.
     """
     sequential_model.eval()
-    test_loss = 0.0
-    correct = 0
+    device = next(sequential_model.parameters()).device
+    # Keep the loss and accuracy sums on the device, to only wait for the
+    # device once the test set is evaluated.
+    test_metrics = metrics.MetricsAccumulator()
 
     with torch.no_grad():
         for _, data in enumerate(test_loader, 0):
-            features = data['features']
-            target = data['target']
-            output = sequential_model(features)
-            # sum up batch loss
-            test_loss += criterion(output, target)
-            # compute accuracy for a binary classifier
+            features = data['features'].to(device, non_blocking=True)
+            target = data['target'].to(device, non_blocking=True)
+            with model.autocast(precision, device):
+                output = sequential_model(features)
+                loss = criterion(output, target)
+            # sum up batch loss, and compute accuracy for a binary classifier
             #    Values > 0.5 = 1
             #    Values <= 0.5 = 0
-            correct += ((output > 0.5) == (target > 0.5)).sum().item()
+            # count batches and samples as they are loaded, since a loader
+            # over a `ColumnarCSVDataset` samples whole batches of indices.
+            test_metrics.update(
+                target.size(0),
+                loss=loss,
+                correct=((output > 0.5) == (target > 0.5)).sum())
 
+    # sum up the metrics of all the processes of a distributed job
+    results = test_metrics.results(all_reduce=True,
+                                   names=['correct', 'loss'])
+    correct = int(results['correct'])
+    num_samples = results['num_samples']
     # get the average loss for the test set.
-    test_loss /= (len(test_loader.sampler) / test_loader.batch_size)
+    test_loss = results['loss'] / results['num_batches']
 
-    if report_metric:
+    if report_metric and distributed.is_chief():
       # Uses hypertune to report metrics for hyperparameter tuning.
       hpt = hypertune.HyperTune()
       hpt.report_hyperparameter_tuning_metric(
@@ -95,11 +155,49 @@ def test(sequential_model, test_loader, criterion, epoch, report_metric=False):
           global_step=epoch)
 
     # print statistics
-    print('\nTest set:\n\tAverage loss: {:.4f}'.format(test_loss))
+    print('\nTest set: {} samples in {:.2f}s ({:.0f} samples/sec)'.format(
+        num_samples, results['elapsed_time'], results['samples_per_sec']))
+    print('\tAverage loss: {:.4f}'.format(test_loss))
     print('\tAccuracy: {}/{} ({:.0f}%)\n'.format(
             correct,
-            len(test_loader.sampler),
-            100. * correct / len(test_loader.sampler)))
+            num_samples,
+            100. * correct / num_samples))
+
+    return test_loss, correct / num_samples
+
+
+def export(args, sequential_model, vocabularies):
+    """Saves the state dict of the model, the vocabularies of the categorical
+    columns and, if requested, the TorchScript versions of the model.
+
+    Args:
+      args: experiment parameters.
+      sequential_model: the trained model.
+      vocabularies: the vocabularies of the categorical columns, or None.
+
+    Returns:
+      The names of the saved files.
+    """
+    torch.save(sequential_model.state_dict(), args.model_name)
+    file_names = [args.model_name]
+
+    if vocabularies is not None:
+        inputs.save_vocabularies(vocabularies, args.vocabularies_name)
+        file_names.append(args.vocabularies_name)
+
+    # The TorchScript versions are saved next to the model, e.g.
+    # model_scripted.pt and model_int8.pt for model.pth.
+    model_root = os.path.splitext(args.model_name)[0]
+    if args.export_torchscript:
+        scripted_name = '{}_scripted.pt'.format(model_root)
+        torch.jit.save(model.script(sequential_model), scripted_name)
+        file_names.append(scripted_name)
+    if args.export_quantized:
+        quantized_name = '{}_int8.pt'.format(model_root)
+        torch.jit.save(model.quantize(sequential_model), quantized_name)
+        file_names.append(quantized_name)
+
+    return file_names
 
 
 def run(args):
@@ -109,8 +207,14 @@ def run(args):
     Args:
       args: experiment parameters.
     """
+    if args.distributed:
+        local_rank = distributed.init()
+
     cuda_availability = torch.cuda.is_available()
     if cuda_availability:
+      if args.distributed:
+          # Use one GPU per process
+          torch.cuda.set_device(local_rank)
       device = torch.device('cuda:{}'.format(torch.cuda.current_device()))
     else:
       device = 'cpu'
@@ -127,20 +231,57 @@ def run(args):
     # Create the model, loss function, and optimizer
     sequential_model, criterion, optimizer = model.create(args, device)
 
+    # Resume from the latest checkpoint in the job directory, e.g. when the
+    # job is restarted after a preemption
+    start_epoch = 0
+    checkpoint_writer = None
+    if args.job_dir and args.checkpoint_epochs:
+        start_epoch = checkpoints.restore_latest(
+            args.job_dir, sequential_model, optimizer)
+        inputs.set_epoch(train_loader, start_epoch)
+        # Only the chief of a distributed job saves the checkpoints
+        if distributed.is_chief():
+            checkpoint_writer = checkpoints.CheckpointWriter(args.job_dir)
+
+    # In a distributed job, wrap the model to average the gradients of all
+    # the processes. The checkpoints and the export use the unwrapped model.
+    training_model = sequential_model
+    if args.distributed:
+        training_model = DistributedDataParallel(
+            sequential_model,
+            device_ids=[device] if cuda_availability else None)
+
     # Train / Test the model
-    for epoch in range(1, args.num_epochs + 1):
-        train(sequential_model, train_loader, criterion, optimizer, epoch)
-        test(sequential_model, test_loader, criterion,
-             epoch, report_metric=True)
+    for epoch in range(start_epoch + 1, args.num_epochs + 1):
+        train(training_model, train_loader, criterion, optimizer, epoch,
+              precision=args.precision)
+        test(training_model, test_loader, criterion,
+             epoch, report_metric=True, precision=args.precision)
+        if checkpoint_writer and epoch % args.checkpoint_epochs == 0:
+            checkpoint_writer.save(sequential_model, optimizer, epoch)
 
     # Evaluate the model
     print("Evaluate the model using the evaluation dataset")
-    test(sequential_model, eval_loader, criterion,
-         args.num_epochs, report_metric=False)
+    test(training_model, eval_loader, criterion,
+         args.num_epochs, report_metric=False, precision=args.precision)
 
-    # Export the trained model
-    torch.save(sequential_model.state_dict(), args.model_name)
+    if not distributed.is_chief():
+        distributed.cleanup()
+        return
+
+    # Export the trained model, and the vocabularies used to encode the
+    # categorical columns
+    file_names = export(args, sequential_model,
+                        train_loader.dataset.vocabularies)
+
+    # Save the model to GCS or to the local job directory
+    try:
+        if args.job_dir:
+            inputs.save_model(args, file_names)
+    finally:
+        # Wait for the checkpoints copied in the background, even if the
+        # model couldn't be saved
+        if checkpoint_writer:
+            checkpoint_writer.close()
 
-    # Save the model to GCS
-    if args.job_dir:
-        inputs.save_model(args)
+    distributed.cleanup()
@@ -13,20 +13,44 @@
 # limitations under the License.
 
 import datetime
+import inspect
+import json
+import math
+import os
+import shutil
 
 from google.cloud import storage
+import numpy as np
 import pandas as pd
 import torch
 from torch.utils.data import Dataset
 from torch.utils.data import DataLoader
+from torch.utils.data import IterableDataset
+from torch.utils.data import get_worker_info
 from torch.utils.data import random_split
+import torch.distributed as dist
+from torch.utils.data.sampler import BatchSampler
+from torch.utils.data.sampler import Sampler
+from torch.utils.data.sampler import SequentialSampler
 from torch.utils.data.sampler import SubsetRandomSampler
 
 from trainer import metadata
 
+# DataLoader accepts prefetch_factor and persistent_workers from PyTorch 1.7.
+_LOADER_HAS_WORKER_OPTIONS = 'persistent_workers' in inspect.signature(
+    DataLoader.__init__).parameters
+
+
+def _numpy_dtype(args):
+    """Returns the dtype of the feature and target tensors for
+    `args.precision`. With bfloat16, the tensors are float32 and autocast
+    runs the model operations in bfloat16."""
+    return np.float64 if args.precision == 'float64' else np.float32
+
 
 class CSVDataset(Dataset):
-    def __init__(self, args, csv_files, device, transform=None):
+    def __init__(self, args, csv_files, device, transform=None,
+                 vocabularies=None):
         """
         Args:
             args: arguments passed to the python script
@@ -34,27 +58,29 @@ class CSVDataset(Dataset):
             device (string): PyTorch device on which to load the dataset.
             transform (callable, optional): Optional transform to be applied
                 on a sample.
+            vocabularies (dict, optional): Maps each categorical column to the
+                list of its values, as returned by `fit_vocabularies`. If not
+                set, the vocabularies are fitted on this dataset.
         """
-        self.dataframe = None
-        for csv_file in csv_files:
-            if self.dataframe is None:
-                self.dataframe = pd.read_csv(csv_file, header=0)
-            else:
-                self.dataframe = pd.concat(
-                    [self.dataframe, pd.read_csv(csv_file, header=0)])
+        # Concatenate the files once, instead of growing the dataframe (and
+        # copying it) for every file.
+        self.dataframe = pd.concat(
+            [pd.read_csv(csv_file, header=0) for csv_file in csv_files],
+            ignore_index=True)
         self.device = device
+        self.dtype = _numpy_dtype(args)
         self.transform = transform
 
         # Convert the categorical columns in place to a numerical category
         # Example: Payment_Type =
         #       ['Credit Card' 'Cash' 'No Charge' 'Dispute' 'Unknown']
-        # Converted: Payment_Type = [0, 1, 2, 3, 4]
+        # Converted: Payment_Type = [1, 0, 2, 3, 4]
+        self.vocabularies = None
         if args.embed_categorical_columns:
-            for category in metadata.CATEGORICAL_COLUMNS:
-                self.dataframe[category].replace(
-                    {val: i for i, val in enumerate(
-                        self.dataframe[category].unique())},
-                    inplace=True)
+            if vocabularies is None:
+                vocabularies = fit_vocabularies([self.dataframe])
+            self.vocabularies = vocabularies
+            encode_categorical_columns(self.dataframe, vocabularies)
 
     def __len__(self):
         return len(self.dataframe)
@@ -63,8 +89,8 @@ class CSVDataset(Dataset):
         # When retrieving an item from the dataset, get the features and the
         # target. In this template, the target is 0th column and the features
         # are all the other columns.
-        features = self.dataframe.iloc[idx, 1:].values
-        target = self.dataframe.iloc[idx, :1].values
+        features = self.dataframe.iloc[idx, 1:].values.astype(self.dtype)
+        target = self.dataframe.iloc[idx, :1].values.astype(self.dtype)
 
         # Load the data as a tensor
         item = {
@@ -78,6 +104,437 @@ class CSVDataset(Dataset):
         return item
 
 
+class ColumnarCSVDataset(CSVDataset):
+    def __init__(self, args, csv_files, device, transform=None,
+                 vocabularies=None, preload_to_device=False):
+        """Reads the csv files like `CSVDataset`, then converts the whole
+        dataframe once into contiguous feature and target tensors. Items are
+        whole batches: `__getitem__` takes a list of row indices (as yielded
+        by a `BatchSampler`) and slices the tensors, instead of building one
+        tensor per row.
+
+        Args:
+            args: arguments passed to the python script
+            csv_files (list): Path to the list of csv files with annotations.
+            device (string): PyTorch device on which to load the dataset.
+            transform (callable, optional): Optional transform to be applied
+                on a batch.
+            vocabularies (dict, optional): Maps each categorical column to the
+                list of its values, as returned by `fit_vocabularies`. If not
+                set, the vocabularies are fitted on this dataset.
+            preload_to_device (bool): If True, the tensors are copied to
+                `device` once, so batches are sliced on the device. Otherwise
+                the tensors stay in host memory and each batch is copied to
+                `device` when it is fetched.
+        """
+        super(ColumnarCSVDataset, self).__init__(
+            args, csv_files, device, transform, vocabularies)
+
+        # The target is the 0th column and the features are all the other
+        # columns, the same layout used by `CSVDataset.__getitem__`.
+        features = np.ascontiguousarray(
+            self.dataframe.iloc[:, 1:].to_numpy(dtype=self.dtype))
+        target = np.ascontiguousarray(
+            self.dataframe.iloc[:, :1].to_numpy(dtype=self.dtype))
+        self.features = torch.from_numpy(features)
+        self.target = torch.from_numpy(target)
+        if preload_to_device:
+            self.features = self.features.to(device)
+            self.target = self.target.to(device)
+
+        # The tensors hold all the data, drop the dataframe to free memory.
+        self.length = len(self.dataframe)
+        self.dataframe = None
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, indices):
+        index = torch.as_tensor(indices, dtype=torch.long,
+                                device=self.features.device)
+        item = {
+            'features': self.features.index_select(0, index).to(self.device),
+            'target': self.target.index_select(0, index).to(self.device)
+        }
+
+        if self.transform:
+            item = self.transform(item)
+
+        return item
+
+
+class StreamingCSVDataset(IterableDataset):
+    def __init__(self, args, csv_files, device, vocabularies, split=None,
+                 shuffle=False, transform=None):
+        """Streams batches from many csv files (shards), without loading the
+        files in memory. The files are read in chunks of
+        `args.read_chunk_size` rows and spread across the data loader
+        workers.
+
+        Args:
+            args: arguments passed to the python script
+            csv_files (list): Local or GCS paths of the csv files.
+            device (string): PyTorch device on which to load the dataset.
+            vocabularies (dict): Maps each categorical column to the list of
+                its values, as returned by `fit_vocabularies`.
+            split (string, optional): 'train' or 'test' to only keep the rows
+                of that side of the held-out test split. The split is
+                decided by a hash of each row, so it doesn't depend on the
+                order in which the files or the rows are read.
+            shuffle (bool): Whether to shuffle the rows within a buffer of
+                `args.shuffle_buffer_size` rows.
+            transform (callable, optional): Optional transform to be applied
+                on a batch.
+        """
+        super(StreamingCSVDataset, self).__init__()
+        self.csv_files = list(csv_files)
+        self.device = device
+        self.dtype = _numpy_dtype(args)
+        self.vocabularies = vocabularies
+        self.split = split
+        self.test_split = args.test_split
+        self.shuffle_buffer_size = args.shuffle_buffer_size if shuffle else 0
+        self.batch_size = args.batch_size
+        self.read_chunk_size = args.read_chunk_size
+        self.embed_categorical_columns = args.embed_categorical_columns
+        self.transform = transform
+
+    def _read_chunks(self):
+        """Yields the chunks of the csv files assigned to this worker."""
+        worker_info = get_worker_info()
+        if worker_info is None:
+            worker_id, num_workers = 0, 1
+        else:
+            worker_id, num_workers = worker_info.id, worker_info.num_workers
+
+        # Assign whole files to the workers when there are enough of them,
+        # otherwise every worker reads all the files and keeps its share of
+        # the chunks.
+        if len(self.csv_files) >= num_workers:
+            csv_files = self.csv_files[worker_id::num_workers]
+            worker_id, num_workers = 0, 1
+        else:
+            csv_files = self.csv_files
+
+        chunk_index = 0
+        for csv_file in csv_files:
+            for chunk in pd.read_csv(csv_file, header=0,
+                                     chunksize=self.read_chunk_size):
+                if chunk_index % num_workers == worker_id:
+                    yield chunk
+                chunk_index += 1
+
+    def _to_arrays(self, chunk):
+        """Filters the chunk on the test split, and converts it to the
+        feature and target arrays."""
+        if self.split is not None:
+            # Map the hash of each row to [0, 1) to decide its split.
+            buckets = pd.util.hash_pandas_object(chunk, index=False).values
+            in_test = (buckets % 10000) < int(self.test_split * 10000)
+            chunk = chunk[in_test if self.split == 'test' else ~in_test]
+
+        if self.embed_categorical_columns:
+            chunk = chunk.copy()
+            encode_categorical_columns(chunk, self.vocabularies)
+
+        features = chunk.iloc[:, 1:].to_numpy(dtype=self.dtype)
+        target = chunk.iloc[:, :1].to_numpy(dtype=self.dtype)
+        return features, target
+
+    def _to_batch(self, features, target):
+        item = {
+            'features': torch.from_numpy(features).to(self.device),
+            'target': torch.from_numpy(target).to(self.device)
+        }
+        if self.transform:
+            item = self.transform(item)
+        return item
+
+    def __iter__(self):
+        # Draw the shuffling seed from the PyTorch generator, which the data
+        # loader seeds differently for every worker and every epoch.
+        rng = np.random.RandomState(torch.randint(2 ** 31 - 1, ()).item())
+        buffer_features = buffer_target = None
+
+        for chunk in self._read_chunks():
+            features, target = self._to_arrays(chunk)
+            if buffer_target is None:
+                buffer_features, buffer_target = features, target
+            else:
+                buffer_features = np.concatenate([buffer_features, features])
+                buffer_target = np.concatenate([buffer_target, target])
+
+            # Keep at most `shuffle_buffer_size` rows (plus the last chunk)
+            # in memory, and emit the rest as full batches.
+            num_rows = len(buffer_target) - self.shuffle_buffer_size
+            num_rows -= num_rows % self.batch_size
+            if num_rows <= 0:
+                continue
+            if self.shuffle_buffer_size:
+                permutation = rng.permutation(len(buffer_target))
+                buffer_features = buffer_features[permutation]
+                buffer_target = buffer_target[permutation]
+            for start in range(0, num_rows, self.batch_size):
+                end = start + self.batch_size
+                yield self._to_batch(
+                    buffer_features[start:end], buffer_target[start:end])
+            buffer_features = buffer_features[num_rows:]
+            buffer_target = buffer_target[num_rows:]
+
+        # Emit the rest of the buffer.
+        if buffer_target is None:
+            return
+        if self.shuffle_buffer_size:
+            permutation = rng.permutation(len(buffer_target))
+            buffer_features = buffer_features[permutation]
+            buffer_target = buffer_target[permutation]
+        for start in range(0, len(buffer_target), self.batch_size):
+            end = start + self.batch_size
+            yield self._to_batch(
+                buffer_features[start:end], buffer_target[start:end])
+
+
+class DistributedSubsetSampler(Sampler):
+    def __init__(self, indices, shuffle=True, seed=0, pad=True):
+        """Samples the indices of a subset of the dataset, sharded across the
+        processes of a distributed job, like `DistributedSampler`. The indices
+        are shuffled (with the same order on every process) differently for
+        every epoch.
+
+        Args:
+            indices (sequence): The indices of the subset.
+            shuffle (bool): Whether to shuffle the indices.
+            seed (int): The seed of the shuffling, which must be the same on
+                every process.
+            pad (bool): Whether to repeat indices so every process gets the
+                same number of indices, as `DistributedDataParallel` needs
+                for training. Don't pad the test and evaluation sets: the
+                repeated rows would be counted twice in the metrics.
+        """
+        self.indices = torch.as_tensor(indices, dtype=torch.long)
+        self.shuffle = shuffle
+        self.seed = seed
+        self.pad = pad
+        self.epoch = 0
+        self.rank = dist.get_rank()
+        self.num_replicas = dist.get_world_size()
+        if pad:
+            self.num_samples = int(math.ceil(
+                len(self.indices) / float(self.num_replicas)))
+        else:
+            self.num_samples = len(
+                range(self.rank, len(self.indices), self.num_replicas))
+
+    def __iter__(self):
+        if self.shuffle:
+            generator = torch.Generator()
+            generator.manual_seed(self.seed + self.epoch)
+            order = torch.randperm(len(self.indices), generator=generator)
+        else:
+            order = torch.arange(len(self.indices))
+        # The sampler is iterated once per epoch, in the main process.
+        self.epoch += 1
+
+        if self.pad:
+            total_size = self.num_samples * self.num_replicas
+            order = order.repeat(
+                int(math.ceil(total_size / float(len(order)))))
+            order = order[self.rank:total_size:self.num_replicas]
+        else:
+            order = order[self.rank::self.num_replicas]
+        return iter(self.indices[order].tolist())
+
+    def __len__(self):
+        return self.num_samples
+
+
+def set_epoch(data_loader, epoch):
+    """Sets the number of completed epochs of the `DistributedSubsetSampler`
+    of a data loader, if it has one, so the next epochs are shuffled as in
+    the original run when resuming from a checkpoint.
+
+    Args:
+        data_loader: a data loader, as returned by `create_data_loader`.
+        epoch (int): the number of completed epochs.
+    """
+    sampler = data_loader.sampler
+    # The sampler of a `ColumnarCSVDataset` loader is a `BatchSampler`.
+    sampler = getattr(sampler, 'sampler', sampler)
+    if isinstance(sampler, DistributedSubsetSampler):
+        sampler.epoch = epoch
+
+
+def fit_vocabularies(dataframes):
+    """Returns the sorted list of the values of each categorical column, in
+    one pass over the dataframes.
+
+    Args:
+        dataframes (iterable): The dataframes (or chunks of a csv file) that
+            include the columns of `metadata.CATEGORICAL_COLUMNS`.
+    """
+    values = {category: set() for category in metadata.CATEGORICAL_COLUMNS}
+    for dataframe in dataframes:
+        for category in metadata.CATEGORICAL_COLUMNS:
+            values[category].update(pd.unique(dataframe[category].dropna()))
+    return {category: sorted(values[category], key=str)
+            for category in metadata.CATEGORICAL_COLUMNS}
+
+
+def encode_categorical_columns(dataframe, vocabularies):
+    """Replaces, in place, the values of each categorical column by their
+    index in the vocabulary of the column. Values that are missing from the
+    vocabulary (or null) are encoded as -1.
+
+    Args:
+        dataframe: The dataframe to encode.
+        vocabularies (dict): Maps each categorical column to the list of its
+            values, as returned by `fit_vocabularies`.
+    """
+    for category in metadata.CATEGORICAL_COLUMNS:
+        dataframe[category] = pd.Categorical(
+            dataframe[category], categories=vocabularies[category]).codes
+
+
+def save_vocabularies(vocabularies, path):
+    """Saves the vocabularies as json, so they can be reused to encode the
+    data at serving time.
+
+    Args:
+        vocabularies (dict): As returned by `fit_vocabularies`.
+        path: The path of the json file.
+    """
+    with open(path, 'w') as vocabularies_file:
+        # `default` converts the numpy scalars to python values.
+        json.dump(vocabularies, vocabularies_file,
+                  default=lambda value: value.item())
+
+
+def load_vocabularies(path):
+    """Loads the vocabularies saved by `save_vocabularies`.
+
+    Args:
+        path: The path of the json file.
+    """
+    with open(path) as vocabularies_file:
+        return json.load(vocabularies_file)
+
+
+def _load_streaming_data(args, device, options):
+    """Creates the three data loaders (Train, Test, Evaluation) over
+    `StreamingCSVDataset`s. The test set is held out of the training files
+    by hashing each row.
+
+    Args:
+        args: arguments passed to the python script
+        device: PyTorch device on which to load the dataset
+        options (dict): keyword arguments of the data loaders, as returned by
+            `data_loader_options`
+    """
+    vocabularies = None
+    if args.embed_categorical_columns:
+        # Only read the categorical columns to fit the vocabularies.
+        vocabularies = fit_vocabularies(
+            chunk
+            for csv_file in args.train_files
+            for chunk in pd.read_csv(csv_file, header=0,
+                                     usecols=metadata.CATEGORICAL_COLUMNS,
+                                     chunksize=args.read_chunk_size))
+
+    train_dataset = StreamingCSVDataset(
+        args, args.train_files, device, vocabularies, split='train',
+        shuffle=True)
+    test_dataset = StreamingCSVDataset(
+        args, args.train_files, device, vocabularies, split='test')
+    eval_dataset = StreamingCSVDataset(
+        args, args.eval_files, device, vocabularies)
+
+    train_loader = create_data_loader(args, train_dataset, options)
+    test_loader = create_data_loader(args, test_dataset, options)
+    eval_loader = create_data_loader(args, eval_dataset, options)
+
+    return train_loader, test_loader, eval_loader
+
+
+def available_cpu_count():
+    """Returns the number of CPUs that this process is allowed to run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def data_loader_options(args):
+    """Returns the keyword arguments of the data loaders, based on the data
+    loader arguments. The arguments that are not set default to:
+      * num_workers: one less than the available CPUs of the process
+        (leaving one for the training loop), up to 8. The CPUs are shared
+        between the LOCAL_WORLD_SIZE processes of the machine, set by
+        `torchrun`.
+      * pin_memory: True if CUDA is available.
+      * prefetch_factor: 2, and persistent_workers: True if there are
+        workers, with PyTorch 1.7 or later. With older versions, they are
+        only passed to the data loaders if set explicitly.
+
+    Args:
+        args: arguments passed to the python script
+    """
+    num_workers = args.num_workers
+    if num_workers is None:
+        cpu_count = (available_cpu_count() //
+                     int(os.environ.get('LOCAL_WORLD_SIZE', 1)))
+        num_workers = min(max(cpu_count - 1, 0), 8)
+    pin_memory = args.pin_memory
+    if pin_memory is None:
+        pin_memory = torch.cuda.is_available()
+
+    options = {'num_workers': num_workers, 'pin_memory': pin_memory}
+    # DataLoader only accepts these arguments with worker processes.
+    if num_workers > 0:
+        prefetch_factor = args.prefetch_factor
+        persistent_workers = args.persistent_workers
+        if _LOADER_HAS_WORKER_OPTIONS:
+            if prefetch_factor is None:
+                prefetch_factor = 2
+            if persistent_workers is None:
+                persistent_workers = True
+        if prefetch_factor is not None:
+            options['prefetch_factor'] = prefetch_factor
+        if persistent_workers is not None:
+            options['persistent_workers'] = persistent_workers
+    return options
+
+
+def create_data_loader(args, dataset, options, sampler=None):
+    """Creates a data loader over `dataset` that draws indices from `sampler`.
+
+    For a `ColumnarCSVDataset`, the indices are grouped into batches by a
+    `BatchSampler`, so the data loader fetches a whole batch with one call to
+    `__getitem__` instead of collating one item per row. A
+    `StreamingCSVDataset` already yields batches.
+
+    Args:
+        args: arguments passed to the python script
+        dataset: the `CSVDataset`, `ColumnarCSVDataset` or
+            `StreamingCSVDataset` to load from
+        options (dict): keyword arguments of the data loader, as returned by
+            `data_loader_options`
+        sampler: sampler yielding the row indices to load. Not used with a
+            `StreamingCSVDataset`.
+    """
+    if isinstance(dataset, StreamingCSVDataset):
+        return DataLoader(dataset, batch_size=None, **options)
+    if isinstance(dataset, ColumnarCSVDataset):
+        return DataLoader(
+            dataset,
+            batch_size=None,
+            sampler=BatchSampler(sampler, args.batch_size, drop_last=False),
+            **options)
+    return DataLoader(
+        dataset,
+        batch_size=args.batch_size,
+        sampler=sampler,
+        **options)
+
+
 def load_data(args, device):
     """Loads the data into three different data loaders. (Train, Test, Evaluation)
         Split the training dataset into a train / test dataset.
@@ -86,8 +543,35 @@ def load_data(args, device):
             args: arguments passed to the python script
             device: PyTorch device on which to load the dataset
     """
-    train_dataset = CSVDataset(args, args.train_files, device)
-    eval_dataset = CSVDataset(args, args.eval_files, device)
+    options = data_loader_options(args)
+    if args.dataset_format == 'columnar' and args.preload_to_device:
+        # The tensors are already on the device, there is nothing to copy in
+        # worker processes or to pin.
+        options = {}
+    elif options['num_workers'] > 0 or options['pin_memory']:
+        # The worker processes and the pinning need the data on the host.
+        # The training loop copies the batches to the device.
+        device = 'cpu'
+
+    if args.dataset_format == 'streaming':
+        if args.distributed:
+            raise ValueError('--distributed is not supported with '
+                             '--dataset-format=streaming.')
+        return _load_streaming_data(args, device, options)
+
+    if args.dataset_format == 'columnar':
+        train_dataset = ColumnarCSVDataset(
+            args, args.train_files, device,
+            preload_to_device=args.preload_to_device)
+        eval_dataset = ColumnarCSVDataset(
+            args, args.eval_files, device,
+            vocabularies=train_dataset.vocabularies,
+            preload_to_device=args.preload_to_device)
+    else:
+        train_dataset = CSVDataset(args, args.train_files, device)
+        eval_dataset = CSVDataset(
+            args, args.eval_files, device,
+            vocabularies=train_dataset.vocabularies)
     # Determine the size of the dataset and the train/test sets
     dataset_size = len(train_dataset)
     test_size = int(args.test_split * dataset_size)
@@ -101,45 +585,98 @@ def load_data(args, device):
     # parts of the dataset belong to the train/test set
     # Note: use `tolist()` to convert the indices tensor to a list or
     # enumerating over the DataLoader will fail.
-    train_sampler = SubsetRandomSampler(train_dataset.indices)
-    test_sampler = SubsetRandomSampler(test_dataset.indices)
+    if args.distributed:
+        # Shard the sets across the processes of the distributed job.
+        train_sampler = DistributedSubsetSampler(
+            train_dataset.indices, seed=args.seed)
+        test_sampler = DistributedSubsetSampler(
+            test_dataset.indices, shuffle=False, pad=False)
+        eval_sampler = DistributedSubsetSampler(
+            range(len(eval_dataset)), shuffle=False, pad=False)
+    else:
+        train_sampler = SubsetRandomSampler(train_dataset.indices)
+        test_sampler = SubsetRandomSampler(test_dataset.indices)
+        eval_sampler = SequentialSampler(eval_dataset)
 
     # Create the data loaders with the train/test sets.
-    train_loader = DataLoader(
-        train_dataset.dataset,
-        batch_size=args.batch_size,
-        sampler=train_sampler)
-    test_loader = DataLoader(
-        test_dataset.dataset,
-        batch_size=args.batch_size,
-        sampler=test_sampler)
+    train_loader = create_data_loader(
+        args, train_dataset.dataset, options, train_sampler)
+    test_loader = create_data_loader(
+        args, test_dataset.dataset, options, test_sampler)
     # Create data loader with the eval set
-    eval_loader = DataLoader(
-        eval_dataset,
-        batch_size=args.batch_size)
+    eval_loader = create_data_loader(args, eval_dataset, options, eval_sampler)
 
     return train_loader, test_loader, eval_loader
 
 
-def save_model(args):
-    """Saves the model to Google Cloud Storage
+# Files larger than this are uploaded in parallel chunks, when the installed
+# google-cloud-storage supports it, and with a resumable upload otherwise.
+PARALLEL_UPLOAD_THRESHOLD = 100 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 32 * 1024 * 1024
 
-    Args:
-      args: contains name for saved model.
-    """
+
+def split_gcs_path(path):
+    """Splits a `gs://bucket/path` into the bucket name and the path."""
     scheme = 'gs://'
-    bucket_name = args.job_dir[len(scheme):].split('/')[0]
+    bucket_name = path[len(scheme):].split('/')[0]
 
     prefix = '{}{}/'.format(scheme, bucket_name)
-    bucket_path = args.job_dir[len(prefix):].rstrip('/')
+    return bucket_name, path[len(prefix):].rstrip('/')
+
+
+def upload_file(bucket, blob_name, file_name):
+    """Uploads a local file to Google Cloud Storage. Large files are uploaded
+    in parallel chunks (composed into one object), or with a resumable upload
+    that retries the failed chunks instead of the whole file.
+
+    Args:
+      bucket: the `storage.Bucket` to upload to.
+      blob_name: the name of the object to create.
+      file_name: the local file to upload.
+    """
+    blob = bucket.blob(blob_name)
+    if os.path.getsize(file_name) > PARALLEL_UPLOAD_THRESHOLD:
+        try:
+            from google.cloud.storage import transfer_manager
+        except ImportError:
+            transfer_manager = None
+        if transfer_manager is not None:
+            transfer_manager.upload_chunks_concurrently(
+                file_name, blob, chunk_size=UPLOAD_CHUNK_SIZE)
+            return
+        # Setting a chunk size makes the upload resumable.
+        blob.chunk_size = UPLOAD_CHUNK_SIZE
+    blob.upload_from_filename(file_name)
 
+
+def save_model(args, file_names=None):
+    """Saves the model to Google Cloud Storage, or to a local directory if
+    `args.job_dir` isn't a `gs://` path.
+
+    Args:
+      args: contains name for saved model.
+      file_names (list, optional): the files to save in the model directory.
+        Defaults to the saved model.
+    """
     datetime_ = datetime.datetime.now().strftime('model_%Y%m%d_%H%M%S')
 
+    if file_names is None:
+        file_names = [args.model_name]
+
+    if not args.job_dir.startswith('gs://'):
+        model_dir = os.path.join(args.job_dir, datetime_)
+        os.makedirs(model_dir, exist_ok=True)
+        for file_name in file_names:
+            shutil.copy(file_name, os.path.join(model_dir, file_name))
+        return
+
+    bucket_name, bucket_path = split_gcs_path(args.job_dir)
+
     if bucket_path:
-        model_path = '{}/{}/{}'.format(bucket_path, datetime_, args.model_name)
+        model_dir = '{}/{}'.format(bucket_path, datetime_)
     else:
-        model_path = '{}/{}'.format(datetime_, args.model_name)
+        model_dir = datetime_
 
     bucket = storage.Client().bucket(bucket_name)
-    blob = bucket.blob(model_path)
-    blob.upload_from_filename(args.model_name)
+    for file_name in file_names:
+        upload_file(bucket, '{}/{}'.format(model_dir, file_name), file_name)
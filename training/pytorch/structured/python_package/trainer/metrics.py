@@ -0,0 +1,108 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the \"License\");
+# you may not use this file except in compliance with the License.\n",
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an \"AS IS\" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+import torch
+import torch.distributed as dist
+
+
+class MetricsAccumulator(object):
+    def __init__(self):
+        """Accumulates running sums of metrics on the device of the metrics.
+        Calling `.item()` on a metric of every batch waits for the device to
+        finish the batch; the sums are only copied to the host (and the host
+        waits for the device) when `results` is called, e.g. at logging
+        intervals and at the end of an epoch.
+        """
+        self.reset()
+
+    def reset(self):
+        """Resets the sums, the counts and the timer."""
+        self._sums = {}
+        self.num_batches = 0
+        self.num_samples = 0
+        self.start_time = time.time()
+
+    def update(self, num_samples, **metrics):
+        """Adds the metrics of a batch to the sums.
+
+        Args:
+          num_samples: The number of samples in the batch.
+          **metrics: The tensors of the batch metrics, by name.
+        """
+        for name, value in metrics.items():
+            value = value.detach()
+            if name in self._sums:
+                self._sums[name] += value
+            else:
+                self._sums[name] = value.clone()
+        self.num_batches += 1
+        self.num_samples += num_samples
+
+    def results(self, all_reduce=False, names=None):
+        """Copies the sums to the host in a single transfer.
+
+        Args:
+          all_reduce: If True, and the process is part of a distributed job,
+            sums the metrics and the counts of all the processes. Every
+            process must call `results` with the same metrics.
+          names: The names of the metrics, whose sums are 0 if no batch was
+            added. Defaults to the metrics of the added batches. Set it when
+            a process of a distributed job may have no batches, e.g. with an
+            unpadded test set.
+
+        Returns:
+          A dict with the sum of each metric, the number of batches and
+          samples, the elapsed time (in seconds) since the last reset, and
+          the number of samples per second.
+        """
+        # Sort the names so the metrics are in the same order on every
+        # process.
+        names = sorted(self._sums if names is None else names)
+        distributed = (all_reduce and dist.is_available() and
+                       dist.is_initialized())
+        if self._sums:
+            device = next(iter(self._sums.values())).device
+        elif distributed and dist.get_backend() == 'nccl':
+            device = torch.device('cuda', torch.cuda.current_device())
+        else:
+            device = torch.device('cpu')
+        values = [
+            self._sums[name].to(torch.float64) if name in self._sums
+            else torch.zeros((), dtype=torch.float64, device=device)
+            for name in names
+        ]
+        num_batches, num_samples = self.num_batches, self.num_samples
+        if distributed:
+            values.append(torch.tensor(
+                [num_batches, num_samples], dtype=torch.float64,
+                device=device))
+            reduced = torch.cat([value.reshape(-1) for value in values])
+            dist.all_reduce(reduced)
+            values = reduced.tolist()
+            num_batches, num_samples = int(values[-2]), int(values[-1])
+            values = values[:-2]
+        elif values:
+            values = torch.stack(values).tolist()
+
+        results = dict(zip(names, values))
+        elapsed_time = time.time() - self.start_time
+        results.update({
+            'num_batches': num_batches,
+            'num_samples': num_samples,
+            'elapsed_time': elapsed_time,
+            'samples_per_sec': num_samples / max(elapsed_time, 1e-9),
+        })
+        return results
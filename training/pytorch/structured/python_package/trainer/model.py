@@ -12,10 +12,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
+import copy
+
+import torch
 import torch.optim as optim
 import torch.nn as nn
 
 
+# The dtype of the model parameters for each --precision. With bfloat16, the
+# parameters stay in float32 and autocast runs the operations in bfloat16.
+PRECISION_DTYPES = {
+    'float64': torch.float64,
+    'float32': torch.float32,
+    'bfloat16': torch.float32,
+}
+
+
 # Specify the Deep Neural model
 class SequentialDNN(nn.Module):
     def __init__(self):
@@ -43,10 +56,53 @@ def create(args, device):
     Args:
       args: experiment parameters.
     """
-    sequential_model = SequentialDNN().double().to(device)
+    sequential_model = SequentialDNN().to(
+        device=device, dtype=PRECISION_DTYPES[args.precision])
     criterion = nn.BCEWithLogitsLoss()
     optimizer = optim.Adam(sequential_model.parameters(),
                            lr=args.learning_rate,
                            weight_decay=args.weight_decay)
 
     return sequential_model, criterion, optimizer
+
+
+def autocast(precision, device):
+    """Returns the context in which to run the forward pass and the loss. With
+    bfloat16 precision, autocast runs the operations in bfloat16 (on CPU, or
+    on GPUs that support it).
+
+    Args:
+      precision: the --precision of the experiment.
+      device: PyTorch device on which the model runs.
+    """
+    if precision != 'bfloat16':
+        return contextlib.nullcontext()
+    return torch.autocast(torch.device(device).type, dtype=torch.bfloat16)
+
+
+def script(sequential_model):
+    """Returns a TorchScript version of the model for CPU inference, frozen
+    and optimized for inference. It can be loaded with `torch.jit.load`,
+    without the `SequentialDNN` class.
+
+    Args:
+      sequential_model: the trained model.
+    """
+    cpu_model = copy.deepcopy(sequential_model).cpu().eval()
+    return torch.jit.optimize_for_inference(
+        torch.jit.freeze(torch.jit.script(cpu_model)))
+
+
+def quantize(sequential_model):
+    """Returns a TorchScript version of the model for CPU inference, with the
+    weights of the linear layers dynamically quantized to int8. The model is
+    converted to float32 first, since dynamic quantization only supports
+    float32 inputs.
+
+    Args:
+      sequential_model: the trained model.
+    """
+    float_model = copy.deepcopy(sequential_model).cpu().float().eval()
+    quantized_model = torch.quantization.quantize_dynamic(
+        float_model, {nn.Linear}, dtype=torch.qint8)
+    return torch.jit.freeze(torch.jit.script(quantized_model))
@@ -17,9 +17,12 @@ import argparse
 from trainer import experiment
 
 
-def get_args():
+def get_args(argv=None):
     """Define the task arguments with the default values.
 
+    Args:
+        argv: the arguments to parse. Defaults to the command line arguments.
+
     Returns:
         experiment parameters
     """
@@ -36,6 +39,86 @@ def get_args():
         help='GCS or local paths to evaluation data',
         nargs='+',
         required=True)
+    args_parser.add_argument(
+        '--dataset-format',
+        help="""
+        How the datasets are served to the data loaders. `rows` builds the
+        tensors of each row when it is loaded. `columnar` converts the
+        dataframe once into contiguous tensors and loads whole batches by
+        index-slicing them. `streaming` reads the files in chunks and streams
+        the batches, without loading the datasets in memory.
+        """,
+        choices=['rows', 'columnar', 'streaming'],
+        default='rows')
+    args_parser.add_argument(
+        '--preload-to-device',
+        help="""
+        If set, the columnar dataset tensors are copied once to the PyTorch
+        device (e.g. the GPU) instead of copying each batch when it is loaded.
+        Only used with --dataset-format=columnar.
+        """,
+        action='store_true')
+    args_parser.add_argument(
+        '--read-chunk-size',
+        help="""
+        Number of rows read at once from the csv files.
+        Only used with --dataset-format=streaming.
+        """,
+        type=int,
+        default=10000)
+    args_parser.add_argument(
+        '--shuffle-buffer-size',
+        help="""
+        Number of rows kept in memory to shuffle the training data.
+        Only used with --dataset-format=streaming.
+        """,
+        type=int,
+        default=10000)
+
+    # Data loader arguments
+    args_parser.add_argument(
+        '--num-workers',
+        help="""
+        Number of worker processes loading the data. Defaults to one less than
+        the number of available CPUs, up to 8. Set to 0 to load the data in
+        the training process.
+        """,
+        type=int)
+    args_parser.add_argument(
+        '--prefetch-factor',
+        help="""
+        Number of batches loaded in advance by each worker. Defaults to 2.
+        Requires PyTorch 1.7 or later.
+        """,
+        type=int)
+    args_parser.add_argument(
+        '--pin-memory',
+        help="""
+        Load the batches in page-locked memory, for faster copies to the GPU.
+        Defaults to True if CUDA is available.
+        """,
+        action='store_const',
+        const=True)
+    args_parser.add_argument(
+        '--no-pin-memory',
+        help='Do not load the batches in page-locked memory.',
+        dest='pin_memory',
+        action='store_const',
+        const=False)
+    args_parser.add_argument(
+        '--persistent-workers',
+        help="""
+        Keep the worker processes alive between epochs. Defaults to True if
+        there are workers, with PyTorch 1.7 or later.
+        """,
+        action='store_const',
+        const=True)
+    args_parser.add_argument(
+        '--no-persistent-workers',
+        help='Start new worker processes for every epoch.',
+        dest='persistent_workers',
+        action='store_const',
+        const=False)
 
     # Experiment arguments
     args_parser.add_argument(
@@ -71,7 +154,28 @@ def get_args():
         default=True,
     )
 
+    # Distributed training arguments
+    args_parser.add_argument(
+        '--distributed',
+        help="""
+        If set, trains with DistributedDataParallel, one process per machine
+        (or per GPU). The cluster is read from the RANK, WORLD_SIZE,
+        MASTER_ADDR and MASTER_PORT environment variables (e.g. set by
+        torchrun), or from the CLUSTER_SPEC / TF_CONFIG environment variable
+        on AI Platform. Not supported with --dataset-format=streaming.
+        """,
+        action='store_true')
+
     # Estimator arguments
+    args_parser.add_argument(
+        '--precision',
+        help="""
+        Floating point precision of the model and the data. With bfloat16, the
+        model parameters are float32 and the operations run in bfloat16 with
+        autocast.
+        """,
+        choices=['float64', 'float32', 'bfloat16'],
+        default='float64')
     args_parser.add_argument(
         '--learning-rate',
         help='Learning rate value for the optimizers.',
@@ -103,13 +207,48 @@ def get_args():
     # Saved model arguments
     args_parser.add_argument(
         '--job-dir',
-        help='GCS location to export models')
+        help='GCS or local location to export models')
+    args_parser.add_argument(
+        '--checkpoint-epochs',
+        help="""
+        Save a checkpoint (model, optimizer, epoch and random number generator
+        states) every N epochs in the `checkpoints` directory of --job-dir,
+        and resume from the latest one when the job starts. The checkpoints
+        are uploaded in the background. If set to 0 (default), no checkpoints
+        are saved.
+        """,
+        type=int,
+        default=0)
     args_parser.add_argument(
         '--model-name',
         help='The name of your saved model',
         default='model.pth')
+    args_parser.add_argument(
+        '--vocabularies-name',
+        help="""
+        The name of the json file that saves the vocabularies of the
+        categorical columns, next to the model. They are needed to encode the
+        categorical columns at serving time.
+        """,
+        default='vocabularies.json')
+    args_parser.add_argument(
+        '--export-torchscript',
+        help="""
+        If set, also saves a TorchScript version of the model for CPU
+        inference, frozen and optimized for inference (e.g.
+        model_scripted.pt for model.pth). Requires PyTorch 1.10 or later.
+        """,
+        action='store_true')
+    args_parser.add_argument(
+        '--export-quantized',
+        help="""
+        If set, also saves a TorchScript version of the model for CPU
+        inference, with the linear layers dynamically quantized to int8 (e.g.
+        model_int8.pt for model.pth). Its inputs must be float32.
+        """,
+        action='store_true')
 
-    return args_parser.parse_args()
+    return args_parser.parse_args(argv)
 
 
 def main():
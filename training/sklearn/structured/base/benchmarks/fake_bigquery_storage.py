@@ -0,0 +1,97 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""A local fake of the BigQuery Storage Read API, serving a DataFrame as
+Arrow record batches, to run utils.read_df_from_bigquery without a Google
+Cloud project:
+
+    client = FakeBigQueryReadClient(data_df)
+    data_df = utils.read_df_from_bigquery('project.dataset.table',
+                                          client=client)
+"""
+
+import collections
+
+import numpy as np
+import pyarrow as pa
+
+FakeStream = collections.namedtuple('FakeStream', ['name'])
+FakeArrowSchema = collections.namedtuple('FakeArrowSchema',
+                                         ['serialized_schema'])
+FakeReadSession = collections.namedtuple('FakeReadSession',
+                                         ['streams', 'arrow_schema'])
+
+
+class FakePage(object):
+    def __init__(self, batch):
+        self._batch = batch
+
+    def to_arrow(self):
+        return self._batch
+
+
+class FakeReadRowsStream(object):
+    def __init__(self, batches):
+        self._batches = batches
+
+    def rows(self, read_session=None):
+        return self
+
+    @property
+    def pages(self):
+        for batch in self._batches:
+            yield FakePage(batch)
+
+
+class FakeBigQueryReadClient(object):
+    def __init__(self, data_df, batch_size=10000, seed=42):
+        """Serves `data_df` as the rows of any table.
+
+        The selected fields and the sample percentage of the read options are
+        applied, the row restriction is ignored.
+
+        Args:
+          data_df: the pandas.DataFrame served as the rows of the table.
+          batch_size: the number of rows of each record batch.
+          seed: the seed of the random generator sampling the rows.
+        """
+        self._table = pa.Table.from_pandas(data_df, preserve_index=False)
+        self._batch_size = batch_size
+        self._rng = np.random.RandomState(seed)
+        self._streams = {}
+
+    def create_read_session(self, parent, read_session, max_stream_count=1):
+        table = self._table
+        read_options = read_session.read_options
+        if read_options.selected_fields:
+            table = table.select(list(read_options.selected_fields))
+        if read_options.sample_percentage:
+            mask = self._rng.random_sample(table.num_rows) * 100 < (
+                read_options.sample_percentage)
+            table = table.filter(pa.array(mask))
+
+        batches = table.to_batches(max_chunksize=self._batch_size)
+        num_streams = max(1, min(max_stream_count or 1, len(batches)))
+        streams = []
+        for index in range(num_streams):
+            stream = FakeStream(
+                '{}/streams/{}'.format(read_session.table, index))
+            self._streams[stream.name] = batches[index::num_streams]
+            streams.append(stream)
+        return FakeReadSession(
+            streams, FakeArrowSchema(table.schema.serialize().to_pybytes()))
+
+    def read_rows(self, name):
+        return FakeReadRowsStream(self._streams[name])
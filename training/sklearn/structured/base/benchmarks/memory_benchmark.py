@@ -0,0 +1,92 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Reports the peak RSS of the trainer for increasing numbers of rows, when
+the whole dataset is loaded in memory and with --streaming.
+
+Run from the `base` directory:
+
+    python -m benchmarks.memory_benchmark --num-rows 100000 1000000 4000000
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+
+from benchmarks.read_benchmark import write_synthetic_shards
+from trainer import task
+
+# The trainer arguments of each configuration, in addition to the input and
+# the job directory.
+CONFIGURATIONS = {
+    'random_forest': ['--estimator', 'random_forest'],
+    'sgd (streaming)': ['--estimator', 'sgd', '--streaming'],
+    'hist_gradient_boosting (streaming)': [
+        '--estimator', 'hist_gradient_boosting', '--streaming',
+        '--reservoir-size', '100000'],
+}
+
+
+def _run_configuration(argv, results):
+    task.run_experiment(task._parse_args(argv))
+    # ru_maxrss is in kilobytes on Linux.
+    results.put(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.)
+
+
+def run_configuration(argv):
+    """Trains one configuration in a new process, and returns its peak RSS
+    in MB."""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_run_configuration,
+                              args=(argv, results))
+    process.start()
+    peak_rss_mb = results.get()
+    process.join()
+    return peak_rss_mb
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-rows', type=int, nargs='+',
+                        default=[100000, 1000000, 4000000])
+    parser.add_argument('--num-shards', type=int, default=8)
+    args = parser.parse_args()
+
+    results = {}
+    for num_rows in args.num_rows:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_synthetic_shards(tmp_dir, num_rows, args.num_shards)
+            for name, configuration in CONFIGURATIONS.items():
+                argv = ['--input', os.path.join(tmp_dir, '*.csv'),
+                        '--job-dir', os.path.join(tmp_dir, 'job'),
+                        '--n-estimators', '10'] + configuration
+                results[name, num_rows] = run_configuration(argv)
+
+    print('\nPeak RSS (MB)')
+    print('{:<36}'.format('configuration') + ''.join(
+        '{:>12}'.format('{} rows'.format(num_rows))
+        for num_rows in args.num_rows))
+    for name in CONFIGURATIONS:
+        print('{:<36}'.format(name) + ''.join(
+            '{:>12.0f}'.format(results[name, num_rows])
+            for num_rows in args.num_rows))
+
+
+if __name__ == '__main__':
+    main()
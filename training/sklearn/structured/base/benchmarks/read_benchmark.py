@@ -0,0 +1,123 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Compares the time and the memory of utils.read_df_from_gcs, with and
+without its cache, to the serial, untyped reader it replaced, on a local
+directory of synthetic CSV shards. utils.read_df_from_bigquery reads the same
+rows from a local fake of the BigQuery Storage Read API.
+
+Run from the `base` directory:
+
+    python -m benchmarks.read_benchmark --num-rows 1000000 --num-shards 32
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from benchmarks.fake_bigquery_storage import FakeBigQueryReadClient
+from trainer import metadata
+from trainer import utils
+
+
+def synthetic_df(num_rows, rng):
+    """Returns `num_rows` taxi-shaped rows, with the columns of
+    metadata.CSV_COLUMN_DTYPES."""
+    columns = {}
+    for name, dtype in metadata.CSV_COLUMN_DTYPES.items():
+        if dtype == 'category':
+            vocabulary = np.array(['{}_{}'.format(name, i) for i in range(50)])
+            columns[name] = vocabulary[rng.randint(0, 50, num_rows)]
+        elif dtype.startswith('int'):
+            columns[name] = rng.randint(0, 2, num_rows)
+        else:
+            columns[name] = rng.random_sample(num_rows) * 100
+    return pd.DataFrame(columns)
+
+
+def write_synthetic_shards(directory, num_rows, num_shards, seed=42):
+    """Writes `num_rows` taxi-shaped rows in `num_shards` CSV files, with a
+    header row."""
+    rng = np.random.RandomState(seed)
+    for shard in range(num_shards):
+        synthetic_df(num_rows // num_shards, rng).to_csv(
+            os.path.join(directory, 'taxi_trips_{:05d}.csv'.format(shard)),
+            index=False)
+
+
+def read_df_serially(file_pattern):
+    """The previous read_df_from_gcs: reads the files one after the other, in
+    text mode, and infers the dtypes."""
+    df_list = []
+    for filepath in tf.io.gfile.glob(file_pattern):
+        with tf.io.gfile.GFile(filepath, 'r') as f:
+            df_list.append(pd.read_csv(f))
+    return pd.concat(df_list)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-rows', type=int, default=1000000)
+    parser.add_argument('--num-shards', type=int, default=32)
+    args = parser.parse_args()
+
+    readers = [
+        ('serial', read_df_serially),
+        ('parallel (c)',
+         lambda file_pattern: utils.read_df_from_gcs(file_pattern, 'c')),
+        ('parallel (pyarrow)',
+         lambda file_pattern: utils.read_df_from_gcs(file_pattern,
+                                                     'pyarrow')),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        write_synthetic_shards(tmp_dir, args.num_rows, args.num_shards)
+        file_pattern = os.path.join(tmp_dir, '*.csv')
+
+        # The first read parses the files and fills the cache, the second
+        # one memory-maps the cached data.
+        cache_dir = os.path.join(tmp_dir, 'cache')
+        utils.read_df_from_gcs(file_pattern, cache_dir=cache_dir)
+        readers.append(
+            ('cached (feather)',
+             lambda file_pattern: utils.read_df_from_gcs(
+                 file_pattern, cache_dir=cache_dir)))
+
+        # BigQuery serves the same rows from a local fake of the BigQuery
+        # Storage Read API, so only the Arrow to DataFrame conversion is
+        # measured.
+        client = FakeBigQueryReadClient(read_df_serially(file_pattern))
+        readers.append(
+            ('bigquery (fake)',
+             lambda file_pattern: utils.read_df_from_bigquery(
+                 'project.dataset.table', client=client)))
+
+        print('\n{:<20} {:>10} {:>12}'.format('reader', 'time (s)',
+                                             'memory (MB)'))
+        for name, reader in readers:
+            start = time.time()
+            data_df = reader(file_pattern)
+            elapsed = time.time() - start
+            memory = data_df.memory_usage(deep=True).sum() / 1024. / 1024.
+            print('{:<20} {:>10.2f} {:>12.0f}'.format(name, elapsed, memory))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Reports the time to train and to cross-validate the model for 1 to N
+CPUs, where N is the number of CPUs this process is allowed to use.
+
+Run from the `base` directory:
+
+    python -m benchmarks.scaling_benchmark --num-rows 200000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.read_benchmark import write_synthetic_shards
+from trainer import model
+from trainer import task
+from trainer import utils
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-rows', type=int, default=200000)
+    parser.add_argument('--estimator', default='random_forest')
+    parser.add_argument('--n-estimators', type=int, default=100)
+    parser.add_argument('--max-depth', type=int, default=10)
+    args = parser.parse_args()
+
+    max_jobs = utils.available_cpu_count()
+    n_jobs_list = sorted(
+        set([2 ** i for i in range(max_jobs.bit_length())] + [max_jobs]))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        write_synthetic_shards(tmp_dir, args.num_rows, 1)
+        dataset = utils.read_df_from_gcs(os.path.join(tmp_dir, '*.csv'))
+    x_train, y_train, x_val, y_val = utils.data_train_test_split(dataset)
+
+    results = []
+    for n_jobs in n_jobs_list:
+        arguments = task._parse_args([
+            '--input', 'unused', '--job-dir', 'unused',
+            '--estimator', args.estimator,
+            '--n-estimators', str(args.n_estimators),
+            '--max-depth', str(args.max_depth),
+            '--n-jobs', str(n_jobs)])
+        estimator = model.get_estimator(arguments)
+
+        start = time.time()
+        estimator.fit(x_train, y_train)
+        fit_time = time.time() - start
+
+        start = time.time()
+        utils.cross_val_score(estimator, x_val, y_val, n_jobs, cv=3)
+        cv_time = time.time() - start
+        results.append((n_jobs, fit_time, cv_time))
+
+    print('\n{:>6} {:>10} {:>8} {:>10} {:>8}'.format(
+        'CPUs', 'fit (s)', 'speedup', 'CV (s)', 'speedup'))
+    _, base_fit_time, base_cv_time = results[0]
+    for n_jobs, fit_time, cv_time in results:
+        print('{:>6} {:>10.2f} {:>8.2f} {:>10.2f} {:>8.2f}'.format(
+            n_jobs, fit_time, base_fit_time / fit_time, cv_time,
+            base_cv_time / cv_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Reports the size, the save time and the load time of a random forest for
+each compression of utils.dump_object.
+
+Run from the `base` directory:
+
+    python -m benchmarks.serialization_benchmark --n-estimators 100
+"""
+
+import argparse
+import importlib
+import os
+import tempfile
+import time
+
+import numpy as np
+from sklearn import ensemble
+
+from trainer import utils
+
+# The packages required by the compressions.
+REQUIRED_PACKAGES = {'lz4': 'lz4', 'zstd': 'zstandard'}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-rows', type=int, default=100000)
+    parser.add_argument('--n-estimators', type=int, default=100)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(42)
+    x = rng.random_sample((args.num_rows, 6)).astype(np.float32)
+    y = (x[:, 0] + rng.normal(scale=0.1, size=args.num_rows) > 0.5)
+    # Fully grown trees, as large as the random forests of real datasets.
+    estimator = ensemble.RandomForestClassifier(
+        n_estimators=args.n_estimators, n_jobs=-1).fit(x, y)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for compression in utils.COMPRESSIONS:
+            if compression in REQUIRED_PACKAGES:
+                try:
+                    importlib.import_module(REQUIRED_PACKAGES[compression])
+                except ImportError:
+                    print('{} is not installed, skipping {}.'.format(
+                        REQUIRED_PACKAGES[compression], compression))
+                    continue
+
+            path = os.path.join(tmp_dir, compression, 'model.joblib')
+            start = time.time()
+            utils.dump_object(estimator, path, compression=compression)
+            save_time = time.time() - start
+            size_mb = os.path.getsize(path) / 1024. / 1024.
+
+            load_modes = [None, 'r'] if compression == 'none' else [None]
+            for mmap_mode in load_modes:
+                start = time.time()
+                utils.load_object(path, mmap_mode=mmap_mode)
+                load_time = time.time() - start
+                name = compression + (' (mmap)' if mmap_mode else '')
+                results.append((name, size_mb, save_time, load_time))
+
+    print('\n{:<12} {:>10} {:>10} {:>10}'.format(
+        'compression', 'size (MB)', 'save (s)', 'load (s)'))
+    for name, size_mb, save_time, load_time in results:
+        print('{:<12} {:>10.1f} {:>10.2f} {:>10.2f}'.format(
+            name, size_mb, save_time, load_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Compares the time and the peak memory allocated by
+utils.data_train_test_split to the DataFrame-based split it replaced, on a
+synthetic DataFrame parsed with the dtypes of metadata.CSV_COLUMN_DTYPES.
+
+Run from the `base` directory:
+
+    python -m benchmarks.split_benchmark --num-rows 10000000
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+from sklearn import model_selection as ms
+
+from benchmarks.read_benchmark import synthetic_df
+from trainer import metadata
+from trainer import utils
+
+
+def data_train_test_split_copying(data_df):
+    """The previous data_train_test_split: selects the feature columns, splits
+    the DataFrames, then converts them to arrays, copying them each time."""
+    features, target = utils.features_and_target(data_df)
+    x_train, x_val, y_train, y_val = ms.train_test_split(features,
+                                                         target,
+                                                         test_size=0.2)
+    return x_train.values, y_train, x_val.values, y_val
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-rows', type=int, default=10000000)
+    args = parser.parse_args()
+
+    data_df = synthetic_df(args.num_rows, np.random.RandomState(42)).astype(
+        metadata.CSV_COLUMN_DTYPES)
+    data_mb = data_df.memory_usage(deep=True).sum() / 1024. / 1024.
+    print('DataFrame: {} rows, {:.0f} MB'.format(args.num_rows, data_mb))
+
+    splits = [
+        ('copying (previous)', data_train_test_split_copying),
+        ('index-based', utils.data_train_test_split),
+        ('index-based (stratified)',
+         lambda data_df: utils.data_train_test_split(data_df, stratify=True)),
+    ]
+    print('\n{:<26} {:>10} {:>12} {:>12}'.format(
+        'split', 'time (s)', 'output (MB)', 'peak (MB)'))
+    for name, split in splits:
+        # numpy reports its allocations to tracemalloc, so the peak includes
+        # the intermediate frames and arrays, but not data_df.
+        tracemalloc.start()
+        start = time.time()
+        x_train, y_train, x_val, y_val = split(data_df)
+        elapsed = time.time() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        output = sum(np.asarray(array).nbytes
+                     for array in (x_train, y_train, x_val, y_val))
+        print('{:<26} {:>10.2f} {:>12.0f} {:>12.0f}'.format(
+            name, elapsed, output / 1024. / 1024., peak / 1024. / 1024.))
+        del x_train, y_train, x_val, y_val
+
+
+if __name__ == '__main__':
+    main()
@@ -19,9 +19,11 @@ from setuptools import setup
 
 REQUIRED_PACKAGES = [
     'tensorflow==2.8.0',
-    'scikit-learn>=0.20.2',
+    'scikit-learn>=1.0',
     'pandas==1.4.1',
     'cloudml-hypertune',
+    'pyarrow',
+    'google-cloud-bigquery-storage',
 ]
 
 setup(
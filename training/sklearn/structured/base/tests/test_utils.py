@@ -0,0 +1,146 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Tests of the data readers of trainer/utils.py.
+
+Run from the `base` directory:
+
+    python -m pytest tests
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from benchmarks.fake_bigquery_storage import FakeBigQueryReadClient
+from trainer import metadata
+from trainer import utils
+
+
+def _taxi_df(num_rows):
+    """Returns `num_rows` rows with the columns of
+    metadata.CSV_COLUMN_DTYPES."""
+    columns = {}
+    for name, dtype in metadata.CSV_COLUMN_DTYPES.items():
+        if dtype == 'category':
+            columns[name] = ['{}_{}'.format(name, i % 3)
+                             for i in range(num_rows)]
+        elif dtype.startswith('int'):
+            columns[name] = np.arange(num_rows) % 2
+        else:
+            columns[name] = np.arange(num_rows) * 1.5
+    return pd.DataFrame(columns)
+
+
+class IsBigQueryTableTest(unittest.TestCase):
+
+    def test_table(self):
+        self.assertTrue(utils.is_bigquery_table('project.dataset.table'))
+        self.assertTrue(utils.is_bigquery_table('my-project.dataset.table'))
+
+    def test_file_patterns(self):
+        for path in ['gs://bucket/project.dataset.table',
+                     'data/project.dataset.table',
+                     'data/*.csv',
+                     'taxi_trips.csv']:
+            self.assertFalse(utils.is_bigquery_table(path), path)
+
+    def test_missing_file_with_a_data_file_suffix(self):
+        self.assertFalse(utils.is_bigquery_table('data.train.csv'))
+        self.assertFalse(utils.is_bigquery_table('data.train.csv.gz'))
+
+    def test_existing_file(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.chdir(tmp_dir)
+            try:
+                open('project.dataset.table', 'w').close()
+                self.assertFalse(
+                    utils.is_bigquery_table('project.dataset.table'))
+            finally:
+                os.chdir(cwd)
+
+
+class ArrowTableToDfTest(unittest.TestCase):
+
+    def test_dtypes(self):
+        table = pa.Table.from_pandas(_taxi_df(6), preserve_index=False)
+        data_df = utils._arrow_table_to_df(table)
+        for name, dtype in metadata.CSV_COLUMN_DTYPES.items():
+            self.assertEqual(str(data_df[name].dtype), dtype, name)
+
+    def test_integer_column_with_nulls(self):
+        table = pa.table({
+            'tip': pa.array([1, None, 0], type=pa.int64()),
+            'trip_start_hour': pa.array([3, 4, 5], type=pa.int64()),
+        })
+        data_df = utils._arrow_table_to_df(table)
+        self.assertEqual(data_df['tip'].dtype, np.float32)
+        self.assertTrue(np.isnan(data_df['tip'][1]))
+        self.assertEqual(data_df['trip_start_hour'].dtype, np.int32)
+
+
+class ReadDfFromBigQueryTest(unittest.TestCase):
+
+    def test_read(self):
+        client = FakeBigQueryReadClient(_taxi_df(100), batch_size=7)
+        data_df = utils.read_df_from_bigquery(
+            'project.dataset.table', max_streams=3, client=client)
+        self.assertEqual(len(data_df), 100)
+        self.assertEqual(list(data_df.columns),
+                         metadata.FEATURE_NAMES + [metadata.TARGET_NAME])
+        self.assertEqual(data_df['trip_start_hour'].dtype, np.int32)
+
+    def test_num_samples(self):
+        client = FakeBigQueryReadClient(_taxi_df(100), batch_size=7)
+        data_df = utils.read_df_from_bigquery(
+            'project.dataset.table', num_samples=10, max_streams=3,
+            client=client)
+        self.assertEqual(len(data_df), 10)
+
+
+class ReadDfChunksFromGcsTest(unittest.TestCase):
+
+    def test_read(self):
+        data_df = _taxi_df(25)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for index, (start, end) in enumerate([(0, 10), (10, 25)]):
+                file_path = os.path.join(tmp_dir, 'taxi_{}.csv'.format(index))
+                if metadata.CSV_COLUMNS is None:
+                    data_df[start:end].to_csv(file_path, index=False)
+                else:
+                    data_df[start:end][metadata.CSV_COLUMNS].to_csv(
+                        file_path, index=False, header=False)
+
+            chunks = list(utils.read_df_chunks_from_gcs(
+                os.path.join(tmp_dir, '*.csv'), chunk_size=4))
+
+        self.assertEqual(sorted(len(chunk) for chunk in chunks),
+                         [2, 3, 4, 4, 4, 4, 4])
+        read_df = pd.concat(chunks).sort_values('trip_miles')
+        self.assertEqual(
+            sorted(read_df.columns),
+            sorted(metadata.FEATURE_NAMES + [metadata.TARGET_NAME]))
+        self.assertEqual(read_df['trip_start_hour'].dtype, np.int32)
+        np.testing.assert_array_equal(read_df['trip_miles'],
+                                      data_df['trip_miles'])
+
+
+if __name__ == '__main__':
+    unittest.main()
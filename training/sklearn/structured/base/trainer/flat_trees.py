@@ -0,0 +1,204 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Flattened decision trees, evaluated with vectorized NumPy operations.
+
+The nodes of all the trees of a model are stored in a few flat arrays, saved
+in a .npz file. Predicting only needs NumPy: all the rows walk down all the
+trees together, one level at a time, instead of one tree after the other.
+"""
+
+import os
+
+import numpy as np
+
+# The file name of the flattened trees, next to the model.
+FLAT_TREES_FILE_NAME = 'model.npz'
+
+
+class FlatTrees(object):
+    """The trees of a model, as flat arrays of nodes.
+
+    Node i splits on the feature feature[i]: the rows whose value is less
+    than threshold[i] go to the node left[i], the others to the node
+    right[i], and the missing values go to the left if default_left[i]. The
+    leaves are their own children, so all the rows can walk down max_depth
+    levels. The score of a tree is the value of the leaf reached, and the
+    scores of the trees are summed or averaged (aggregation), added to
+    base_score, and transformed by the link function.
+    """
+
+    def __init__(self, roots, feature, threshold, left, right, default_left,
+                 value, max_depth, classes, aggregation='mean', link='identity',
+                 base_score=0.):
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float32)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.value = np.asarray(value)
+        self.max_depth = int(max_depth)
+        self.classes = np.asarray(classes)
+        self.aggregation = str(aggregation)
+        self.link = str(link)
+        self.base_score = float(base_score)
+
+    def leaves(self, X):
+        """Returns the index of the leaf reached by each row in each tree.
+
+        Args:
+          X: (numpy.ndarray) features, converted to float32
+
+        Returns:
+          numpy.ndarray of shape (number of rows, number of trees)
+        """
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, np.newaxis]
+        nodes = np.repeat(self.roots[np.newaxis, :], len(X), axis=0)
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = x < self.threshold[nodes]
+            missing = np.isnan(x)
+            if missing.any():
+                go_left = np.where(missing, self.default_left[nodes], go_left)
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        """Returns the probabilities of the classes of each row."""
+        scores = self.value[self.leaves(X)].sum(axis=1)
+        if self.aggregation == 'mean':
+            scores /= len(self.roots)
+        scores += self.base_score
+        if self.link == 'sigmoid':
+            # Binary classification, on the margin of the positive class.
+            positive = 1. / (1. + np.exp(-scores[:, 0]))
+            return np.stack([1. - positive, positive], axis=1)
+        return scores
+
+    def predict(self, X):
+        """Returns the predicted class of each row."""
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+    def save(self, file):
+        """Saves the arrays in a .npz file, or file object."""
+        np.savez(file, roots=self.roots, feature=self.feature,
+                 threshold=self.threshold, left=self.left, right=self.right,
+                 default_left=self.default_left, value=self.value,
+                 max_depth=self.max_depth, classes=self.classes,
+                 aggregation=self.aggregation, link=self.link,
+                 base_score=self.base_score)
+
+    @classmethod
+    def load(cls, file):
+        """Loads the arrays saved by save."""
+        with np.load(file) as arrays:
+            return cls(**{name: arrays[name] for name in arrays.files})
+
+
+def _float32_upper_bounds(thresholds):
+    """Returns the float32 bounds u, such that x <= threshold if and only if
+    x < u, for all the float32 values x."""
+    below = thresholds.astype(np.float32)
+    below = np.where(below > thresholds,
+                     np.nextafter(below, np.float32(-np.inf)), below)
+    return np.nextafter(below, np.float32(np.inf))
+
+
+def from_sklearn(estimator):
+    """Flattens the trees of a scikit-learn forest or decision tree classifier.
+
+    Args:
+      estimator: a fitted RandomForestClassifier, ExtraTreesClassifier or
+        DecisionTreeClassifier with a single output
+
+    Returns:
+      FlatTrees, predicting the same probabilities as the estimator
+    """
+    trees = getattr(estimator, 'estimators_', [estimator])
+    if (not hasattr(estimator, 'classes_') or
+            getattr(estimator, 'n_outputs_', 1) != 1 or
+            not all(hasattr(tree, 'tree_') for tree in trees)):
+        raise ValueError(
+            'Only the forests and the decision trees classifiers with a '
+            'single output can be flattened, not {}'.format(
+                type(estimator).__name__))
+
+    arrays = {name: [] for name in ('feature', 'threshold', 'left', 'right',
+                                    'default_left', 'value')}
+    roots = []
+    offset = 0
+    for decision_tree in trees:
+        tree = decision_tree.tree_
+        nodes = np.arange(tree.node_count)
+        leaf = tree.children_left == -1
+        roots.append(offset)
+        arrays['feature'].append(np.where(leaf, 0, tree.feature))
+        # scikit-learn sends the rows with x <= threshold to the left.
+        arrays['threshold'].append(_float32_upper_bounds(tree.threshold))
+        arrays['left'].append(np.where(leaf, nodes, tree.children_left) +
+                              offset)
+        arrays['right'].append(np.where(leaf, nodes, tree.children_right) +
+                               offset)
+        # Before scikit-learn 1.3, the trees don't support missing values:
+        # they go to the right, as NaN <= threshold is False.
+        arrays['default_left'].append(getattr(
+            tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=bool)))
+        # The class counts (or fractions) of each node, as probabilities.
+        value = tree.value[:, 0, :]
+        arrays['value'].append(value / value.sum(axis=1, keepdims=True))
+        offset += tree.node_count
+
+    return FlatTrees(
+        roots=roots,
+        max_depth=max(decision_tree.tree_.max_depth
+                      for decision_tree in trees),
+        classes=estimator.classes_,
+        aggregation='mean',
+        **{name: np.concatenate(values) for name, values in arrays.items()})
+
+
+class FlatTreesPredictor(object):
+    """Predicts with the flattened trees of a model.
+
+    It implements the interface of the custom prediction routines of AI
+    Platform Prediction, and can also be used locally:
+
+        predictor = FlatTreesPredictor.from_path('trained/model')
+        predictor.predict([[1.1, 420, 625, 8, 16, 3]])
+    """
+
+    def __init__(self, flat_trees):
+        self._flat_trees = flat_trees
+
+    def predict(self, instances, **kwargs):
+        """Returns the predicted class of each instance, as the predictions of
+        the scikit-learn model served by AI Platform Prediction.
+
+        Args:
+          instances: (List[List[float]]) the features of each instance
+          **kwargs: unused
+
+        Returns:
+          List of the predicted classes
+        """
+        return self._flat_trees.predict(instances).tolist()
+
+    @classmethod
+    def from_path(cls, model_dir):
+        """Loads the flattened trees of the model directory."""
+        return cls(FlatTrees.load(os.path.join(model_dir,
+                                               FLAT_TREES_FILE_NAME)))
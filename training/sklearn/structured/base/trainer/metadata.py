@@ -19,9 +19,37 @@
 # Otherwise, set CSV_COLUMNS to a list of target and feature names:
 CSV_COLUMNS = None
 
+# The dtypes of the columns, used to parse the CSV files without inferring
+# them, and with less memory than the default int64, float64 and object
+# dtypes. The dtypes of the columns missing from the dictionary are inferred.
+# Numeric columns with missing values must be float.
+CSV_COLUMN_DTYPES = {
+    'tip': 'int32',
+    'trip_miles': 'float32',
+    'trip_seconds': 'float32',
+    'fare': 'float32',
+    'trip_start_month': 'int32',
+    'trip_start_hour': 'int32',
+    'trip_start_day': 'int32',
+    'pickup_community_area': 'category',
+    'dropoff_community_area': 'category',
+    'pickup_census_tract': 'category',
+    'dropoff_census_tract': 'category',
+    'pickup_latitude': 'float32',
+    'pickup_longitude': 'float32',
+    'dropoff_latitude': 'float32',
+    'dropoff_longitude': 'float32',
+    'payment_type': 'category',
+    'company': 'category',
+}
+
 # Target name
 TARGET_NAME = 'tip'
 
+# The classes of the target. Needed to train the classifiers incrementally,
+# as the first chunks of data may not include all of them.
+TARGET_CLASSES = [0, 1]
+
 # The features to be used for training.
 # If FEATURE_NAMES is None, then all the available columns will be
 # used as features, except for the target column.
@@ -41,10 +69,8 @@ MODEL_FILE_NAME = 'model.joblib'
 # Set to True if you want to tune some hyperparameters
 HYPERPARAMTER_TUNING = True
 
-# Used only if the dataset is to be read from BigQuery
-BASE_QUERY = '''
-    SELECT
-      *
-    FROM
-      `{table}`
-  '''
+# Used only if the dataset is to be read from BigQuery.
+# Filter of the rows of the table, applied by BigQuery when the table is read,
+# as the WHERE clause of a SQL query, e.g. "trip_miles > 0".
+# If empty, all the rows are read.
+BIGQUERY_ROW_RESTRICTION = ''
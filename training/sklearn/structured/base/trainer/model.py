@@ -15,12 +15,18 @@
 
 """ML model definitions."""
 
+from sklearn import cluster
 from sklearn import ensemble
+from sklearn import linear_model
+from sklearn import naive_bayes
 
 
 def get_estimator(arguments):
     """Generate ML Pipeline which include both pre-processing and model training
 
+    The sgd, naive_bayes and minibatch_kmeans estimators support
+    `partial_fit`, and can be trained incrementally with --streaming.
+
     Args:
       arguments: (argparse.ArgumentParser), parameters passed from command-line
 
@@ -28,11 +34,25 @@ def get_estimator(arguments):
       structured.pipeline.Pipeline
     """
 
+    if arguments.estimator == 'sgd':
+        return linear_model.SGDClassifier()
+    if arguments.estimator == 'naive_bayes':
+        # The features must be non-negative, e.g. counts.
+        return naive_bayes.MultinomialNB()
+    if arguments.estimator == 'minibatch_kmeans':
+        return cluster.MiniBatchKMeans()
+    if arguments.estimator == 'hist_gradient_boosting':
+        return ensemble.HistGradientBoostingClassifier(
+            max_iter=arguments.n_estimators,
+            max_depth=arguments.max_depth,
+        )
+
     # n_estimators and max_depth are expected to be passed as
     # command line argument to task.py
     classifier = ensemble.RandomForestClassifier(
         n_estimators=arguments.n_estimators,
         max_depth=arguments.max_depth,
+        n_jobs=arguments.n_jobs,
     )
 
     return classifier
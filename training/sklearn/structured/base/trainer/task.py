@@ -22,13 +22,25 @@ import os
 import hypertune
 import numpy as np
 from datetime import datetime
-from sklearn import model_selection
+from sklearn import base
+from trainer import flat_trees
 from trainer import metadata
 from trainer import model
 from trainer import utils
 
+# The default name of the metric is training/hptuning/metric.
+# We recommend that you assign a custom name
+# The only functional difference is that if you use a custom name,
+# you must set the hyperparameterMetricTag value in the
+# HyperparameterSpec object in the job request to match your chosen name
+METRIC_TAG = 'my_metric_tag'
+# The score of the clustering estimators (minibatch_kmeans) is the negative
+# inertia, not an accuracy, so it is reported under its own tag.
+CLUSTERING_METRIC_TAG = 'negative_inertia'
 
-def _train_and_evaluate(estimator, dataset, output_dir):
+
+def _train_and_evaluate(estimator, dataset, output_dir, n_jobs,
+                        compression=None, export_flat_trees=False):
     """Runs model training and evaluation.
 
     Args:
@@ -36,6 +48,10 @@ def _train_and_evaluate(estimator, dataset, output_dir):
         steps and model training
       dataset: (pandas.DataFrame), DataFrame containing training data
       output_dir: (string), directory that the trained model will be exported
+      n_jobs: (int), number of CPUs used by the cross-validation
+      compression: (string), compression of the exported model
+      export_flat_trees: (bool), whether to also export the flattened trees
+        of the model
 
     Returns:
       None
@@ -47,42 +63,129 @@ def _train_and_evaluate(estimator, dataset, output_dir):
     model_output_path = os.path.join(output_dir, 'model',
                                      metadata.MODEL_FILE_NAME)
 
-    utils.dump_object(estimator, model_output_path)
+    utils.dump_object(estimator, model_output_path,
+                      compression=compression)
+
+    if export_flat_trees:
+        utils.save_flat_trees(
+            flat_trees.from_sklearn(estimator),
+            os.path.join(output_dir, 'model', flat_trees.FLAT_TREES_FILE_NAME))
 
     if metadata.HYPERPARAMTER_TUNING:
         # Note: for now, use `cross_val_score` defaults (i.e. 3-fold)
-        scores = model_selection.cross_val_score(estimator, x_val, y_val, cv=3)
+        scores = utils.cross_val_score(estimator, x_val, y_val, n_jobs,
+                                       cv=3)
 
         logging.info('Scores: %s', scores)
 
-        # The default name of the metric is training/hptuning/metric.
-        # We recommend that you assign a custom name
-        # The only functional difference is that if you use a custom name,
-        # you must set the hyperparameterMetricTag value in the
-        # HyperparameterSpec object in the job request to match your chosen name
-        hpt = hypertune.HyperTune()
-        hpt.report_hyperparameter_tuning_metric(
-            hyperparameter_metric_tag='my_metric_tag',
-            metric_value=np.mean(scores),
-            global_step=1000)
+        _report_metric(estimator, np.mean(scores))
+
+
+def _train_and_evaluate_incrementally(estimator, chunks, output_dir,
+                                      compression=None):
+    """Runs incremental model training and progressive evaluation.
+
+    Each chunk is used to evaluate the model trained on the previous chunks,
+    before the model is trained on it with `partial_fit`, so only one chunk
+    is held in memory.
+
+    Args:
+      estimator: an estimator supporting `partial_fit`
+      chunks: (Iterable[pandas.DataFrame]), chunks of the training data
+      output_dir: (string), directory that the trained model will be exported
+      compression: (string), compression of the exported model
+
+    Returns:
+      None
+    """
+    scores = []
+    for index, chunk in enumerate(chunks):
+        x_chunk, y_chunk = utils.features_and_target(chunk)
+        x_chunk = x_chunk.values
+        if index > 0:
+            scores.append(estimator.score(x_chunk, y_chunk))
+        if base.is_classifier(estimator):
+            estimator.partial_fit(x_chunk, y_chunk,
+                                  classes=metadata.TARGET_CLASSES)
+        else:
+            estimator.partial_fit(x_chunk, y_chunk)
+        logging.debug('Trained on chunk %d (%d rows)', index, len(chunk))
+
+    # Write model and eval metrics to `output_dir`
+    model_output_path = os.path.join(output_dir, 'model',
+                                     metadata.MODEL_FILE_NAME)
+
+    utils.dump_object(estimator, model_output_path,
+                      compression=compression)
+
+    if metadata.HYPERPARAMTER_TUNING and scores:
+        logging.info('Progressive validation score: %s', np.mean(scores))
+
+        _report_metric(estimator, np.mean(scores))
+
+
+def _report_metric(estimator, metric_value):
+    """Reports the evaluation metric for hyperparameter tuning, under
+    METRIC_TAG for the classifiers and CLUSTERING_METRIC_TAG for the
+    clustering estimators."""
+    metric_tag = METRIC_TAG
+    if isinstance(estimator, base.ClusterMixin):
+        metric_tag = CLUSTERING_METRIC_TAG
+    hpt = hypertune.HyperTune()
+    hpt.report_hyperparameter_tuning_metric(
+        hyperparameter_metric_tag=metric_tag,
+        metric_value=metric_value,
+        global_step=1000)
 
 
 def run_experiment(arguments):
     """Testbed for running model training and evaluation."""
     # Get data for training and evaluation
 
+    if arguments.n_jobs is None:
+        arguments.n_jobs = utils.available_cpu_count()
     logging.info('Arguments: %s', arguments)
 
-    dataset = utils.read_df_from_gcs(arguments.input)
-
     # Get estimator
     estimator = model.get_estimator(arguments)
 
+    if arguments.streaming:
+        if utils.is_bigquery_table(arguments.input):
+            raise ValueError('--streaming only supports CSV files.')
+        chunks = utils.read_df_chunks_from_gcs(arguments.input,
+                                               arguments.chunk_size)
+        if hasattr(estimator, 'partial_fit'):
+            _train_and_evaluate_incrementally(estimator, chunks,
+                                              arguments.job_dir,
+                                              arguments.model_compression)
+            return
+        # The other estimators are trained on a sample of the data that
+        # fits in memory.
+        dataset = utils.reservoir_sample(chunks, arguments.reservoir_size,
+                                         seed=arguments.seed)
+        _train_and_evaluate(estimator, dataset, arguments.job_dir,
+                            arguments.n_jobs, arguments.model_compression,
+                            arguments.export_flat_trees)
+        return
+
+    if utils.is_bigquery_table(arguments.input):
+        dataset = utils.read_df_from_bigquery(
+            arguments.input,
+            sample_percentage=arguments.bigquery_sample_percentage)
+    else:
+        dataset = utils.read_df_from_gcs(
+            arguments.input,
+            engine=arguments.csv_engine,
+            cache_dir=arguments.data_cache_dir,
+            max_cache_size_mb=arguments.data_cache_size_mb)
+
     # Run training and evaluation
-    _train_and_evaluate(estimator, dataset, arguments.job_dir)
+    _train_and_evaluate(estimator, dataset, arguments.job_dir,
+                        arguments.n_jobs, arguments.model_compression,
+                        arguments.export_flat_trees)
 
 
-def _parse_args():
+def _parse_args(argv=None):
     """Parses command-line arguments."""
 
     parser = argparse.ArgumentParser()
@@ -109,15 +212,128 @@ def _parse_args():
         required=True,
     )
 
+    parser.add_argument(
+        '--bigquery-sample-percentage',
+        help='''Percentage of the rows of the BigQuery table, sampled randomly
+              by BigQuery, to read. If not set, all the rows are read.
+            ''',
+        type=float,
+    )
+
+    parser.add_argument(
+        '--csv-engine',
+        help='''The pandas parser engine of the CSV files. The pyarrow engine
+              parses each file with multiple threads, and requires pyarrow.
+            ''',
+        choices=['c', 'pyarrow'],
+        default='c',
+    )
+
+    parser.add_argument(
+        '--data-cache-dir',
+        help='''Local directory caching the parsed training data as Feather
+              files. Later runs reading the same files (e.g. hyperparameter
+              tuning trials on the same machine) memory-map the cached data
+              instead of parsing the CSV files.
+            ''',
+    )
+
+    parser.add_argument(
+        '--data-cache-size-mb',
+        help='''Maximum size of --data-cache-dir, in MB. The least recently
+              used data is evicted first.
+            ''',
+        type=int,
+        default=10240,
+    )
+
+    parser.add_argument(
+        '--streaming',
+        help='''Train without loading the whole dataset in memory. Estimators
+              supporting `partial_fit` are trained incrementally on chunks of
+              --chunk-size rows, the other ones on a random sample of
+              --reservoir-size rows.
+            ''',
+        action='store_true',
+    )
+
+    parser.add_argument(
+        '--chunk-size',
+        help='Number of rows read at once with --streaming.',
+        type=int,
+        default=100000,
+    )
+
+    parser.add_argument(
+        '--reservoir-size',
+        help='''Number of rows sampled with --streaming, for the estimators
+              that don't support `partial_fit`.
+            ''',
+        type=int,
+        default=1000000,
+    )
+
+    parser.add_argument(
+        '--seed',
+        help='Random seed of the sampling of the rows with --streaming.',
+        type=int,
+        default=42,
+    )
+
     parser.add_argument(
         '--job-dir',
         help='Output directory for exporting model and other metadata.',
         required=True,
     )
 
+    parser.add_argument(
+        '--estimator',
+        help='''The estimator to train. sgd, naive_bayes and minibatch_kmeans
+              support `partial_fit`.
+            ''',
+        choices=[
+            'random_forest',
+            'hist_gradient_boosting',
+            'sgd',
+            'naive_bayes',
+            'minibatch_kmeans',
+        ],
+        default='random_forest',
+    )
+
+    parser.add_argument(
+        '--model-compression',
+        help='''Compression of the exported model. Uncompressed
+              models load fastest, as their arrays can be memory-mapped.
+              lz4 requires the lz4 package, and zstd the zstandard package
+              and this trainer's utils module (also when the model is loaded),
+              so zstd models can't be served by AI Platform Prediction.
+            ''',
+        choices=utils.COMPRESSIONS,
+        default='none',
+    )
+
+    parser.add_argument(
+        '--export-flat-trees',
+        help='''Also export the trees of the model flattened in arrays of
+              nodes, as model.npz, for the vectorized NumPy evaluator of
+              flat_trees.py. Only for --estimator random_forest.
+            ''',
+        action='store_true',
+    )
+
+    parser.add_argument(
+        '--n-jobs',
+        help='''Number of CPUs used to train the model and to cross-validate
+              it. Defaults to the CPUs this process is allowed to use, capped
+              by the CPU quota of its container.
+            ''',
+        type=int,
+    )
+
     parser.add_argument(
         '--n-estimators',
-        help='Number of trees in the forest.',
+        help='Number of trees in the forest (or of boosting iterations).',
         default=10,
         type=int,
     )
@@ -129,7 +345,7 @@ def _parse_args():
         default=3,
     )
 
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 
 def main():
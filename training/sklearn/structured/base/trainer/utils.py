@@ -15,95 +15,566 @@
 
 """Hold utility functions."""
 
+from concurrent import futures
+import hashlib
+import io
+import json
+import logging
+import math
 import os
-
+import re
+import shutil
+import tempfile
+import threading
+
+from google.cloud import bigquery_storage
+import joblib
+from joblib.compressor import CompressorWrapper
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
+import pyarrow as pa
+from pyarrow import feather
 import tensorflow as tf
 
+from sklearn import base
 from sklearn import model_selection as ms
-from sklearn.externals import joblib
 from trainer import metadata
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
-def data_train_test_split(data_df):
-    """Split the DataFrame two subsets for training and testing.
+# The compressions of dump_object. 'lz4' requires the lz4 package, 'zstd' the
+# zstandard package.
+COMPRESSIONS = ['none', 'zlib', 'lz4', 'zstd']
 
-    Args:
-      data_df: (pandas.DataFrame) DataFrame the splitting to be performed on
 
-    Returns:
-      A Tuple of (pandas.DataFrame, pandas.Series,
-                  pandas.DataFrame, pandas.Series)
+class ZstdCompressorWrapper(CompressorWrapper):
+    """joblib compressor writing Zstandard frames with the zstandard package.
+
+    joblib doesn't support Zstandard: it is registered as the 'zstd'
+    compressor when zstandard is installed. The loading process must also
+    import this module to load the files, so the models compressed with it
+    can't be served by AI Platform Prediction.
     """
 
+    def __init__(self):
+        CompressorWrapper.__init__(self, obj=None, prefix=b'\x28\xb5\x2f\xfd',
+                                   extension='.zst')
+
+    def compressor_file(self, fileobj, compresslevel=None):
+        # joblib.dump passes the path of the file, unless it was given a file
+        # object. Only the files opened here are closed with the stream.
+        closefd = isinstance(fileobj, str)
+        if closefd:
+            fileobj = open(fileobj, 'wb')
+        compressor = zstandard.ZstdCompressor(level=compresslevel or 3)
+        return compressor.stream_writer(fileobj, closefd=closefd)
+
+    def decompressor_file(self, fileobj):
+        closefd = isinstance(fileobj, str)
+        if closefd:
+            fileobj = open(fileobj, 'rb')
+        return zstandard.ZstdDecompressor().stream_reader(fileobj,
+                                                          closefd=closefd)
+
+
+if zstandard is not None:
+    joblib.register_compressor('zstd', ZstdCompressorWrapper(), force=True)
+
+
+def _feature_names(data_df):
+    """The names of the feature columns of the DataFrame."""
+
     if metadata.FEATURE_NAMES is None:
         # Use all the columns as features, except for the target column
         feature_names = list(data_df.columns)
         feature_names.remove(metadata.TARGET_NAME)
-        features = data_df[feature_names]
-    else:
-        # Only use metadata.FEATURE_NAMES
-        features = data_df[metadata.FEATURE_NAMES]
+        return feature_names
+    # Only use metadata.FEATURE_NAMES
+    return metadata.FEATURE_NAMES
+
+
+def features_and_target(data_df):
+    """Select the features and the target of the DataFrame.
+
+    Args:
+      data_df: (pandas.DataFrame) DataFrame containing training data
+
+    Returns:
+      A Tuple of (pandas.DataFrame, pandas.Series)
+    """
+
+    features = data_df[_feature_names(data_df)]
     target = data_df[metadata.TARGET_NAME]
+    return features, target
 
-    x_train, x_val, y_train, y_val = ms.train_test_split(features,
-                                                         target,
-                                                         test_size=0.2)
-    return x_train.values, y_train, x_val.values, y_val
 
+def data_train_test_split(data_df, test_size=0.2, stratify=False, seed=None,
+                          dtype=np.float32):
+    """Split the DataFrame two subsets for training and testing.
 
-def read_df_from_bigquery(full_table_path, project_id=None, num_samples=None):
-    """Read data from BigQuery and split into train and validation sets.
+    The features are copied once, column by column, in the rows of a
+    random permutation, into a single contiguous matrix. The training and
+    testing subsets are views of its first and last rows, so no intermediate
+    DataFrames or copies of the matrix are made.
 
     Args:
-      full_table_path: (string) full path of the table containing training data
+      data_df: (pandas.DataFrame) DataFrame the splitting to be performed on
+      test_size: (float) fraction of the rows used for testing
+      stratify: (bool) whether the subsets keep the proportions of the classes
+        of the target
+      seed: (int, Optional) seed of the random permutation of the rows
+      dtype: (numpy.dtype) dtype of the feature matrix
+
+    Returns:
+      A Tuple of (numpy.ndarray, numpy.ndarray,
+                  numpy.ndarray, numpy.ndarray)
+    """
+
+    feature_names = _feature_names(data_df)
+    target = data_df[metadata.TARGET_NAME].to_numpy()
+    num_rows = len(data_df)
+    num_val = int(math.ceil(num_rows * test_size))
+
+    if stratify:
+        splitter = ms.StratifiedShuffleSplit(n_splits=1, test_size=num_val,
+                                             random_state=seed)
+        train_index, val_index = next(
+            splitter.split(np.empty((num_rows, 0)), target))
+        permutation = np.concatenate([train_index, val_index])
+    else:
+        permutation = np.random.RandomState(seed).permutation(num_rows)
+
+    features = np.empty((num_rows, len(feature_names)), dtype=dtype)
+    for index, name in enumerate(feature_names):
+        features[:, index] = data_df[name].to_numpy()[permutation]
+    target = target[permutation]
+
+    num_train = num_rows - num_val
+    return (features[:num_train], target[:num_train],
+            features[num_train:], target[num_train:])
+
+
+# The suffixes of data files, whose names may look like BigQuery tables, e.g.
+# data.train.csv.
+_FILE_SUFFIXES = ('.csv', '.parquet', '.feather', '.json', '.avro', '.txt',
+                  '.gz')
+
+
+def is_bigquery_table(path):
+    """Check whether path is a BigQuery table rather than a file pattern.
+
+    Paths with a directory or a scheme (e.g. gs://), or ending with the suffix
+    of a data file, are never tables, even if the file doesn't exist.
+
+    Args:
+      path: (string) --input of the trainer, either a file pattern or a table
         in the format of [project_id.dataset_name.table_name].
-      project_id: (string, Optional) Google BigQuery Account project ID.
-      num_samples: (int, Optional) Number of data samples to read.
+
+    Returns:
+      bool
+    """
+
+    if '/' in path or path.lower().endswith(_FILE_SUFFIXES):
+        return False
+    return (re.match(r'^[\w.:-]+\.\w+\.\w+$', path) is not None and
+            not tf.io.gfile.glob(path))
+
+
+def _arrow_table_to_df(table):
+    """Convert an Arrow table to a DataFrame with the dtypes of
+    metadata.CSV_COLUMN_DTYPES.
+
+    The categorical columns are dictionary-encoded in Arrow, so their strings
+    are never converted to Python objects one row at a time. The integer
+    columns with NULLs are float32 columns, with NaNs.
+
+    Args:
+      table: (pyarrow.Table) table read from BigQuery.
 
     Returns:
       pandas.DataFrame
     """
 
-    query = metadata.BASE_QUERY.format(table=full_table_path)
-    limit = ' LIMIT {}'.format(num_samples) if num_samples else ''
-    query += limit
+    dtypes = {name: dtype for name, dtype in metadata.CSV_COLUMN_DTYPES.items()
+              if name in table.column_names}
+    for name, dtype in dtypes.items():
+        if dtype == 'category':
+            table = table.set_column(table.column_names.index(name), name,
+                                     table.column(name).dictionary_encode())
+    data_df = table.to_pandas()
+    # Arrow converts the integer columns with NULLs to float64, with NaNs,
+    # which can't be cast to an integer dtype: they are cast to float32.
+    return data_df.astype({
+        name: ('float32' if dtype.startswith('int') and
+               table.column(name).null_count else dtype)
+        for name, dtype in dtypes.items() if dtype != 'category'})
+
+
+def read_df_from_bigquery(full_table_path, project_id=None, num_samples=None,
+                          sample_percentage=None, max_streams=None,
+                          client=None):
+    """Read data from BigQuery with the BigQuery Storage Read API.
+
+    The rows are streamed as Arrow record batches from several streams in
+    parallel. Only the columns of metadata.FEATURE_NAMES and
+    metadata.TARGET_NAME are read, and the sampling and
+    metadata.BIGQUERY_ROW_RESTRICTION are applied by BigQuery.
+
+    Args:
+      full_table_path: (string) full path of the table containing training data
+        in the format of [project_id.dataset_name.table_name].
+      project_id: (string, Optional) Google Cloud project billed for the read.
+        Defaults to the project of the table.
+      num_samples: (int, Optional) Number of data samples to read. The streams
+        stop once they have read this number of rows.
+      sample_percentage: (float, Optional) Percentage of the rows of the table,
+        sampled randomly by BigQuery, to read.
+      max_streams: (int, Optional) Maximum number of streams read in parallel.
+        Defaults to the number of CPUs.
+      client: (bigquery_storage.BigQueryReadClient, Optional) Client of the
+        BigQuery Storage Read API, e.g. a fake one in tests.
+
+    Returns:
+      pandas.DataFrame
+    """
 
-    # Use "application default credentials"
-    # Use SQL syntax dialect
-    data_df = pd.read_gbq(query, project_id=project_id, dialect='standard')
+    table_project, dataset_name, table_name = full_table_path.rsplit('.', 2)
+    if client is None:
+        client = bigquery_storage.BigQueryReadClient()
+
+    # An empty list of selected fields reads all the columns.
+    selected_fields = []
+    if metadata.FEATURE_NAMES is not None:
+        selected_fields = metadata.FEATURE_NAMES + [metadata.TARGET_NAME]
+    read_options = bigquery_storage.types.ReadSession.TableReadOptions(
+        selected_fields=selected_fields,
+        row_restriction=metadata.BIGQUERY_ROW_RESTRICTION)
+    if sample_percentage:
+        read_options.sample_percentage = sample_percentage
+
+    session = client.create_read_session(
+        parent='projects/{}'.format(project_id or table_project),
+        read_session=bigquery_storage.types.ReadSession(
+            table='projects/{}/datasets/{}/tables/{}'.format(
+                table_project, dataset_name, table_name),
+            data_format=bigquery_storage.types.DataFormat.ARROW,
+            read_options=read_options),
+        max_stream_count=max_streams or os.cpu_count())
+    schema = pa.ipc.read_schema(
+        pa.py_buffer(session.arrow_schema.serialized_schema))
+
+    lock = threading.Lock()
+    num_rows = [0]
+    enough_rows = threading.Event()
+
+    def read_stream(stream):
+        batches = []
+        for page in client.read_rows(stream.name).rows(session).pages:
+            if enough_rows.is_set():
+                break
+            batch = page.to_arrow()
+            batches.append(batch)
+            with lock:
+                num_rows[0] += batch.num_rows
+                if num_samples and num_rows[0] >= num_samples:
+                    enough_rows.set()
+        return batches
+
+    batches = []
+    if session.streams:
+        with futures.ThreadPoolExecutor(len(session.streams)) as executor:
+            for stream_batches in executor.map(read_stream, session.streams):
+                batches.extend(stream_batches)
+
+    table = pa.Table.from_batches(batches, schema=schema)
+    if num_samples:
+        table = table.slice(0, num_samples)
+    data_df = _arrow_table_to_df(table)
 
     return data_df
 
 
-def read_df_from_gcs(file_pattern):
+def _read_csv_file(filepath, engine):
+    """Read one CSV file with the dtypes of metadata.CSV_COLUMN_DTYPES.
+
+    Args:
+      filepath: (string) path of the file, local or on GCS.
+      engine: (string) pandas CSV parser engine, 'c' or 'pyarrow'.
+
+    Returns:
+      pandas.DataFrame
+    """
+
+    # Download the whole file first, in binary mode, so the downloads of the
+    # files don't wait for each other's parsing.
+    with tf.io.gfile.GFile(filepath, 'rb') as f:
+        data = io.BytesIO(f.read())
+
+    if metadata.CSV_COLUMNS is None:
+        return pd.read_csv(data, dtype=metadata.CSV_COLUMN_DTYPES,
+                           engine=engine)
+    return pd.read_csv(data, names=metadata.CSV_COLUMNS, header=None,
+                       dtype=metadata.CSV_COLUMN_DTYPES, engine=engine)
+
+
+def _concat_dataframes(df_list):
+    """Concatenate the DataFrames, keeping the categorical columns categorical.
+
+    pd.concat converts the categorical columns to object if their categories
+    differ between the DataFrames, so they are set to the union of the
+    categories first.
+
+    Args:
+      df_list: (List[pandas.DataFrame]) DataFrames with the same columns.
+
+    Returns:
+      pandas.DataFrame
+    """
+
+    if len(df_list) > 1:
+        for column in df_list[0].columns:
+            if isinstance(df_list[0][column].dtype, pd.CategoricalDtype):
+                categories = union_categoricals(
+                    [df[column] for df in df_list]).categories
+                for df in df_list:
+                    df[column] = df[column].cat.set_categories(categories)
+
+    return pd.concat(df_list, ignore_index=True, copy=False)
+
+
+def _cache_key(filepaths, stats):
+    """Hash the paths, sizes and modification times of the files, and the
+    metadata used to parse them, into the name of their cached DataFrame.
+
+    Args:
+      filepaths: (List[string]) paths of the files, in the order they are read.
+      stats: (List[tf.io.gfile.FileStatistics]) statistics of the files.
+
+    Returns:
+      string
+    """
+
+    key = hashlib.sha256()
+    for filepath, stat in zip(filepaths, stats):
+        key.update('{}\t{}\t{}\n'.format(
+            filepath, stat.length, stat.mtime_nsec).encode('utf-8'))
+    key.update(json.dumps([metadata.CSV_COLUMNS, metadata.CSV_COLUMN_DTYPES],
+                          sort_keys=True).encode('utf-8'))
+    return key.hexdigest()
+
+
+def _read_from_cache(cache_path):
+    """Read a cached DataFrame, memory-mapping its Feather file.
+
+    Args:
+      cache_path: (string) path of the Feather file.
+
+    Returns:
+      pandas.DataFrame, or None if the file isn't in the cache.
+    """
+
+    try:
+        # The modification time of the files orders them for LRU eviction.
+        os.utime(cache_path)
+        table = feather.read_table(cache_path, memory_map=True)
+    except FileNotFoundError:
+        return None
+    logging.info('Read the cached data %s', cache_path)
+    return table.to_pandas()
+
+
+def _write_to_cache(data_df, cache_path, max_cache_size_mb):
+    """Write a DataFrame to the cache, and evict the least recently used
+    DataFrames until the cache is smaller than max_cache_size_mb.
+
+    Args:
+      data_df: (pandas.DataFrame) DataFrame to cache.
+      cache_path: (string) path of the Feather file.
+      max_cache_size_mb: (int) maximum size of the cache directory, in MB.
+
+    Returns:
+      None
+    """
+
+    cache_dir = os.path.dirname(cache_path)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Uncompressed Feather files can be memory-mapped when they are read.
+    # Write to a temporary file first, so concurrent trials never read a
+    # partial file.
+    temp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+    feather.write_feather(data_df, temp_path, compression='uncompressed')
+    os.replace(temp_path, cache_path)
+
+    entries = []
+    for file_name in os.listdir(cache_dir):
+        if file_name.endswith('.feather'):
+            path = os.path.join(cache_dir, file_name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    cache_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if cache_size <= max_cache_size_mb * 1024 * 1024:
+            break
+        logging.info('Evicting the cached data %s', path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        cache_size -= size
+
+
+def read_df_from_gcs(file_pattern, engine='c', num_threads=None,
+                     cache_dir=None, max_cache_size_mb=10240):
     """Read data from Google Cloud Storage, split into train and validation sets
 
     Assume that the data on GCS is in csv format without header.
     The column names will be provided through metadata
 
+    The files are downloaded and parsed concurrently in a thread pool, with
+    the dtypes of metadata.CSV_COLUMN_DTYPES, and concatenated once.
+
     Args:
       file_pattern: (string) pattern of the files containing training data.
       For example: [gs://bucket/folder_name/prefix]
+      engine: (string, Optional) pandas CSV parser engine, 'c' or 'pyarrow'.
+        The 'pyarrow' engine requires pyarrow, and parses each file with
+        multiple threads.
+      num_threads: (int, Optional) Number of files read concurrently.
+        Defaults to the default of concurrent.futures.ThreadPoolExecutor.
+      cache_dir: (string, Optional) Local directory caching the parsed
+        DataFrames as Feather files, keyed on the paths, sizes and
+        modification times of the files. If the files were already read, the
+        cached DataFrame is memory-mapped instead of parsing the files.
+      max_cache_size_mb: (int, Optional) Maximum size of cache_dir, in MB.
+        The least recently used DataFrames are evicted first.
 
     Returns:
       pandas.DataFrame
     """
 
-    # Download the files to local /tmp/ folder
-    df_list = []
+    filepaths = tf.io.gfile.glob(file_pattern)
+    if not filepaths:
+        raise ValueError('No files match {}'.format(file_pattern))
+
+    with futures.ThreadPoolExecutor(num_threads) as executor:
+        if cache_dir:
+            stats = list(executor.map(tf.io.gfile.stat, filepaths))
+            cache_path = os.path.join(
+                cache_dir, _cache_key(filepaths, stats) + '.feather')
+            data_df = _read_from_cache(cache_path)
+            if data_df is not None:
+                return data_df
+
+        df_list = list(executor.map(
+            lambda filepath: _read_csv_file(filepath, engine), filepaths))
+
+    data_df = _concat_dataframes(df_list)
+
+    if cache_dir:
+        _write_to_cache(data_df, cache_path, max_cache_size_mb)
+
+    return data_df
+
 
-    for filepath in tf.io.gfile.glob(file_pattern):
+def read_df_chunks_from_gcs(file_pattern, chunk_size):
+    """Read data from Google Cloud Storage, one chunk of rows at a time.
+
+    Only one chunk is held in memory, and only the columns of
+    metadata.FEATURE_NAMES and metadata.TARGET_NAME are parsed, with the dtypes
+    of metadata.CSV_COLUMN_DTYPES.
+
+    Args:
+      file_pattern: (string) pattern of the files containing training data.
+      For example: [gs://bucket/folder_name/prefix]
+      chunk_size: (int) Number of rows of each chunk.
+
+    Yields:
+      pandas.DataFrame
+    """
+
+    filepaths = tf.io.gfile.glob(file_pattern)
+    if not filepaths:
+        raise ValueError('No files match {}'.format(file_pattern))
+
+    usecols = None
+    if metadata.FEATURE_NAMES is not None:
+        usecols = metadata.FEATURE_NAMES + [metadata.TARGET_NAME]
+
+    for filepath in filepaths:
+        # pandas wraps binary file objects in an io.TextIOWrapper, which GFile
+        # doesn't support, so the file is opened in text mode.
         with tf.io.gfile.GFile(filepath, 'r') as f:
             if metadata.CSV_COLUMNS is None:
-                df_list.append(pd.read_csv(f))
+                reader = pd.read_csv(f, dtype=metadata.CSV_COLUMN_DTYPES,
+                                     usecols=usecols, chunksize=chunk_size)
             else:
-                df_list.append(pd.read_csv(f, names=metadata.CSV_COLUMNS,
-                                           header=None))
+                reader = pd.read_csv(f, names=metadata.CSV_COLUMNS,
+                                     header=None,
+                                     dtype=metadata.CSV_COLUMN_DTYPES,
+                                     usecols=usecols, chunksize=chunk_size)
+            for chunk in reader:
+                yield chunk
 
-    data_df = pd.concat(df_list)
 
-    return data_df
+def reservoir_sample(chunks, size, seed=None):
+    """Sample rows of the chunks uniformly at random (algorithm R).
+
+    At most `size` rows and one chunk are held in memory, however many rows
+    the chunks have.
+
+    Args:
+      chunks: (Iterable[pandas.DataFrame]) DataFrames with the same columns.
+      size: (int) Number of rows of the sample.
+      seed: (int, Optional) Seed of the random generator.
+
+    Returns:
+      pandas.DataFrame
+    """
+
+    rng = np.random.RandomState(seed)
+    reservoir = None
+    num_rows = 0
+
+    for chunk in chunks:
+        columns = {name: chunk[name].to_numpy() for name in chunk.columns}
+        if reservoir is None:
+            reservoir = {name: np.empty(size, dtype=values.dtype)
+                         for name, values in columns.items()}
+
+        # Fill the reservoir with the first rows.
+        num_filled = max(0, min(size - num_rows, len(chunk)))
+        for name, values in columns.items():
+            reservoir[name][num_rows:num_rows + num_filled] = (
+                values[:num_filled])
+
+        # Then, the i-th row (0-based) replaces a random row of the reservoir
+        # with probability size / (i + 1). When several rows of the chunk
+        # replace the same row of the reservoir, the last one wins.
+        rows = np.arange(num_filled, len(chunk))
+        positions = (rng.random_sample(len(rows)) *
+                     (num_rows + rows + 1)).astype(np.int64)
+        replaced = positions < size
+        rows, positions = rows[replaced], positions[replaced]
+        _, last = np.unique(positions[::-1], return_index=True)
+        keep = len(positions) - 1 - last
+        for name, values in columns.items():
+            reservoir[name][positions[keep]] = values[rows[keep]]
+
+        num_rows += len(chunk)
+
+    if reservoir is None:
+        return pd.DataFrame()
+    return pd.DataFrame({name: values[:min(size, num_rows)]
+                         for name, values in reservoir.items()})
 
 
 def upload_to_gcs(local_path, gcs_path):
@@ -119,21 +590,164 @@ def upload_to_gcs(local_path, gcs_path):
     tf.io.gfile.copy(local_path, gcs_path)
 
 
-def dump_object(object_to_dump, output_path):
-    """Pickle the object and save to the output_path.
+def available_cpu_count():
+    """Count the CPUs that this process is allowed to use.
+
+    The count is the number of CPUs of the affinity mask of the process,
+    capped by the CPU quota of its cgroup (e.g. the CPU limit of its
+    container), so the parallel jobs don't oversubscribe the CPUs.
+
+    Returns:
+      int
+    """
+
+    if hasattr(os, 'sched_getaffinity'):
+        cpu_count = len(os.sched_getaffinity(0))
+    else:
+        cpu_count = os.cpu_count() or 1
+
+    quota, period = None, None
+    try:
+        # cgroup v2: "<quota> <period>", or "max <period>" without quota.
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            values = f.read().split()
+        if values[0] != 'max':
+            quota, period = int(values[0]), int(values[1])
+    except (IOError, ValueError, IndexError):
+        try:
+            # cgroup v1: a quota of -1 means no quota.
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+                quota = int(f.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+                period = int(f.read())
+        except (IOError, ValueError):
+            pass
+
+    if quota is not None and quota > 0 and period:
+        cpu_count = min(cpu_count, max(1, int(math.ceil(quota / period))))
+    return cpu_count
+
+
+def with_n_jobs(estimator, n_jobs):
+    """Clone the estimator, setting all its n_jobs parameters to n_jobs.
+
+    Args:
+      estimator: an estimator, or a pipeline of estimators.
+      n_jobs: (int) Number of parallel jobs of each estimator.
+
+    Returns:
+      The cloned estimator.
+    """
+
+    params = {name: n_jobs for name in estimator.get_params()
+              if name == 'n_jobs' or name.endswith('__n_jobs')}
+    return base.clone(estimator).set_params(**params)
+
+
+def cross_val_score(estimator, x, y, n_jobs, cv=3):
+    """Evaluate the estimator by cross-validation, with the folds in parallel.
+
+    The folds are fitted in processes of joblib's loky backend, and the
+    n_jobs CPUs are shared between them: each fold's estimator gets its share
+    of n_jobs, and the number of threads of the native libraries (e.g.
+    OpenMP) in each process is capped to it.
+
+    Args:
+      estimator: the estimator to evaluate.
+      x: the features.
+      y: the target.
+      n_jobs: (int) Number of CPUs used.
+      cv: (int, Optional) Number of folds.
+
+    Returns:
+      numpy.ndarray of the scores of the folds.
+    """
+
+    fold_jobs = min(cv, n_jobs)
+    estimator_jobs = max(1, n_jobs // fold_jobs)
+    with joblib.parallel_backend('loky',
+                                 inner_max_num_threads=estimator_jobs):
+        return ms.cross_val_score(with_n_jobs(estimator, estimator_jobs),
+                                  x, y, cv=cv, n_jobs=fold_jobs)
+
+
+def dump_object(object_to_dump, output_path, compression=None):
+    """Serialize the object with joblib and save to the output_path.
+
+    Without compression, the numpy arrays of the object (e.g. the trees of a
+    random forest) are stored raw, so that load_object can memory-map them.
+    Compression makes the file smaller to upload and download, but slower to
+    load.
 
     Args:
       object_to_dump: Python object to be pickled
       output_path: (string) output path which can be Google Cloud Storage
+      compression: (string, Optional) One of COMPRESSIONS.
 
     Returns:
       None
     """
 
-    if not tf.io.gfile.exists(output_path):
-        tf.io.gfile.makedirs(os.path.dirname(output_path))
-    with tf.io.gfile.GFile(output_path, 'w') as wf:
-        joblib.dump(object_to_dump, wf)
+    compress = 0
+    if compression and compression != 'none':
+        compress = (compression, 3)
+
+    # joblib writes the arrays directly to a local file, which is then copied
+    # to output_path.
+    temp_dir = tempfile.mkdtemp()
+    try:
+        local_path = os.path.join(temp_dir, os.path.basename(output_path))
+        joblib.dump(object_to_dump, local_path, compress=compress)
+        if not tf.io.gfile.exists(os.path.dirname(output_path)):
+            tf.io.gfile.makedirs(os.path.dirname(output_path))
+        tf.io.gfile.copy(local_path, output_path, overwrite=True)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def save_flat_trees(flat_trees, output_path):
+    """Save flattened trees to the output_path, as a .npz file.
+
+    Args:
+      flat_trees: (flat_trees.FlatTrees) the flattened trees of a model
+      output_path: (string) output path which can be Google Cloud Storage
+
+    Returns:
+      None
+    """
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        local_path = os.path.join(temp_dir, os.path.basename(output_path))
+        flat_trees.save(local_path)
+        if not tf.io.gfile.exists(os.path.dirname(output_path)):
+            tf.io.gfile.makedirs(os.path.dirname(output_path))
+        tf.io.gfile.copy(local_path, output_path, overwrite=True)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def load_object(input_path, mmap_mode=None):
+    """Load an object saved by dump_object.
+
+    Args:
+      input_path: (string) input path which can be Google Cloud Storage
+      mmap_mode: (string, Optional) 'r' to memory-map the numpy arrays of an
+        uncompressed object instead of reading them in memory. The arrays of
+        a compressed object are always read in memory.
+
+    Returns:
+      The loaded object.
+    """
+
+    if input_path.startswith('gs://'):
+        # Only local files can be memory-mapped. The local copy is kept as
+        # long as the process runs, as the arrays may be mapped to it.
+        local_path = os.path.join(tempfile.mkdtemp(),
+                                  os.path.basename(input_path))
+        tf.io.gfile.copy(input_path, local_path)
+        input_path = local_path
+    return joblib.load(input_path, mmap_mode=mmap_mode)
 
 
 def boolean_mask(columns, target_columns):
@@ -0,0 +1,100 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Compares the latency of the preprocessing of the model, for prediction
+requests of 1 to 1000 instances, with the custom routines of my_pipeline.py
+and with the previous StripString and PositionalSelector.
+
+Run from the `custom_routines` directory:
+
+    python -m benchmarks.prediction_benchmark --batch-sizes 1 10 100 1000
+"""
+
+import argparse
+import time
+
+import numpy as np
+from sklearn import base
+
+from trainer import model
+from trainer import my_pipeline as mp
+from trainer import task
+
+# The instances of prediction/sklearn/structured/custom_routines.
+INSTANCES = [
+    [0.2, 660, 1175, 8, 10, 7, 8, 33, 17031081402, 17031330100, 41.892,
+     -87.613, 41.859, -87.617, 'Credit Card', 'Taxi Affiliation Services'],
+    [1.0, 300, 545, 9, 22, 4, 32, 8, 17031320100, 17031081500, 41.885,
+     -87.621, 41.893, -87.626, ' Cash', 'Northwest Management LLC'],
+    [1.1, 300, 565, 3, 2, 1, 28, 32, 17031833000, 17031839100, 41.885,
+     -87.657, 41.881, -87.633, 'Credit Card ', 'Taxi Affiliation Services'],
+]
+
+
+class PreviousPositionalSelector(mp.PositionalSelector):
+    def transform(self, X):
+        return np.array(X)[:, self.positions]
+
+
+class PreviousStripString(mp.StripString):
+    def transform(self, X):
+        strip = np.vectorize(str.strip)
+        return strip(np.array(X))
+
+
+def _instances(batch_size):
+    return np.array([INSTANCES[i % len(INSTANCES)]
+                     for i in range(batch_size)], dtype=object)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch-sizes', type=int, nargs='+',
+                        default=[1, 10, 100, 1000])
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+
+    arguments = task._parse_args(['--input', 'unused', '--job-dir', 'unused'])
+    preprocessing = model.get_estimator(arguments).named_steps['pre']
+    previous = base.clone(preprocessing)
+    previous.set_params(
+        numericals__positionalselector=PreviousPositionalSelector(
+            preprocessing.get_params()['numericals__positionalselector__'
+                                       'positions']),
+        numericals__stripstring=PreviousStripString(),
+        categoricals__positionalselector=PreviousPositionalSelector(
+            preprocessing.get_params()['categoricals__positionalselector__'
+                                       'positions']))
+    X_train = _instances(1000)
+    preprocessing.fit(X_train)
+    previous.fit(X_train)
+
+    print('\n{:>10} {:>20} {:>20}'.format(
+        'instances', 'previous (ms/req)', 'current (ms/req)'))
+    for batch_size in args.batch_sizes:
+        X = _instances(batch_size)
+        np.testing.assert_array_equal(previous.transform(X),
+                                      preprocessing.transform(X))
+        latencies = []
+        for transformer in (previous, preprocessing):
+            start = time.time()
+            for _ in range(args.requests):
+                transformer.transform(X)
+            latencies.append((time.time() - start) / args.requests * 1000)
+        print('{:>10} {:>20.3f} {:>20.3f}'.format(batch_size, *latencies))
+
+
+if __name__ == '__main__':
+    main()
@@ -52,7 +52,8 @@ def get_estimator(arguments):
         ('pre', feats),
         ('estimator', ensemble.RandomForestClassifier(
             n_estimators=arguments.n_estimators,
-            max_depth=arguments.max_depth)
+            max_depth=arguments.max_depth,
+            n_jobs=arguments.n_jobs)
          )
     ])
     return pipeline
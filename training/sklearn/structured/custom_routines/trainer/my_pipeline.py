@@ -1,6 +1,11 @@
 import numpy as np
+from scipy.sparse import csr_matrix
 from sklearn.base import BaseEstimator, TransformerMixin
 
+# NumPy 2 strips the strings with a ufunc. With NumPy 1, np.char.strip still
+# calls str.strip on each string, but in a C loop.
+_strip = getattr(np, 'strings', np.char).strip
+
 
 # A pipeline to select a subset of features, given their positional indices
 class PositionalSelector(BaseEstimator, TransformerMixin):
@@ -11,7 +16,8 @@ class PositionalSelector(BaseEstimator, TransformerMixin):
         return self
 
     def transform(self, X):
-        return np.array(X)[:, self.positions]
+        # Only copies the selected columns, not X if it's already an array.
+        return np.asarray(X)[:, self.positions]
 
 
 class StripString(BaseEstimator, TransformerMixin):
@@ -19,29 +25,56 @@ class StripString(BaseEstimator, TransformerMixin):
         return self
 
     def transform(self, X):
-        strip = np.vectorize(str.strip)
-        return strip(np.array(X))
+        return _strip(np.asarray(X, dtype=str))
 
 
-# A simple one hot encoder for scikit-learn
+# A simple one hot encoder for scikit-learn.
+# The categories of each column are looked up with a binary search in their
+# sorted, fitted values: the unknown categories are encoded as all zeros.
 class SimpleOneHotEncoder(BaseEstimator, TransformerMixin):
+    def __init__(self, sparse=False):
+        # If sparse, transform returns a scipy.sparse CSR matrix.
+        self.sparse = sparse
+
     def fit(self, X, y=None):
         self.values = []
+        self.categories_ = []
         for c in range(X.shape[1]):
-            Y = X[:, c]
-            values = {v: i for i, v in enumerate(np.unique(Y))}
-            self.values.append(values)
+            categories = np.unique(X[:, c])
+            self.values.append({v: i for i, v in enumerate(categories)})
+            self.categories_.append(categories)
         return self
 
+    def __setstate__(self, state):
+        # The encoders pickled before `sparse` and `categories_` were added
+        # only have `values`, whose keys are the sorted categories.
+        state.setdefault('sparse', False)
+        if 'categories_' not in state:
+            state['categories_'] = [np.array(list(values))
+                                    for values in state['values']]
+        super(SimpleOneHotEncoder, self).__setstate__(state)
+
     def transform(self, X):
-        X = np.array(X)
-        matrices = []
-        for c in range(X.shape[1]):
+        X = np.asarray(X)
+        rows = []
+        columns = []
+        offset = 0
+        for c, categories in enumerate(self.categories_):
             Y = X[:, c]
-            mat = np.zeros(shape=(len(Y), len(self.values[c])), dtype=np.int8)
-            for i, x in enumerate(Y):
-                if x in self.values[c]:
-                    mat[i][self.values[c][x]] = 1
-            matrices.append(mat)
-        res = np.concatenate(matrices, axis=1)
+            positions = np.searchsorted(categories, Y)
+            np.minimum(positions, len(categories) - 1, out=positions)
+            known = np.flatnonzero(categories[positions] == Y)
+            rows.append(known)
+            columns.append(positions[known] + offset)
+            offset += len(categories)
+        rows = np.concatenate(rows)
+        columns = np.concatenate(columns)
+
+        shape = (X.shape[0], offset)
+        if self.sparse:
+            return csr_matrix(
+                (np.ones(len(rows), dtype=np.int8), (rows, columns)),
+                shape=shape)
+        res = np.zeros(shape=shape, dtype=np.int8)
+        res[rows, columns] = 1
         return res
@@ -22,13 +22,13 @@ import os
 import hypertune
 import numpy as np
 from datetime import datetime
-from sklearn import model_selection
 from trainer import metadata
 from trainer import model
 from trainer import utils
 
 
-def _train_and_evaluate(estimator, dataset, output_dir):
+def _train_and_evaluate(estimator, dataset, output_dir, n_jobs,
+                        compression=None):
     """Runs model training and evaluation.
 
     Args:
@@ -36,6 +36,8 @@ def _train_and_evaluate(estimator, dataset, output_dir):
         steps and model training
       dataset: (pandas.DataFrame), DataFrame containing training data
       output_dir: (string), directory that the trained model will be exported
+      n_jobs: (int), number of CPUs used by the cross-validation
+      compression: (string), compression of the exported model
 
     Returns:
       None
@@ -47,11 +49,13 @@ def _train_and_evaluate(estimator, dataset, output_dir):
     model_output_path = os.path.join(output_dir, 'model',
                                      metadata.MODEL_FILE_NAME)
 
-    utils.dump_object(estimator, model_output_path)
+    utils.dump_object(estimator, model_output_path,
+                      compression=compression)
 
     if metadata.HYPERPARAMTER_TUNING:
         # Note: for now, use `cross_val_score` defaults (i.e. 3-fold)
-        scores = model_selection.cross_val_score(estimator, x_val, y_val, cv=3)
+        scores = utils.cross_val_score(estimator, x_val, y_val, n_jobs,
+                                       cv=3)
 
         logging.info('Scores: %s', scores)
 
@@ -71,18 +75,30 @@ def run_experiment(arguments):
     """Testbed for running model training and evaluation."""
     # Get data for training and evaluation
 
+    if arguments.n_jobs is None:
+        arguments.n_jobs = utils.available_cpu_count()
     logging.info('Arguments: %s', arguments)
 
-    dataset = utils.read_df_from_gcs(arguments.input)
+    if utils.is_bigquery_table(arguments.input):
+        dataset = utils.read_df_from_bigquery(
+            arguments.input,
+            sample_percentage=arguments.bigquery_sample_percentage)
+    else:
+        dataset = utils.read_df_from_gcs(
+            arguments.input,
+            engine=arguments.csv_engine,
+            cache_dir=arguments.data_cache_dir,
+            max_cache_size_mb=arguments.data_cache_size_mb)
 
     # Get estimator
     estimator = model.get_estimator(arguments)
 
     # Run training and evaluation
-    _train_and_evaluate(estimator, dataset, arguments.job_dir)
+    _train_and_evaluate(estimator, dataset, arguments.job_dir,
+                        arguments.n_jobs, arguments.model_compression)
 
 
-def _parse_args():
+def _parse_args(argv=None):
     """Parses command-line arguments."""
 
     parser = argparse.ArgumentParser()
@@ -109,12 +125,68 @@ def _parse_args():
         required=True,
     )
 
+    parser.add_argument(
+        '--bigquery-sample-percentage',
+        help='''Percentage of the rows of the BigQuery table, sampled randomly
+              by BigQuery, to read. If not set, all the rows are read.
+            ''',
+        type=float,
+    )
+
+    parser.add_argument(
+        '--csv-engine',
+        help='''The pandas parser engine of the CSV files. The pyarrow engine
+              parses each file with multiple threads, and requires pyarrow.
+            ''',
+        choices=['c', 'pyarrow'],
+        default='c',
+    )
+
+    parser.add_argument(
+        '--data-cache-dir',
+        help='''Local directory caching the parsed training data as Feather
+              files. Later runs reading the same files (e.g. hyperparameter
+              tuning trials on the same machine) memory-map the cached data
+              instead of parsing the CSV files.
+            ''',
+    )
+
+    parser.add_argument(
+        '--data-cache-size-mb',
+        help='''Maximum size of --data-cache-dir, in MB. The least recently
+              used data is evicted first.
+            ''',
+        type=int,
+        default=10240,
+    )
+
     parser.add_argument(
         '--job-dir',
         help='Output directory for exporting model and other metadata.',
         required=True,
     )
 
+    parser.add_argument(
+        '--model-compression',
+        help='''Compression of the exported model. Uncompressed
+              models load fastest, as their arrays can be memory-mapped.
+              lz4 requires the lz4 package, and zstd the zstandard package
+              and this trainer's utils module (also when the model is loaded),
+              so zstd models can't be served by AI Platform Prediction.
+            ''',
+        choices=utils.COMPRESSIONS,
+        default='none',
+    )
+
+    parser.add_argument(
+        '--n-jobs',
+        help='''Number of CPUs used to train the model and to cross-validate
+              it. Defaults to the CPUs this process is allowed to use, capped
+              by the CPU quota of its container.
+            ''',
+        type=int,
+    )
+
     parser.add_argument(
         '--n-estimators',
         help='Number of trees in the forest.',
@@ -129,7 +201,7 @@ def _parse_args():
         default=3,
     )
 
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 
 def main():
@@ -22,6 +22,8 @@ REQUIRED_PACKAGES = [
     'scikit-learn>=0.20.2',
     'pandas==1.4.1',
     'cloudml-hypertune',
+    'pyarrow',
+    'google-cloud-bigquery-storage',
 ]
 
 setup(
@@ -31,9 +31,11 @@ def get_estimator(arguments):
     # n_estimators and max_depth are expected to be passed as
     # command line argument to task.py
     classifier = ensemble.RandomForestClassifier(
+        n_estimators=arguments.n_estimators,
         max_depth=arguments.max_depth,
         min_samples_split=arguments.min_samples_split,
         criterion=arguments.criterion,
+        n_jobs=arguments.n_jobs,
     )
 
     return classifier
@@ -0,0 +1,249 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Runs a successive halving search of the hyperparameters, locally.
+
+Random candidates of the hyperparameters are trained on a small fraction of
+the training data. Only the best 1/eta of them are trained again on eta times
+more data, until one candidate is left or all the data is used. The best
+candidate is then trained on all the training data, and exported.
+"""
+
+import argparse
+from concurrent import futures
+from datetime import datetime
+import json
+import logging
+import math
+import os
+
+import hypertune
+import numpy as np
+from trainer import metadata
+from trainer import model
+from trainer import task
+from trainer import utils
+
+# The random candidates of each hyperparameter, in the same ranges as in
+# config.yaml.
+SEARCH_SPACE = {
+    'n_estimators': lambda rng: int(rng.randint(10, 201)),
+    'max_depth': lambda rng: int(rng.randint(3, 9)),
+    'min_samples_split': lambda rng: float(
+        np.exp(rng.uniform(np.log(0.01), np.log(0.99)))),
+    'criterion': lambda rng: str(rng.choice(['gini', 'entropy'])),
+}
+
+# The training and validation data of the worker processes, set once per
+# process by _init_worker instead of being sent with every trial.
+_data = {}
+
+
+def _init_worker(x_train, y_train, x_val, y_val):
+    _data.update(x_train=x_train, y_train=y_train, x_val=x_val, y_val=y_val)
+
+
+def _evaluate(arguments, num_rows):
+    """Trains an estimator on the first num_rows training rows, and returns
+    its accuracy on the validation data."""
+    estimator = model.get_estimator(arguments)
+    estimator.fit(_data['x_train'][:num_rows], _data['y_train'][:num_rows])
+    return estimator.score(_data['x_val'], _data['y_val'])
+
+
+def sample_candidates(arguments, n_candidates, seed=None):
+    """Samples random candidates of the hyperparameters of SEARCH_SPACE.
+
+    Args:
+      arguments: (argparse.Namespace), the other parameters of the trainer
+      n_candidates: (int), number of candidates
+      seed: (int, Optional), seed of the random generator
+
+    Returns:
+      List[argparse.Namespace]
+    """
+    rng = np.random.RandomState(seed)
+    candidates = []
+    for _ in range(n_candidates):
+        params = {name: sample(rng) for name, sample in SEARCH_SPACE.items()}
+        candidates.append(argparse.Namespace(**dict(vars(arguments),
+                                                    **params)))
+    return candidates
+
+
+def successive_halving(candidates, x_train, y_train, x_val, y_val, eta=3,
+                       min_fraction=1. / 9, n_parallel_trials=1):
+    """Runs successive halving on growing fractions of the training data.
+
+    The best validation accuracy of each rung is reported to hypertune, with
+    the rung as the step, so the progress of the search can be followed.
+
+    Args:
+      candidates: (List[argparse.Namespace]), parameters of the candidates
+      x_train: (numpy.ndarray), training features, in random order
+      y_train: (numpy.ndarray), training target
+      x_val: (numpy.ndarray), validation features
+      y_val: (numpy.ndarray), validation target
+      eta: (int), the best 1/eta candidates of each rung are trained on eta
+        times more data in the next rung
+      min_fraction: (float), fraction of the training data of the first rung
+      n_parallel_trials: (int), number of trials trained in parallel
+
+    Returns:
+      A Tuple of (argparse.Namespace, float), the best candidate and its
+      validation accuracy
+    """
+    num_rungs = int(math.floor(math.log(1. / min_fraction, eta) + 1e-9)) + 1
+    hpt = hypertune.HyperTune()
+
+    with futures.ProcessPoolExecutor(
+            n_parallel_trials, initializer=_init_worker,
+            initargs=(x_train, y_train, x_val, y_val)) as executor:
+        for rung in range(num_rungs):
+            fraction = min(1., min_fraction * eta ** rung)
+            num_rows = max(1, int(len(x_train) * fraction))
+            scores = list(executor.map(_evaluate, candidates,
+                                       [num_rows] * len(candidates)))
+            ranking = np.argsort(scores)[::-1]
+            best_score = scores[ranking[0]]
+
+            logging.info('Rung %d: %d candidates on %d rows, best accuracy %s',
+                         rung, len(candidates), num_rows, best_score)
+            hpt.report_hyperparameter_tuning_metric(
+                hyperparameter_metric_tag='Taxi Model Accuracy',
+                metric_value=best_score,
+                global_step=rung)
+
+            if rung == num_rungs - 1 or len(candidates) == 1:
+                break
+            num_kept = max(1, len(candidates) // eta)
+            candidates = [candidates[i] for i in ranking[:num_kept]]
+
+    return candidates[ranking[0]], best_score
+
+
+def run_search(arguments, search_arguments):
+    """Searches the hyperparameters, and exports the best model."""
+    if arguments.n_jobs is None:
+        arguments.n_jobs = utils.available_cpu_count()
+    logging.info('Arguments: %s', arguments)
+    logging.info('Search arguments: %s', search_arguments)
+
+    if utils.is_bigquery_table(arguments.input):
+        dataset = utils.read_df_from_bigquery(
+            arguments.input,
+            sample_percentage=arguments.bigquery_sample_percentage)
+    else:
+        dataset = utils.read_df_from_gcs(
+            arguments.input,
+            engine=arguments.csv_engine,
+            cache_dir=arguments.data_cache_dir,
+            max_cache_size_mb=arguments.data_cache_size_mb)
+    # The split shuffles the rows, so the first rows of x_train are a random
+    # sample of any size.
+    x_train, y_train, x_val, y_val = utils.data_train_test_split(dataset)
+
+    # The CPUs are shared between the parallel trials.
+    n_parallel_trials = min(search_arguments.n_parallel_trials,
+                            arguments.n_jobs)
+    trial_arguments = argparse.Namespace(**dict(
+        vars(arguments), n_jobs=max(1, arguments.n_jobs // n_parallel_trials)))
+    candidates = sample_candidates(trial_arguments,
+                                   search_arguments.n_candidates,
+                                   seed=search_arguments.seed)
+    best_arguments, best_score = successive_halving(
+        candidates, x_train, y_train, x_val, y_val,
+        eta=search_arguments.eta,
+        min_fraction=search_arguments.min_fraction,
+        n_parallel_trials=n_parallel_trials)
+
+    best_params = {name: getattr(best_arguments, name)
+                   for name in SEARCH_SPACE}
+    logging.info('Best hyperparameters: %s (accuracy %s)',
+                 json.dumps(best_params), best_score)
+
+    # Train the best candidate on all the training data, with all the CPUs.
+    best_arguments.n_jobs = arguments.n_jobs
+    estimator = model.get_estimator(best_arguments)
+    estimator.fit(x_train, y_train)
+
+    model_output_path = os.path.join(arguments.job_dir, 'model',
+                                     metadata.MODEL_FILE_NAME)
+    utils.dump_object(estimator, model_output_path,
+                      compression=arguments.model_compression)
+
+
+def _parse_search_args(argv=None):
+    """Parses the command-line arguments of the search. The other arguments
+    are parsed by task._parse_args."""
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        '--n-candidates',
+        help='Number of random candidates of the hyperparameters.',
+        type=int,
+        default=27,
+    )
+
+    parser.add_argument(
+        '--eta',
+        help='''The best 1/eta candidates of each rung are trained on eta
+              times more data in the next rung.
+            ''',
+        type=int,
+        default=3,
+    )
+
+    parser.add_argument(
+        '--min-fraction',
+        help='Fraction of the training data of the first rung.',
+        type=float,
+        default=1. / 9,
+    )
+
+    parser.add_argument(
+        '--n-parallel-trials',
+        help='Number of trials trained in parallel processes.',
+        type=int,
+        default=4,
+    )
+
+    parser.add_argument(
+        '--seed',
+        help='Random seed of the candidates.',
+        type=int,
+        default=42,
+    )
+
+    return parser.parse_known_args(argv)
+
+
+def main():
+    """Entry point"""
+
+    search_arguments, argv = _parse_search_args()
+    arguments = task._parse_args(argv)
+    logging.basicConfig(level=arguments.log_level)
+    time_start = datetime.utcnow()
+    run_search(arguments, search_arguments)
+    time_end = datetime.utcnow()
+    time_elapsed = time_end - time_start
+    logging.info('Search elapsed time: {} seconds'.format(
+        time_elapsed.total_seconds()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Compares the throughput, in records per second, of the input_fn of the
+trainer reading synthetic CSV files, and the TFRecord files converted from
+them by trainer/tfrecords.py in each record format.
+
+Run from the `base` directory:
+
+    python -m benchmarks.input_benchmark --num-rows 1000000 --num-files 8
+"""
+
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+import tensorflow as tf
+
+from trainer import inputs
+from trainer import metadata
+from trainer import tfrecords
+
+
+def write_synthetic_files(directory, num_rows, num_files, seed=42):
+    """Writes `num_rows` taxi-shaped rows in `num_files` CSV files, with a
+    header line."""
+    rng = random.Random(seed)
+    file_paths = []
+    for index in range(num_files):
+        file_path = os.path.join(directory, 'taxi_{:05d}.csv'.format(index))
+        with open(file_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(metadata.COLUMN_NAMES)
+            for _ in range(num_rows // num_files):
+                writer.writerow([_synthetic_value(name, default[0], rng)
+                                 for name, default in zip(
+                                     metadata.COLUMN_NAMES,
+                                     metadata.DEFAULTS)])
+        file_paths.append(file_path)
+    return file_paths
+
+
+def _synthetic_value(column_name, default, rng):
+    """Returns a random value of the type of the default of the column."""
+    vocabulary = metadata.CATEGORICAL_FEATURE_NAMES_WITH_VOCABULARY.get(
+        column_name)
+    if vocabulary:
+        return rng.choice(vocabulary)
+    if isinstance(default, str):
+        return '{}_{}'.format(column_name, rng.randint(0, 99))
+    if isinstance(default, float):
+        return round(rng.uniform(0, 100), 6)
+    return rng.randint(0, 1)
+
+
+def measure(input_fn):
+    """Reads one epoch of the input_fn, and returns the number of records
+    and the elapsed time."""
+    start = time.time()
+    num_records = 0
+    for _, target in input_fn():
+        num_records += int(target.shape[0])
+    return num_records, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-rows', type=int, default=1000000)
+    parser.add_argument('--num-files', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=128)
+    parser.add_argument('--block-size', type=int, default=1000)
+    parser.add_argument('--num-workers', type=int)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_files = write_synthetic_files(tmp_dir, args.num_rows,
+                                          args.num_files)
+        readers = [('csv', csv_files, 'csv', 'example', 0.)]
+        for record_format in inputs.RECORD_FORMATS:
+            start = time.time()
+            tfrecord_files = tfrecords.convert(
+                csv_files,
+                os.path.join(tmp_dir, record_format),
+                record_format=record_format,
+                block_size=args.block_size,
+                num_workers=args.num_workers)
+            readers.append(('tfrecords ({})'.format(record_format),
+                            tfrecord_files, 'tfrecords', record_format,
+                            time.time() - start))
+
+        print('\n{:<30} {:>12} {:>14} {:>12}'.format(
+            'input', 'convert (s)', 'records/sec', 'read (s)'))
+        for name, files, file_encoding, record_format, convert_time in (
+                readers):
+            input_fn = inputs.make_input_fn(
+                files,
+                file_encoding=file_encoding,
+                mode=tf.estimator.ModeKeys.EVAL,
+                batch_size=args.batch_size,
+                record_format=record_format)
+            num_records, elapsed = measure(input_fn)
+            print('{:<30} {:>12.1f} {:>14.0f} {:>12.2f}'.format(
+                name, convert_time, num_records / elapsed, elapsed))
+
+
+if __name__ == '__main__':
+    main()
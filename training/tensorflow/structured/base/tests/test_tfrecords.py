@@ -0,0 +1,93 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Tests of the TFRecord conversion of trainer/tfrecords.py, read back by
+the input_fn of trainer/inputs.py.
+
+Run from the `base` directory:
+
+    python -m pytest tests
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from benchmarks.input_benchmark import write_synthetic_files
+from trainer import inputs
+from trainer import metadata
+from trainer import tfrecords
+
+
+def _read_all(input_fn):
+    """Returns the sorted values of trip_miles and of the target read by the
+    input_fn."""
+    trip_miles, targets = [], []
+    for features, target in input_fn():
+        trip_miles.append(np.reshape(features['trip_miles'].numpy(), [-1]))
+        targets.append(np.reshape(target.numpy(), [-1]))
+    return (np.sort(np.concatenate(trip_miles)),
+            np.sort(np.concatenate(targets)))
+
+
+class ConvertTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_files = write_synthetic_files(tmp_dir, num_rows=250,
+                                              num_files=2)
+            expected_miles, expected_targets = _read_all(inputs.make_input_fn(
+                csv_files, file_encoding='csv', batch_size=32))
+            self.assertEqual(len(expected_targets), 250)
+
+            for record_format in inputs.RECORD_FORMATS:
+                tfrecord_files = tfrecords.convert(
+                    csv_files, os.path.join(tmp_dir, record_format),
+                    num_shards=3, record_format=record_format, block_size=40,
+                    num_workers=2)
+                input_fn = inputs.make_input_fn(
+                    tfrecord_files, file_encoding='tfrecords', batch_size=32,
+                    record_format=record_format)
+                trip_miles, targets = _read_all(input_fn)
+                np.testing.assert_array_equal(trip_miles, expected_miles,
+                                              record_format)
+                np.testing.assert_array_equal(targets, expected_targets,
+                                              record_format)
+                self.assertEqual(
+                    targets.dtype,
+                    inputs.get_feature_spec()[
+                        metadata.TARGET_NAME].dtype.as_numpy_dtype)
+
+
+class GetCompressionTypeTest(unittest.TestCase):
+
+    def test_suffixes(self):
+        self.assertEqual(inputs.get_compression_type('a/*.tfrecord.gz'),
+                         'GZIP')
+        self.assertEqual(inputs.get_compression_type('a/*.tfrecord.zlib'),
+                         'ZLIB')
+        self.assertEqual(inputs.get_compression_type(['a/b.tfrecord']), '')
+
+    def test_default(self):
+        self.assertEqual(inputs.get_compression_type('a/part-*'), 'GZIP')
+
+    def test_explicit(self):
+        self.assertEqual(inputs.get_compression_type('a/part-*', 'NONE'), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -63,9 +63,12 @@ def run(estimator, args):
     train_spec = tf.estimator.TrainSpec(
         input_fn=inputs.make_input_fn(
             file_pattern=args.train_files,
+            file_encoding=args.file_encoding,
             mode=tf.estimator.ModeKeys.TRAIN,
             batch_size=args.batch_size,
-            has_header=True),
+            has_header=True,
+            record_format=args.record_format,
+            compression_type=args.compression_type),
         max_steps=int(args.train_steps))
 
     # Create exporter for a serving model
@@ -77,8 +80,11 @@ def run(estimator, args):
     eval_spec = tf.estimator.EvalSpec(
         input_fn=inputs.make_input_fn(
             file_pattern=args.eval_files,
+            file_encoding=args.file_encoding,
             mode=tf.estimator.ModeKeys.EVAL,
-            batch_size=args.batch_size),
+            batch_size=args.batch_size,
+            record_format=args.record_format,
+            compression_type=args.compression_type),
         steps=args.eval_steps,
         exporters=[exporter],
         start_delay_secs=0,
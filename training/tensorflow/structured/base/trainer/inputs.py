@@ -19,6 +19,20 @@ import tensorflow as tf
 import tensorflow_model_analysis as tfma
 from . import metadata
 
+# The formats of the TFRecords written by tfrecords.py: one tf.train.Example
+# per row, or one record per block of rows, either a tf.train.SequenceExample
+# with a feature list per column, or a columnar tf.train.Example with a list
+# of values per column.
+RECORD_FORMATS = ['example', 'sequence_example', 'columnar']
+
+# The suffixes of the TFRecord files written by tfrecords.py, by compression
+# type.
+TFRECORD_SUFFIXES = {
+    'GZIP': '.tfrecord.gz',
+    'ZLIB': '.tfrecord.zlib',
+    'NONE': '.tfrecord',
+}
+
 
 def get_feature_spec(is_serving=False):
     """Create feature_spec from metadata.
@@ -39,34 +53,144 @@ def get_feature_spec(is_serving=False):
 
     for feature_name in column_names:
         if feature_name in metadata.NUMERIC_FEATURE_NAMES_WITH_STATS:
-            feature_spec[feature_name] = tf.FixedLenFeature(shape=1,
-                                                            dtype=tf.float32)
+            feature_spec[feature_name] = tf.io.FixedLenFeature(shape=1,
+                                                               dtype=tf.float32)
         if feature_name in metadata.NUMERIC_FEATURE_NAMES_GEOPOINTS:
-            feature_spec[feature_name] = tf.FixedLenFeature(shape=1,
-                                                            dtype=tf.float32)
+            feature_spec[feature_name] = tf.io.FixedLenFeature(shape=1,
+                                                               dtype=tf.float32)
         elif feature_name in metadata.CATEGORICAL_FEATURE_NAMES_WITH_IDENTITY:
-            feature_spec[feature_name] = tf.FixedLenFeature(shape=1,
-                                                            dtype=tf.int32)
+            feature_spec[feature_name] = tf.io.FixedLenFeature(shape=1,
+                                                               dtype=tf.int32)
         elif feature_name in metadata.NUMERIC_FEATURE_NAMES:
-            feature_spec[feature_name] = tf.FixedLenFeature(shape=1,
-                                                            dtype=tf.int32)
+            feature_spec[feature_name] = tf.io.FixedLenFeature(shape=1,
+                                                               dtype=tf.int32)
         elif feature_name in metadata.CATEGORICAL_FEATURE_NAMES_WITH_VOCABULARY:
-            feature_spec[feature_name] = tf.FixedLenFeature(shape=1,
-                                                            dtype=tf.string)
+            feature_spec[feature_name] = tf.io.FixedLenFeature(shape=1,
+                                                               dtype=tf.string)
         elif feature_name in \
                 metadata.CATEGORICAL_FEATURE_NAMES_WITH_HASH_BUCKET:
-            feature_spec[feature_name] = tf.FixedLenFeature(shape=1,
-                                                            dtype=tf.string)
+            feature_spec[feature_name] = tf.io.FixedLenFeature(shape=1,
+                                                               dtype=tf.string)
         elif feature_name == metadata.TARGET_NAME:
             if metadata.TASK_TYPE == 'classification':
-                feature_spec[feature_name] = tf.FixedLenFeature(
-                    shape=1, dtype=tf.string)
+                feature_spec[feature_name] = tf.io.FixedLenFeature(
+                    shape=1, dtype=tf.int32)
             else:
-                feature_spec[feature_name] = tf.FixedLenFeature(
+                feature_spec[feature_name] = tf.io.FixedLenFeature(
                     shape=1, dtype=tf.float32)
     return feature_spec
 
 
+def get_record_feature_spec(is_serving=False):
+    """Create the feature_spec of the TFRecords written by tfrecords.py.
+
+    tf.train.Example only stores float32, int64 and string values, so the
+    integer features of get_feature_spec() are stored as int64.
+
+    Args:
+      is_serving: boolean - whether to create feature_spec for training or
+      serving.
+
+    Returns:
+      feature_spec
+    """
+    feature_spec = {}
+    for feature_name, feature in get_feature_spec(is_serving).items():
+        dtype = tf.int64 if feature.dtype.is_integer else feature.dtype
+        feature_spec[feature_name] = tf.io.FixedLenFeature(
+            shape=feature.shape, dtype=dtype)
+    return feature_spec
+
+
+def get_compression_type(file_pattern, compression_type=None):
+    """Returns the compression type of TFRecord files, as expected by
+    tf.data.TFRecordDataset ('', 'GZIP' or 'ZLIB').
+
+    Args:
+      file_pattern: str or list of str - the TFRecord files.
+      compression_type: 'GZIP', 'ZLIB', 'NONE', or None to infer it from the
+        suffix of the file pattern (see TFRECORD_SUFFIXES). Patterns without
+        one of these suffixes default to 'GZIP', the default of
+        tfrecords.py.
+
+    Returns:
+      str
+    """
+    if compression_type is None:
+        if not isinstance(file_pattern, str):
+            file_pattern = file_pattern[0]
+        compression_type = 'GZIP'
+        for candidate, suffix in TFRECORD_SUFFIXES.items():
+            if file_pattern.endswith(suffix):
+                compression_type = candidate
+    return '' if compression_type == 'NONE' else compression_type
+
+
+def parse_record_block(serialized, record_format):
+    """Parses a block of rows written by tfrecords.py.
+
+    Args:
+      serialized: rank-0 tensor of type string - a SequenceExample or a
+        columnar Example.
+      record_format: 'sequence_example' or 'columnar'.
+
+    Returns:
+      dict of rank-2 tensors, with a row per row of the block.
+    """
+    # Each row of the block is a value of the lists of the columns. The shape
+    # of FixedLenSequenceFeature must be a list, not an int.
+    feature_spec = {
+        feature_name: tf.io.FixedLenSequenceFeature(
+            shape=tf.TensorShape(feature.shape).as_list(),
+            dtype=feature.dtype, allow_missing=True)
+        for feature_name, feature in get_record_feature_spec().items()
+    }
+    if record_format == 'sequence_example':
+        _, features = tf.io.parse_single_sequence_example(
+            serialized, sequence_features=feature_spec)
+    else:
+        features = tf.io.parse_single_example(serialized, feature_spec)
+    return features
+
+
+def _cast_to_feature_spec(features, target):
+    """Casts the int64 values of the TFRecords to the dtypes of
+    get_feature_spec(), as read from CSV files."""
+    feature_spec = get_feature_spec()
+    features = {
+        key: tf.cast(tensor, feature_spec[key].dtype)
+        for key, tensor in features.items()
+    }
+    return features, tf.cast(target, feature_spec[metadata.TARGET_NAME].dtype)
+
+
+def _make_block_dataset(file_pattern, batch_size, record_format,
+                        compression_type, num_epochs, shuffle, buffer_size,
+                        num_threads):
+    """Reads the blocks of rows written by tfrecords.py, and rebatches their
+    rows in batches of batch_size."""
+    files = tf.data.Dataset.list_files(file_pattern, shuffle=shuffle)
+    dataset = files.interleave(
+        lambda file_name: tf.data.TFRecordDataset(
+            file_name, compression_type=compression_type),
+        cycle_length=num_threads,
+        num_parallel_calls=num_threads)
+    # A whole block is parsed at once, instead of one row at a time.
+    dataset = dataset.map(
+        lambda serialized: parse_record_block(serialized, record_format),
+        num_parallel_calls=num_threads)
+    dataset = dataset.unbatch()
+    if shuffle:
+        dataset = dataset.shuffle(buffer_size)
+    dataset = dataset.repeat(num_epochs).batch(batch_size)
+    dataset = dataset.map(
+        lambda features: (
+            {key: tensor for key, tensor in features.items()
+             if key != metadata.TARGET_NAME},
+            features[metadata.TARGET_NAME]))
+    return dataset.prefetch(1)
+
+
 def parse_csv(csv_row, is_serving=False):
     """Takes the string input tensor (csv) and returns a dict of rank-2 tensors.
 
@@ -118,7 +242,9 @@ def make_input_fn(file_pattern,
                   mode=tf.estimator.ModeKeys.EVAL,
                   has_header=True,
                   batch_size=200,
-                  multi_threading=True):
+                  multi_threading=True,
+                  record_format='example',
+                  compression_type=None):
     """Makes an input function for reading training and evaluation data file(s).
 
     Args:
@@ -127,7 +253,7 @@ def make_input_fn(file_pattern,
           data.
         mode: tf.estimator.ModeKeys - Either TRAIN or EVAL. Used to determine
           whether or not to randomize the order of data.
-        file_encoding: Type of the text files. Can be 'csv' or 'tfrecords'
+        file_encoding: Type of the data files. Can be 'csv' or 'tfrecords'
         has_header: boolean - Set to non-zero in order to skip header lines
         in CSV
           files.
@@ -136,6 +262,10 @@ def make_input_fn(file_pattern,
         batch_size: int - First dimension size of the Tensors returned by
         input_fn
         multi_threading: boolean - Indicator to use multi-threading or not
+        record_format: Format of the TFRecords, written by tfrecords.py. Can
+          be 'example', 'sequence_example' or 'columnar'.
+        compression_type: Compression of the TFRecords. Can be 'GZIP',
+          'ZLIB', 'NONE', or None to infer it from the suffix of the files.
 
     Returns:
         A function () -> (features, indices) where features is a dictionary of
@@ -151,6 +281,11 @@ def make_input_fn(file_pattern,
     logging.info('Mode: {}.'.format(mode))
     logging.info('Input file(s): {}.'.format(file_pattern))
     logging.info('Files encoding: {}.'.format(file_encoding))
+    if file_encoding != 'csv':
+        compression_type = get_compression_type(file_pattern,
+                                                compression_type)
+        logging.info('Record format: {}.'.format(record_format))
+        logging.info('Compression: {}.'.format(compression_type or 'NONE'))
     logging.info('Batch size: {}.'.format(batch_size))
     logging.info('Epoch count: {}.'.format(num_epochs))
     logging.info('Thread count: {}.'.format(num_threads))
@@ -172,12 +307,13 @@ def make_input_fn(file_pattern,
                 num_parallel_reads=num_threads,
                 sloppy=True,
             )
-        else:
+        elif record_format == 'example':
             dataset = tf.data.experimental.make_batched_features_dataset(
                 file_pattern,
                 batch_size,
-                features=get_feature_spec(),
+                features=get_record_feature_spec(),
                 reader=tf.data.TFRecordDataset,
+                reader_args=[compression_type],
                 label_key=metadata.TARGET_NAME,
                 num_epochs=num_epochs,
                 shuffle=shuffle,
@@ -186,6 +322,19 @@ def make_input_fn(file_pattern,
                 parser_num_threads=num_threads,
                 sloppy_ordering=True,
                 drop_final_batch=False)
+        else:
+            dataset = _make_block_dataset(
+                file_pattern,
+                batch_size,
+                record_format=record_format,
+                compression_type=compression_type,
+                num_epochs=num_epochs,
+                shuffle=shuffle,
+                buffer_size=buffer_size,
+                num_threads=num_threads)
+
+        if file_encoding != 'csv':
+            dataset = dataset.map(_cast_to_feature_spec)
 
         dataset = dataset.map(
             lambda features, target: (process_features(features),
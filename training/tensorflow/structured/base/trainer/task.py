@@ -22,6 +22,7 @@ import sys
 from datetime import datetime
 import tensorflow as tf
 
+from . import inputs
 from . import model
 from . import experiment
 
@@ -46,6 +47,28 @@ def get_args():
         help='GCS or local paths to evaluation data.',
         nargs='+',
         required=True)
+    args_parser.add_argument(
+        '--file-encoding',
+        help="""
+        Encoding of the data files: CSV, or TFRecords written by
+        trainer/tfrecords.py.
+        """,
+        choices=['csv', 'tfrecords'],
+        default='csv')
+    args_parser.add_argument(
+        '--record-format',
+        help='Format of the TFRecords, as written by trainer/tfrecords.py.',
+        choices=inputs.RECORD_FORMATS,
+        default='example')
+    args_parser.add_argument(
+        '--compression-type',
+        help="""
+        Compression of the TFRecords. If not set, it is inferred from the
+        suffix of the files (.tfrecord.gz, .tfrecord.zlib or .tfrecord), and
+        defaults to GZIP for the other files.
+        """,
+        choices=sorted(inputs.TFRECORD_SUFFIXES),
+        default=None)
 
     # Experiment arguments
     args_parser.add_argument(
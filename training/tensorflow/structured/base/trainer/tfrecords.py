@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Converts the CSV data files to sharded, compressed TFRecord files.
+
+The columns are typed by inputs.get_feature_spec(), so the trainer parses
+binary records instead of CSV text at every epoch. The bytes of the CSV files
+are split in as many contiguous ranges as output shards, and each shard is
+converted in a separate process. The rows of each shard are shuffled.
+
+Run from the `base` directory:
+
+    python -m trainer.tfrecords \
+        --input-files ${TAXI_TRAIN_SMALL} \
+        --output-dir /tmp/taxi/train \
+        --record-format columnar
+
+and train with --file-encoding tfrecords and the same --record-format.
+"""
+
+import argparse
+from concurrent import futures
+import csv
+import logging
+import multiprocessing
+import os
+import random
+
+import tensorflow as tf
+
+from . import inputs
+from . import metadata
+
+
+def _split_files(file_paths, num_shards):
+    """Splits the bytes of the files in num_shards contiguous ranges of about
+    the same size.
+
+    Args:
+      file_paths: list of str - the CSV files.
+      num_shards: int - number of ranges.
+
+    Returns:
+      A list of the (path, start, end) segments of the files of each range.
+    """
+    sizes = [tf.io.gfile.stat(path).length for path in file_paths]
+    total_size = sum(sizes)
+    shards = [[] for _ in range(num_shards)]
+    offset = 0
+    for path, size in zip(file_paths, sizes):
+        for shard, segments in enumerate(shards):
+            start = max(shard * total_size // num_shards - offset, 0)
+            end = min((shard + 1) * total_size // num_shards - offset, size)
+            if start < end:
+                segments.append((path, start, end))
+        offset += size
+    return shards
+
+
+def _read_lines(path, start, end, has_header):
+    """Yields the lines of the file starting in the bytes [start, end).
+
+    The segments of a file must not split a CSV row over several lines, i.e.
+    the values must not contain new lines.
+    """
+    with tf.io.gfile.GFile(path, 'rb') as f:
+        if start > 0:
+            # The line going over start belongs to the previous segment.
+            f.seek(start - 1)
+            f.readline()
+        elif has_header:
+            f.readline()
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            yield line.decode('utf-8')
+
+
+def _get_columns():
+    """Returns the (index in the CSV row, name, dtype, converter, default) of
+    the columns of inputs.get_feature_spec()."""
+    feature_spec = inputs.get_feature_spec()
+    columns = []
+    for index, column_name in enumerate(metadata.COLUMN_NAMES):
+        if column_name not in feature_spec:
+            continue
+        dtype = feature_spec[column_name].dtype
+        if dtype.is_floating:
+            converter = float
+        elif dtype.is_integer:
+            converter = int
+        else:
+            converter = str.encode
+        default = converter(str(metadata.DEFAULTS[index][0]))
+        columns.append((index, column_name, dtype, converter, default))
+    return columns
+
+
+def _make_feature(dtype, values):
+    """Returns the tf.train.Feature of a list of values."""
+    if dtype.is_floating:
+        return tf.train.Feature(float_list=tf.train.FloatList(value=values))
+    if dtype.is_integer:
+        return tf.train.Feature(int64_list=tf.train.Int64List(value=values))
+    return tf.train.Feature(bytes_list=tf.train.BytesList(value=values))
+
+
+def _serialize(rows, columns, record_format, block_size):
+    """Yields the serialized records of the rows.
+
+    Args:
+      rows: list of tuples - the typed values of each row.
+      columns: list - the columns of the rows, from _get_columns.
+      record_format: one of inputs.RECORD_FORMATS.
+      block_size: int - number of rows per record, if the records are
+        blocks of rows.
+    """
+    names_and_dtypes = [(name, dtype) for _, name, dtype, _, _ in columns]
+    if record_format == 'example':
+        for row in rows:
+            yield tf.train.Example(features=tf.train.Features(feature={
+                name: _make_feature(dtype, [value])
+                for (name, dtype), value in zip(names_and_dtypes, row)
+            })).SerializeToString()
+        return
+
+    for start in range(0, len(rows), block_size):
+        block = list(zip(*rows[start:start + block_size]))
+        if record_format == 'sequence_example':
+            record = tf.train.SequenceExample(
+                feature_lists=tf.train.FeatureLists(feature_list={
+                    name: tf.train.FeatureList(feature=[
+                        _make_feature(dtype, [value]) for value in values])
+                    for (name, dtype), values in zip(names_and_dtypes, block)
+                }))
+        else:
+            record = tf.train.Example(features=tf.train.Features(feature={
+                name: _make_feature(dtype, values)
+                for (name, dtype), values in zip(names_and_dtypes, block)
+            }))
+        yield record.SerializeToString()
+
+
+def _write_shard(segments, output_path, record_format, block_size,
+                 compression_type, has_header, seed):
+    """Converts the rows of the segments of the CSV files to a TFRecord file.
+
+    Returns:
+      int, the number of rows written.
+    """
+    columns = _get_columns()
+    rows = []
+    for path, start, end in segments:
+        for values in csv.reader(_read_lines(path, start, end, has_header)):
+            if not values:
+                continue
+            rows.append(tuple(
+                converter(values[index]) if values[index] else default
+                for index, _, _, converter, default in columns))
+    random.Random(seed).shuffle(rows)
+
+    options = tf.io.TFRecordOptions(
+        compression_type=inputs.get_compression_type(output_path,
+                                                     compression_type))
+    with tf.io.TFRecordWriter(output_path, options) as writer:
+        for record in _serialize(rows, columns, record_format, block_size):
+            writer.write(record)
+    return len(rows)
+
+
+def convert(file_pattern, output_dir, num_shards=None,
+            record_format='example', block_size=1000, compression_type='GZIP',
+            has_header=True, num_workers=None, seed=42):
+    """Converts CSV files to sharded TFRecord files, in parallel processes.
+
+    Args:
+      file_pattern: str or list of str - the CSV files.
+      output_dir: str - the directory of the TFRecord files.
+      num_shards: int - number of TFRecord files. Defaults to num_workers.
+      record_format: one of inputs.RECORD_FORMATS.
+      block_size: int - number of rows per record, if the records are
+        blocks of rows.
+      compression_type: one of inputs.TFRECORD_SUFFIXES.
+      has_header: boolean - whether the CSV files have a header line.
+      num_workers: int - number of processes. Defaults to the CPU count.
+      seed: int - random seed of the shuffling of the rows.
+
+    Returns:
+      list of str, the paths of the TFRecord files.
+    """
+    if isinstance(file_pattern, str):
+        file_pattern = [file_pattern]
+    file_paths = sorted(set(
+        path for pattern in file_pattern for path in tf.io.gfile.glob(pattern)))
+    if not file_paths:
+        raise ValueError('No files match {}.'.format(file_pattern))
+
+    num_workers = num_workers or multiprocessing.cpu_count()
+    num_shards = num_shards or num_workers
+    tf.io.gfile.makedirs(output_dir)
+    output_paths = [
+        os.path.join(output_dir, 'part-{:05d}-of-{:05d}{}'.format(
+            shard, num_shards, inputs.TFRECORD_SUFFIXES[compression_type]))
+        for shard in range(num_shards)
+    ]
+    logging.info('Converting {} file(s) to {} {} shard(s) with {} '
+                 'process(es)...'.format(len(file_paths), num_shards,
+                                         record_format, num_workers))
+
+    # TensorFlow isn't fork-safe, so the workers are started with spawn.
+    with futures.ProcessPoolExecutor(
+            num_workers,
+            mp_context=multiprocessing.get_context('spawn')) as executor:
+        num_rows = list(executor.map(
+            _write_shard,
+            _split_files(file_paths, num_shards),
+            output_paths,
+            [record_format] * num_shards,
+            [block_size] * num_shards,
+            [compression_type] * num_shards,
+            [has_header] * num_shards,
+            [seed + shard for shard in range(num_shards)]))
+    logging.info('Converted {} rows.'.format(sum(num_rows)))
+    return output_paths
+
+
+def get_args():
+    """Define the arguments of the conversion.
+
+    Returns:
+        conversion parameters
+    """
+
+    args_parser = argparse.ArgumentParser()
+
+    args_parser.add_argument(
+        '--input-files',
+        help='GCS or local paths to the CSV data files.',
+        nargs='+',
+        required=True)
+    args_parser.add_argument(
+        '--output-dir',
+        help='GCS or local directory to write the TFRecord files to.',
+        required=True)
+    args_parser.add_argument(
+        '--num-shards',
+        help='Number of TFRecord files. Defaults to --num-workers.',
+        type=int)
+    args_parser.add_argument(
+        '--record-format',
+        help="""
+        Format of the records. example writes one tf.train.Example per row.
+        sequence_example and columnar write one record per block of
+        --block-size rows, parsed at once by the trainer: a
+        tf.train.SequenceExample with a feature list per column, or a
+        tf.train.Example with a list of values per column.
+        """,
+        choices=inputs.RECORD_FORMATS,
+        default='example')
+    args_parser.add_argument(
+        '--block-size',
+        help='Number of rows per record of the sequence_example and '
+             'columnar formats.',
+        type=int,
+        default=1000)
+    args_parser.add_argument(
+        '--compression-type',
+        help='Compression of the TFRecord files.',
+        choices=sorted(inputs.TFRECORD_SUFFIXES),
+        default='GZIP')
+    args_parser.add_argument(
+        '--no-header',
+        help='Set if the CSV files do not have a header line.',
+        action='store_true',
+        default=False)
+    args_parser.add_argument(
+        '--num-workers',
+        help='Number of conversion processes. Defaults to the CPU count.',
+        type=int)
+    args_parser.add_argument(
+        '--seed',
+        help='Random seed of the shuffling of the rows.',
+        type=int,
+        default=42)
+
+    return args_parser.parse_args()
+
+
+def main():
+    args = get_args()
+    logging.basicConfig(level=logging.INFO)
+    convert(
+        args.input_files,
+        args.output_dir,
+        num_shards=args.num_shards,
+        record_format=args.record_format,
+        block_size=args.block_size,
+        compression_type=args.compression_type,
+        has_header=not args.no_header,
+        num_workers=args.num_workers,
+        seed=args.seed)
+
+
+if __name__ == '__main__':
+    main()
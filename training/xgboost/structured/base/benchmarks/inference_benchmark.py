@@ -0,0 +1,73 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Compares the latency and the throughput of the flattened trees of
+flat_trees.py to the native predict of the XGBoost model, for batch sizes of
+1 to 10k rows.
+
+Run from the `base` directory:
+
+    python -m benchmarks.inference_benchmark --n-estimators 100
+"""
+
+import argparse
+import time
+
+import numpy as np
+from xgboost import XGBClassifier
+
+from trainer import flat_trees
+
+
+def _time(function, repeats):
+    start = time.time()
+    for _ in range(repeats):
+        function()
+    return (time.time() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-rows', type=int, default=100000)
+    parser.add_argument('--n-estimators', type=int, default=100)
+    parser.add_argument('--max-depth', type=int, default=6)
+    parser.add_argument('--batch-sizes', type=int, nargs='+',
+                        default=[1, 10, 100, 1000, 10000])
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(42)
+    x = rng.random_sample((args.num_rows, 6)).astype(np.float32)
+    y = (x[:, 0] + rng.normal(scale=0.1, size=args.num_rows) > 0.5)
+    estimator = XGBClassifier(n_estimators=args.n_estimators,
+                              max_depth=args.max_depth).fit(x, y)
+    flat = flat_trees.from_xgboost(estimator)
+
+    print('\n{:>10} {:>14} {:>14} {:>16} {:>16}'.format(
+        'batch', 'native (ms)', 'flat (ms)', 'native (rows/s)',
+        'flat (rows/s)'))
+    for batch_size in args.batch_sizes:
+        batch = rng.random_sample((batch_size, 6)).astype(np.float32)
+        np.testing.assert_allclose(flat.predict_proba(batch),
+                                   estimator.predict_proba(batch), atol=1e-5)
+        repeats = max(1, 10000 // batch_size)
+        native = _time(lambda: estimator.predict(batch), repeats)
+        flat_time = _time(lambda: flat.predict(batch), repeats)
+        print('{:>10} {:>14.3f} {:>14.3f} {:>16.0f} {:>16.0f}'.format(
+            batch_size, native * 1000, flat_time * 1000,
+            batch_size / native, batch_size / flat_time))
+
+
+if __name__ == '__main__':
+    main()
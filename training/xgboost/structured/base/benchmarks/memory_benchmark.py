@@ -0,0 +1,148 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Reports the peak RSS and the wall time of the trainer for increasing
+numbers of rows, when the whole dataset is loaded in memory and with
+--streaming.
+
+Run from the `base` directory:
+
+    python -m benchmarks.memory_benchmark --num-rows 100000 1000000 4000000
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import traceback
+
+import numpy as np
+import pandas as pd
+
+from trainer import metadata
+from trainer import task
+from trainer import utils
+
+# The trainer arguments of each configuration, in addition to the input and
+# the job directory. {tmp_dir} is replaced by the directory of the data.
+CONFIGURATIONS = {
+    'in memory': [],
+    'streaming (QuantileDMatrix)': ['--streaming'],
+    'streaming (external memory)': [
+        '--streaming', '--external-memory-dir', '{tmp_dir}/cache'],
+}
+
+
+def write_synthetic_shards(directory, num_rows, num_shards, seed=42):
+    """Writes `num_rows` taxi-shaped rows in `num_shards` CSV files, with the
+    columns of metadata.CSV_COLUMN_DTYPES and a header row."""
+    rng = np.random.RandomState(seed)
+    for shard in range(num_shards):
+        shard_rows = num_rows // num_shards
+        columns = {}
+        for name, dtype in metadata.CSV_COLUMN_DTYPES.items():
+            if dtype == 'category':
+                vocabulary = np.array(
+                    ['{}_{}'.format(name, i) for i in range(50)])
+                columns[name] = vocabulary[rng.randint(0, 50, shard_rows)]
+            elif dtype.startswith('int'):
+                columns[name] = rng.randint(0, 2, shard_rows)
+            else:
+                columns[name] = rng.random_sample(shard_rows) * 100
+        pd.DataFrame(columns).to_csv(
+            os.path.join(directory, 'taxi_trips_{:05d}.csv'.format(shard)),
+            index=False)
+
+
+def _run_configuration(argv, results):
+    start = time.time()
+    try:
+        task.run_experiment(task._parse_args(argv))
+    except Exception:
+        results.put(traceback.format_exc())
+        return
+    # ru_maxrss is in kilobytes on Linux.
+    results.put((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.,
+                 time.time() - start))
+
+
+def run_configuration(argv):
+    """Trains one configuration in a new process, and returns its peak RSS
+    in MB and its wall time in seconds.
+
+    Raises:
+      RuntimeError: if the training fails.
+    """
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_run_configuration,
+                              args=(argv, results))
+    process.start()
+    result = results.get()
+    process.join()
+    if isinstance(result, str):
+        raise RuntimeError('Training with {} failed:\n{}'.format(argv, result))
+    return result
+
+
+def check_chunk_reader(file_pattern, num_rows, chunk_size):
+    """Reads the files with the chunked reader of --streaming, and checks
+    that it reads all the rows."""
+    num_read = sum(len(chunk) for chunk in utils.read_df_chunks_from_gcs(
+        file_pattern, chunk_size))
+    if num_read != num_rows:
+        raise RuntimeError('Read {} rows of {} instead of {}.'.format(
+            num_read, file_pattern, num_rows))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-rows', type=int, nargs='+',
+                        default=[100000, 1000000, 4000000])
+    parser.add_argument('--num-shards', type=int, default=8)
+    parser.add_argument('--n-estimators', type=int, default=100)
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    args = parser.parse_args()
+
+    results = {}
+    for num_rows in args.num_rows:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_synthetic_shards(tmp_dir, num_rows, args.num_shards)
+            file_pattern = os.path.join(tmp_dir, '*.csv')
+            check_chunk_reader(file_pattern,
+                               num_rows // args.num_shards * args.num_shards,
+                               args.chunk_size)
+            for name, configuration in CONFIGURATIONS.items():
+                argv = ['--input', file_pattern,
+                        '--job-dir', os.path.join(tmp_dir, 'job'),
+                        '--n-estimators', str(args.n_estimators),
+                        '--chunk-size', str(args.chunk_size)]
+                results[name, num_rows] = run_configuration(argv + [
+                    arg.format(tmp_dir=tmp_dir) for arg in configuration])
+
+    print('\nPeak RSS (MB) / wall time (s)')
+    print('{:<30}'.format('configuration') + ''.join(
+        '{:>16}'.format('{} rows'.format(num_rows))
+        for num_rows in args.num_rows))
+    for name in CONFIGURATIONS:
+        print('{:<30}'.format(name) + ''.join(
+            '{:>16}'.format('{:.0f} / {:.1f}'.format(*results[name, num_rows]))
+            for num_rows in args.num_rows))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Reports the size, the save time and the load time of an XGBoost model for
+each format of utils.save_model, and each compression of the joblib format.
+
+Run from the `base` directory:
+
+    python -m benchmarks.serialization_benchmark --n-estimators 500
+"""
+
+import argparse
+import importlib
+import os
+import tempfile
+import time
+
+import numpy as np
+from xgboost import XGBClassifier
+
+from trainer import utils
+
+# The packages required by the compressions.
+REQUIRED_PACKAGES = {'lz4': 'lz4', 'zstd': 'zstandard'}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-rows', type=int, default=100000)
+    parser.add_argument('--n-estimators', type=int, default=500)
+    parser.add_argument('--max-depth', type=int, default=8)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(42)
+    x = rng.random_sample((args.num_rows, 6)).astype(np.float32)
+    y = (x[:, 0] + rng.normal(scale=0.1, size=args.num_rows) > 0.5)
+    estimator = XGBClassifier(n_estimators=args.n_estimators,
+                              max_depth=args.max_depth).fit(x, y)
+
+    options = [(how, None) for how in sorted(utils.MODEL_EXTENSIONS)
+               if how != 'joblib']
+    for compression in utils.COMPRESSIONS:
+        if compression in REQUIRED_PACKAGES:
+            try:
+                importlib.import_module(REQUIRED_PACKAGES[compression])
+            except ImportError:
+                print('{} is not installed, skipping {}.'.format(
+                    REQUIRED_PACKAGES[compression], compression))
+                continue
+        options.append(('joblib', compression))
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for how, compression in options:
+            name = how if compression is None else '{} ({})'.format(
+                how, compression)
+            path = os.path.join(tmp_dir, name.replace(' ', '_'),
+                                'model' + utils.MODEL_EXTENSIONS[how])
+            start = time.time()
+            utils.save_model(estimator, path, how=how, compression=compression)
+            save_time = time.time() - start
+            size_mb = os.path.getsize(path) / 1024. / 1024.
+
+            start = time.time()
+            utils.load_model(path, how=how)
+            load_time = time.time() - start
+            results.append((name, size_mb, save_time, load_time))
+
+    print('\n{:<16} {:>10} {:>10} {:>10}'.format(
+        'format', 'size (MB)', 'save (s)', 'load (s)'))
+    for name, size_mb, save_time, load_time in results:
+        print('{:<16} {:>10.1f} {:>10.2f} {:>10.2f}'.format(
+            name, size_mb, save_time, load_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -27,8 +27,12 @@ REQUIRED_PACKAGES = [
     'tensorflow==2.8.0',
     'scikit-learn==1.0.2',
     'pandas==1.4.1',
-    'xgboost==1.5.2',
+    'xgboost==1.7.6',
     'cloudml-hypertune',
+    'pyarrow',
+    'google-cloud-bigquery-storage',
+    # Blob.open, to stream the model to Google Cloud Storage.
+    'google-cloud-storage>=1.38.0',
 ]
 
 setup(
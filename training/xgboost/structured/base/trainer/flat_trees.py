@@ -0,0 +1,219 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Flattened decision trees, evaluated with vectorized NumPy operations.
+
+The nodes of all the trees of a model are stored in a few flat arrays, saved
+in a .npz file. Predicting only needs NumPy: all the rows walk down all the
+trees together, one level at a time, instead of one tree after the other.
+"""
+
+import json
+import os
+
+import numpy as np
+
+# The file name of the flattened trees, next to the model.
+FLAT_TREES_FILE_NAME = 'model.npz'
+
+
+class FlatTrees(object):
+    """The trees of a model, as flat arrays of nodes.
+
+    Node i splits on the feature feature[i]: the rows whose value is less
+    than threshold[i] go to the node left[i], the others to the node
+    right[i], and the missing values go to the left if default_left[i]. The
+    leaves are their own children, so all the rows can walk down max_depth
+    levels. The score of a tree is the value of the leaf reached, and the
+    scores of the trees are summed or averaged (aggregation), added to
+    base_score, and transformed by the link function.
+    """
+
+    def __init__(self, roots, feature, threshold, left, right, default_left,
+                 value, max_depth, classes, aggregation='mean', link='identity',
+                 base_score=0.):
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float32)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.value = np.asarray(value)
+        self.max_depth = int(max_depth)
+        self.classes = np.asarray(classes)
+        self.aggregation = str(aggregation)
+        self.link = str(link)
+        self.base_score = float(base_score)
+
+    def leaves(self, X):
+        """Returns the index of the leaf reached by each row in each tree.
+
+        Args:
+          X: (numpy.ndarray) features, converted to float32
+
+        Returns:
+          numpy.ndarray of shape (number of rows, number of trees)
+        """
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, np.newaxis]
+        nodes = np.repeat(self.roots[np.newaxis, :], len(X), axis=0)
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = x < self.threshold[nodes]
+            missing = np.isnan(x)
+            if missing.any():
+                go_left = np.where(missing, self.default_left[nodes], go_left)
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        """Returns the probabilities of the classes of each row."""
+        scores = self.value[self.leaves(X)].sum(axis=1)
+        if self.aggregation == 'mean':
+            scores /= len(self.roots)
+        scores += self.base_score
+        if self.link == 'sigmoid':
+            # Binary classification, on the margin of the positive class.
+            positive = 1. / (1. + np.exp(-scores[:, 0]))
+            return np.stack([1. - positive, positive], axis=1)
+        return scores
+
+    def predict(self, X):
+        """Returns the predicted class of each row."""
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+    def save(self, file):
+        """Saves the arrays in a .npz file, or file object."""
+        np.savez(file, roots=self.roots, feature=self.feature,
+                 threshold=self.threshold, left=self.left, right=self.right,
+                 default_left=self.default_left, value=self.value,
+                 max_depth=self.max_depth, classes=self.classes,
+                 aggregation=self.aggregation, link=self.link,
+                 base_score=self.base_score)
+
+    @classmethod
+    def load(cls, file):
+        """Loads the arrays saved by save."""
+        with np.load(file) as arrays:
+            return cls(**{name: arrays[name] for name in arrays.files})
+
+
+def from_xgboost(model):
+    """Flattens the trees of an XGBoost binary classifier.
+
+    With early stopping, only the trees of the best boosting round are kept,
+    as XGBoost predicts with them.
+
+    Args:
+      model: (xgboost.XGBClassifier or xgboost.Booster) a fitted model, with
+        the gbtree booster and the binary:logistic objective
+
+    Returns:
+      FlatTrees, predicting the same probabilities as the model
+    """
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    learner = json.loads(bytes(booster.save_raw(raw_format='json')))['learner']
+    objective = learner['objective']['name']
+    gradient_booster = learner['gradient_booster']
+    if (objective != 'binary:logistic' or
+            gradient_booster['name'] != 'gbtree'):
+        raise ValueError(
+            'Only the gbtree models with the binary:logistic objective can be '
+            'flattened, not {} {}'.format(gradient_booster['name'], objective))
+
+    trees = gradient_booster['model']['trees']
+    best_iteration = getattr(booster, 'best_iteration', None)
+    if best_iteration is not None:
+        num_parallel_tree = int(gradient_booster['model'][
+            'gbtree_model_param']['num_parallel_tree'])
+        trees = trees[:(best_iteration + 1) * num_parallel_tree]
+
+    arrays = {name: [] for name in ('feature', 'threshold', 'left', 'right',
+                                    'default_left', 'value')}
+    roots = []
+    max_depth = 0
+    offset = 0
+    for tree in trees:
+        left = np.array(tree['left_children'])
+        right = np.array(tree['right_children'])
+        nodes = np.arange(len(left))
+        leaf = left == -1
+        # The children of a node are always after it.
+        depth = np.zeros(len(left), dtype=np.int32)
+        for node in nodes[~leaf]:
+            depth[left[node]] = depth[right[node]] = depth[node] + 1
+        max_depth = max(max_depth, depth.max())
+
+        # XGBoost sends the rows with x < split condition to the left, and
+        # stores the values of the leaves as their split conditions.
+        split_conditions = np.array(tree['split_conditions'],
+                                    dtype=np.float32)
+        roots.append(offset)
+        arrays['feature'].append(np.where(leaf, 0, tree['split_indices']))
+        arrays['threshold'].append(split_conditions)
+        arrays['left'].append(np.where(leaf, nodes, left) + offset)
+        arrays['right'].append(np.where(leaf, nodes, right) + offset)
+        arrays['default_left'].append(
+            np.array(tree['default_left'], dtype=bool))
+        arrays['value'].append(np.where(leaf, split_conditions,
+                                        0)[:, np.newaxis])
+        offset += len(left)
+
+    # The margin of the base score, as the sum of the trees is a margin.
+    # XGBoost 1.x stores the base score as a string, e.g. '5E-1', and
+    # XGBoost 2 as a string of a list, e.g. '[4.94E-1]'.
+    base_score = float(np.asarray(json.loads(
+        learner['learner_model_param']['base_score'])).ravel()[0])
+    return FlatTrees(
+        roots=roots,
+        max_depth=max_depth,
+        classes=getattr(model, 'classes_', np.array([0, 1])),
+        aggregation='sum',
+        link='sigmoid',
+        base_score=np.log(base_score / (1. - base_score)),
+        **{name: np.concatenate(values) for name, values in arrays.items()})
+
+
+class FlatTreesPredictor(object):
+    """Predicts with the flattened trees of a model.
+
+    It implements the interface of the custom prediction routines of AI
+    Platform Prediction, and can also be used locally:
+
+        predictor = FlatTreesPredictor.from_path('trained/model')
+        predictor.predict([[1.1, 420, 625, 8, 16, 3]])
+    """
+
+    def __init__(self, flat_trees):
+        self._flat_trees = flat_trees
+
+    def predict(self, instances, **kwargs):
+        """Returns the probability of the positive class of each instance, as
+        the predictions of the XGBoost model served by AI Platform Prediction.
+
+        Args:
+          instances: (List[List[float]]) the features of each instance
+          **kwargs: unused
+
+        Returns:
+          List of the probabilities of the positive class
+        """
+        return self._flat_trees.predict_proba(instances)[:, 1].tolist()
+
+    @classmethod
+    def from_path(cls, model_dir):
+        """Loads the flattened trees of the model directory."""
+        return cls(FlatTrees.load(os.path.join(model_dir,
+                                               FLAT_TREES_FILE_NAME)))
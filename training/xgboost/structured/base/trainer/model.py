@@ -30,9 +30,13 @@ def get_estimator(arguments):
 
     # n_estimators and max_depth are expected to be passed as
     # command line argument to task.py
+    # The error of the validation set is evaluated after each boosting round,
+    # to stop the training early.
     classifier = XGBClassifier(
         n_estimators=arguments.n_estimators,
         max_depth=arguments.max_depth,
+        n_jobs=arguments.n_jobs,
+        eval_metric='error',
+        early_stopping_rounds=arguments.early_stopping_rounds,
     )
-    classifier
     return classifier
@@ -20,69 +20,201 @@ import logging
 import os
 
 import hypertune
-import numpy as np
+import xgboost
 from datetime import datetime
-from sklearn import model_selection
+from trainer import flat_trees
 from trainer import metadata
 from trainer import model
 from trainer import utils
 
 
-def _train_and_evaluate(estimator, dataset, output_dir):
+# The default name of the metric is training/hptuning/metric.
+# We recommend that you assign a custom name
+# The only functional difference is that if you use a custom name,
+# you must set the hyperparameterMetricTag value in the
+# HyperparameterSpec object in the job request to match the chosen name
+METRIC_TAG = 'my_metric_tag'
+
+
+def _hypertune_callbacks(data_name):
+    """The callbacks reporting the accuracy of each boosting round on the
+    validation set named data_name, when tuning the hyperparameters."""
+    if not metadata.HYPERPARAMETER_TUNING:
+        return None
+    return [utils.HypertuneCallback(data_name, METRIC_TAG)]
+
+
+def _report_metric(booster, errors):
+    """Reports the final validation accuracy of the model to hypertune.
+
+    Args:
+      booster: (xgboost.Booster), the trained model
+      errors: (List[float]), the validation error of each boosting round
+
+    Returns:
+      None
+    """
+    # With early stopping, the model predicts with the trees of the best
+    # round, not of the last one.
+    best_iteration = getattr(booster, 'best_iteration', len(errors) - 1)
+    accuracy = 1. - errors[best_iteration]
+    logging.info('Validation accuracy: %s (%d boosting rounds)', accuracy,
+                 best_iteration + 1)
+
+    hpt = hypertune.HyperTune()
+    hpt.report_hyperparameter_tuning_metric(
+        hyperparameter_metric_tag=METRIC_TAG,
+        metric_value=accuracy,
+        global_step=len(errors))
+
+
+def _train_and_evaluate(estimator, dataset, output_dir, model_format='bst',
+                        compression=None, export_flat_trees=False):
     """Runs model training and evaluation.
 
+    The validation set is evaluated after every boosting round, to stop the
+    training early (with --early-stopping-rounds) and to report the accuracy
+    of each round to hypertune.
+
     Args:
-      estimator: (pipeline.Pipeline), Pipeline instance, assemble
-        pre-processing steps and model training
+      estimator: (xgboost.XGBClassifier), the estimator to train
       dataset: (pandas.DataFrame), DataFrame containing training data
       output_dir: (string), directory that the trained model will be exported
+      model_format: (string), format of the exported model
+      compression: (string), compression of the exported model, if joblib
+      export_flat_trees: (bool), whether to also export the flattened trees
+        of the model
 
     Returns:
       None
     """
     x_train, y_train, x_val, y_val = utils.data_train_test_split(dataset)
-    estimator.fit(x_train, y_train)
+    estimator.set_params(callbacks=_hypertune_callbacks('validation_0'))
+    estimator.fit(x_train, y_train, eval_set=[(x_val, y_val)], verbose=False)
+    # The callbacks are not saved with the model.
+    estimator.set_params(callbacks=None)
 
     # Write model and eval metrics to `output_dir`
-    model_output_path = os.path.join(output_dir, 'model',
-                                     metadata.MODEL_FILE_NAME)
+    model_file_name = (os.path.splitext(metadata.MODEL_FILE_NAME)[0] +
+                       utils.MODEL_EXTENSIONS[model_format])
+    model_output_path = os.path.join(output_dir, 'model', model_file_name)
 
-    utils.save_model(estimator, model_output_path, how='bst')
+    utils.save_model(estimator, model_output_path, how=model_format,
+                     compression=compression)
+
+    if export_flat_trees:
+        utils.save_flat_trees(
+            flat_trees.from_xgboost(estimator),
+            os.path.join(output_dir, 'model', flat_trees.FLAT_TREES_FILE_NAME))
 
     if metadata.HYPERPARAMETER_TUNING:
-        # Note: for now, use `cross_val_score` defaults (i.e. 3-fold)
-        scores = model_selection.cross_val_score(estimator, x_val, y_val, cv=3)
+        _report_metric(estimator.get_booster(),
+                       estimator.evals_result()['validation_0']['error'])
+
+
+def _train_and_evaluate_streaming(estimator, arguments):
+    """Runs model training and evaluation, streaming the data from the files.
+
+    The training rows are quantized in a QuantileDMatrix, one chunk at a
+    time, so the raw data is never held in memory. With
+    --external-memory-dir, the rows are cached on disk in an external memory
+    DMatrix instead.
+
+    Args:
+      estimator: (xgboost.XGBClassifier), the parameters of the booster
+      arguments: (argparse.Namespace), parameters passed from command-line
 
-        logging.info('Scores: %s', scores)
+    Returns:
+      None
+    """
+    data_iters = {}
+    for subset in ('train', 'validation'):
+        cache_prefix = None
+        if arguments.external_memory_dir:
+            cache_prefix = os.path.join(arguments.external_memory_dir, subset)
+        data_iters[subset] = utils.DataFrameChunksIter(
+            arguments.input, arguments.chunk_size, subset=subset,
+            seed=arguments.seed, cache_prefix=cache_prefix)
+
+    if arguments.external_memory_dir:
+        os.makedirs(arguments.external_memory_dir, exist_ok=True)
+        dtrain = xgboost.DMatrix(data_iters['train'])
+        dval = xgboost.DMatrix(data_iters['validation'])
+    else:
+        dtrain = xgboost.QuantileDMatrix(data_iters['train'],
+                                         max_bin=arguments.max_bin)
+        dval = xgboost.QuantileDMatrix(data_iters['validation'], ref=dtrain)
+
+    # The quantized data of the QuantileDMatrix can only be trained with the
+    # histogram method.
+    params = dict(estimator.get_xgb_params(), tree_method='hist',
+                  max_bin=arguments.max_bin)
+    evals_result = {}
+    booster = xgboost.train(
+        params, dtrain,
+        num_boost_round=estimator.n_estimators,
+        evals=[(dval, 'validation')],
+        evals_result=evals_result,
+        early_stopping_rounds=estimator.early_stopping_rounds,
+        callbacks=_hypertune_callbacks('validation'),
+        verbose_eval=False)
+
+    # Write model and eval metrics to `job_dir`
+    model_file_name = (os.path.splitext(metadata.MODEL_FILE_NAME)[0] +
+                       utils.MODEL_EXTENSIONS[arguments.model_format])
+    model_output_path = os.path.join(arguments.job_dir, 'model',
+                                     model_file_name)
+
+    utils.save_model(booster, model_output_path, how=arguments.model_format,
+                     compression=arguments.model_compression)
+
+    if arguments.export_flat_trees:
+        utils.save_flat_trees(
+            flat_trees.from_xgboost(booster),
+            os.path.join(arguments.job_dir, 'model',
+                         flat_trees.FLAT_TREES_FILE_NAME))
 
-        # The default name of the metric is training/hptuning/metric.
-        # We recommend that you assign a custom name
-        # The only functional difference is that if you use a custom name,
-        # you must set the hyperparameterMetricTag value in the
-        # HyperparameterSpec object in the job request to match the chosen name
-        hpt = hypertune.HyperTune()
-        hpt.report_hyperparameter_tuning_metric(
-            hyperparameter_metric_tag='my_metric_tag',
-            metric_value=np.mean(scores),
-            global_step=1000)
+    if metadata.HYPERPARAMETER_TUNING:
+        _report_metric(booster, evals_result['validation']['error'])
 
 
 def run_experiment(arguments):
     """Testbed for running model training and evaluation."""
     # Get data for training and evaluation
 
+    if arguments.n_jobs is None:
+        arguments.n_jobs = utils.available_cpu_count()
     logging.info('Arguments: %s', arguments)
 
-    dataset = utils.read_df_from_gcs(arguments.input)
+    if arguments.streaming:
+        if utils.is_bigquery_table(arguments.input):
+            raise ValueError('--streaming only supports CSV and Parquet '
+                             'files.')
+        _train_and_evaluate_streaming(model.get_estimator(arguments),
+                                      arguments)
+        return
+
+    if utils.is_bigquery_table(arguments.input):
+        dataset = utils.read_df_from_bigquery(
+            arguments.input,
+            sample_percentage=arguments.bigquery_sample_percentage)
+    else:
+        dataset = utils.read_df_from_gcs(
+            arguments.input,
+            engine=arguments.csv_engine,
+            cache_dir=arguments.data_cache_dir,
+            max_cache_size_mb=arguments.data_cache_size_mb)
 
     # Get estimator
     estimator = model.get_estimator(arguments)
 
     # Run training and evaluation
-    _train_and_evaluate(estimator, dataset, arguments.job_dir)
+    _train_and_evaluate(estimator, dataset, arguments.job_dir,
+                        arguments.model_format, arguments.model_compression,
+                        arguments.export_flat_trees)
 
 
-def _parse_args():
+def _parse_args(argv=None):
     """Parses command-line arguments."""
 
     parser = argparse.ArgumentParser()
@@ -109,12 +241,119 @@ def _parse_args():
         required=True,
     )
 
+    parser.add_argument(
+        '--bigquery-sample-percentage',
+        help='''Percentage of the rows of the BigQuery table, sampled randomly
+              by BigQuery, to read. If not set, all the rows are read.
+            ''',
+        type=float,
+    )
+
+    parser.add_argument(
+        '--csv-engine',
+        help='''The pandas parser engine of the CSV files. The pyarrow engine
+              parses each file with multiple threads, and requires pyarrow.
+            ''',
+        choices=['c', 'pyarrow'],
+        default='c',
+    )
+
+    parser.add_argument(
+        '--data-cache-dir',
+        help='''Local directory caching the parsed training data as Feather
+              files. Later runs reading the same files (e.g. hyperparameter
+              tuning trials on the same machine) memory-map the cached data
+              instead of parsing the CSV files.
+            ''',
+    )
+
+    parser.add_argument(
+        '--data-cache-size-mb',
+        help='''Maximum size of --data-cache-dir, in MB. The least recently
+              used data is evicted first.
+            ''',
+        type=int,
+        default=10240,
+    )
+
+    parser.add_argument(
+        '--streaming',
+        help='''Stream the CSV or Parquet files in chunks of --chunk-size
+              rows into a QuantileDMatrix, instead of loading them in a
+              DataFrame, to train on datasets larger than memory.
+            ''',
+        action='store_true',
+    )
+
+    parser.add_argument(
+        '--chunk-size',
+        help='Number of rows read at once with --streaming.',
+        type=int,
+        default=100000,
+    )
+
+    parser.add_argument(
+        '--external-memory-dir',
+        help='''Local directory caching the data on disk with --streaming,
+              in an external memory DMatrix, instead of holding the quantized
+              data in memory.
+            ''',
+    )
+
+    parser.add_argument(
+        '--seed',
+        help='Random seed of the validation split with --streaming.',
+        type=int,
+        default=42,
+    )
+
     parser.add_argument(
         '--job-dir',
         help='Output directory for exporting model and other metadata.',
         required=True,
     )
 
+    parser.add_argument(
+        '--model-format',
+        help='''Format of the exported model. bst (the legacy binary format of
+              XGBoost) is the format served by AI Platform Prediction. json
+              and ubj (UBJSON) are the newer formats of XGBoost, and joblib
+              and pickle save the whole XGBClassifier.
+            ''',
+        choices=sorted(utils.MODEL_EXTENSIONS),
+        default='bst',
+    )
+
+    parser.add_argument(
+        '--model-compression',
+        help='''Compression of the exported joblib model. Uncompressed
+              models load fastest, as their arrays can be memory-mapped.
+              lz4 requires the lz4 package, and zstd the zstandard package
+              and this trainer's utils module (also when the model is loaded),
+              so zstd models can't be served by AI Platform Prediction.
+            ''',
+        choices=utils.COMPRESSIONS,
+        default='none',
+    )
+
+    parser.add_argument(
+        '--export-flat-trees',
+        help='''Also export the trees of the model flattened in arrays of
+              nodes, as model.npz, for the vectorized NumPy evaluator of
+              flat_trees.py.
+            ''',
+        action='store_true',
+    )
+
+    parser.add_argument(
+        '--n-jobs',
+        help='''Number of CPUs used to train the model. Defaults to the CPUs
+              this process is allowed to use, capped by the CPU quota of its
+              container.
+            ''',
+        type=int,
+    )
+
     parser.add_argument(
         '--n-estimators',
         help='Number of trees in the forest.',
@@ -129,7 +368,26 @@ def _parse_args():
         default=3,
     )
 
-    return parser.parse_args()
+    parser.add_argument(
+        '--max-bin',
+        help='''Maximum number of bins of the histograms of the
+              features with --streaming, i.e. of the quantiles the features
+              are bucketed in.
+            ''',
+        type=int,
+        default=256,
+    )
+
+    parser.add_argument(
+        '--early-stopping-rounds',
+        help='''Stop the training when the validation error hasn't decreased
+              for this number of boosting rounds. The model keeps the trees of
+              the best round. If not set, --n-estimators rounds are trained.
+            ''',
+        type=int,
+    )
+
+    return parser.parse_args(argv)
 
 
 def main():
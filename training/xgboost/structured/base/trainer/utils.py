@@ -15,94 +15,588 @@
 
 """Hold utility functions."""
 
+from concurrent import futures
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import math
 import os
+import re
+import shutil
+import tempfile
+import threading
+import uuid
 
-import ntpath
 import pickle
+from google.api_core import exceptions
+from google.cloud import bigquery_storage
+from google.cloud import storage
+import hypertune
+import joblib
+from joblib.compressor import CompressorWrapper
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
+import pyarrow as pa
+from pyarrow import feather
+from pyarrow import parquet
 import tensorflow as tf
+import xgboost
 
 from sklearn import model_selection as ms
-from sklearn.externals import joblib
 
 from trainer import metadata
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
-def data_train_test_split(data_df):
+# The compressions of the joblib format of save_model. 'lz4' requires the lz4
+# package, 'zstd' the zstandard package.
+COMPRESSIONS = ['none', 'zlib', 'lz4', 'zstd']
+
+
+class ZstdCompressorWrapper(CompressorWrapper):
+    """joblib compressor writing Zstandard frames with the zstandard package.
+
+    joblib doesn't support Zstandard: it is registered as the 'zstd'
+    compressor when zstandard is installed. The loading process must also
+    import this module to load the files, so the models compressed with it
+    can't be served by AI Platform Prediction.
+    """
+
+    def __init__(self):
+        CompressorWrapper.__init__(self, obj=None, prefix=b'\x28\xb5\x2f\xfd',
+                                   extension='.zst')
+
+    def compressor_file(self, fileobj, compresslevel=None):
+        # joblib.dump passes the path of the file, unless it was given a file
+        # object. Only the files opened here are closed with the stream.
+        closefd = isinstance(fileobj, str)
+        if closefd:
+            fileobj = open(fileobj, 'wb')
+        compressor = zstandard.ZstdCompressor(level=compresslevel or 3)
+        return compressor.stream_writer(fileobj, closefd=closefd)
+
+    def decompressor_file(self, fileobj):
+        closefd = isinstance(fileobj, str)
+        if closefd:
+            fileobj = open(fileobj, 'rb')
+        return zstandard.ZstdDecompressor().stream_reader(fileobj,
+                                                          closefd=closefd)
+
+
+if zstandard is not None:
+    joblib.register_compressor('zstd', ZstdCompressorWrapper(), force=True)
+
+
+def data_train_test_split(data_df, test_size=0.2, stratify=False, seed=None,
+                          dtype=np.float32):
     """Split the DataFrame two subsets for training and testing.
 
+    The features are copied once, column by column, in the rows of a
+    random permutation, into a single contiguous matrix. The training and
+    testing subsets are views of its first and last rows, so no intermediate
+    DataFrames or copies of the matrix are made.
+
     Args:
       data_df: (pandas.DataFrame) DataFrame the splitting to be performed on
+      test_size: (float) fraction of the rows used for testing
+      stratify: (bool) whether the subsets keep the proportions of the classes
+        of the target
+      seed: (int, Optional) seed of the random permutation of the rows
+      dtype: (numpy.dtype) dtype of the feature matrix
 
     Returns:
-      A Tuple of (pandas.DataFrame, pandas.Series,
-                  pandas.DataFrame, pandas.Series)
+      A Tuple of (numpy.ndarray, numpy.ndarray,
+                  numpy.ndarray, numpy.ndarray)
     """
 
     # Only use metadata.FEATURE_NAMES + metadata.TARGET_NAME
-    features = data_df[metadata.FEATURE_NAMES]
-    target = data_df[metadata.TARGET_NAME]
+    feature_names = metadata.FEATURE_NAMES
+    target = data_df[metadata.TARGET_NAME].to_numpy()
+    num_rows = len(data_df)
+    num_val = int(math.ceil(num_rows * test_size))
+
+    if stratify:
+        splitter = ms.StratifiedShuffleSplit(n_splits=1, test_size=num_val,
+                                             random_state=seed)
+        train_index, val_index = next(
+            splitter.split(np.empty((num_rows, 0)), target))
+        permutation = np.concatenate([train_index, val_index])
+    else:
+        permutation = np.random.RandomState(seed).permutation(num_rows)
+
+    features = np.empty((num_rows, len(feature_names)), dtype=dtype)
+    for index, name in enumerate(feature_names):
+        features[:, index] = data_df[name].to_numpy()[permutation]
+    target = target[permutation]
+
+    num_train = num_rows - num_val
+    return (features[:num_train], target[:num_train],
+            features[num_train:], target[num_train:])
 
-    x_train, x_val, y_train, y_val = ms.train_test_split(features,
-                                                         target,
-                                                         test_size=0.2)
-    return x_train.values, y_train, x_val.values, y_val
 
+# The suffixes of data files, whose names may look like BigQuery tables, e.g.
+# data.train.csv.
+_FILE_SUFFIXES = ('.csv', '.parquet', '.feather', '.json', '.avro', '.txt',
+                  '.gz')
 
-def read_df_from_bigquery(full_table_path, project_id=None, num_samples=None):
-    """Read data from BigQuery and split into train and validation sets.
+
+def is_bigquery_table(path):
+    """Check whether path is a BigQuery table rather than a file pattern.
+
+    Paths with a directory or a scheme (e.g. gs://), or ending with the suffix
+    of a data file, are never tables, even if the file doesn't exist.
 
     Args:
-      full_table_path: (string) full path of the table containing training data
+      path: (string) --input of the trainer, either a file pattern or a table
         in the format of [project_id.dataset_name.table_name].
-      project_id: (string, Optional) Google BigQuery Account project ID.
-      num_samples: (int, Optional) Number of data samples to read.
+
+    Returns:
+      bool
+    """
+
+    if '/' in path or path.lower().endswith(_FILE_SUFFIXES):
+        return False
+    return (re.match(r'^[\w.:-]+\.\w+\.\w+$', path) is not None and
+            not tf.io.gfile.glob(path))
+
+
+def _arrow_table_to_df(table):
+    """Convert an Arrow table to a DataFrame with the dtypes of
+    metadata.CSV_COLUMN_DTYPES.
+
+    The categorical columns are dictionary-encoded in Arrow, so their strings
+    are never converted to Python objects one row at a time. The integer
+    columns with NULLs are float32 columns, with NaNs.
+
+    Args:
+      table: (pyarrow.Table) table read from BigQuery.
 
     Returns:
       pandas.DataFrame
     """
 
-    query = metadata.BASE_QUERY.format(table=full_table_path)
-    limit = ' LIMIT {}'.format(num_samples) if num_samples else ''
-    query += limit
+    dtypes = {name: dtype for name, dtype in metadata.CSV_COLUMN_DTYPES.items()
+              if name in table.column_names}
+    for name, dtype in dtypes.items():
+        if dtype == 'category':
+            table = table.set_column(table.column_names.index(name), name,
+                                     table.column(name).dictionary_encode())
+    data_df = table.to_pandas()
+    # Arrow converts the integer columns with NULLs to float64, with NaNs,
+    # which can't be cast to an integer dtype: they are cast to float32.
+    return data_df.astype({
+        name: ('float32' if dtype.startswith('int') and
+               table.column(name).null_count else dtype)
+        for name, dtype in dtypes.items() if dtype != 'category'})
+
+
+def read_df_from_bigquery(full_table_path, project_id=None, num_samples=None,
+                          sample_percentage=None, max_streams=None,
+                          client=None):
+    """Read data from BigQuery with the BigQuery Storage Read API.
+
+    The rows are streamed as Arrow record batches from several streams in
+    parallel. Only the columns of metadata.FEATURE_NAMES and
+    metadata.TARGET_NAME are read, and the sampling and
+    metadata.BIGQUERY_ROW_RESTRICTION are applied by BigQuery.
 
-    # Use "application default credentials"
-    # Use SQL syntax dialect
-    data_df = pd.read_gbq(query, project_id=project_id, dialect='standard')
+    Args:
+      full_table_path: (string) full path of the table containing training data
+        in the format of [project_id.dataset_name.table_name].
+      project_id: (string, Optional) Google Cloud project billed for the read.
+        Defaults to the project of the table.
+      num_samples: (int, Optional) Number of data samples to read. The streams
+        stop once they have read this number of rows.
+      sample_percentage: (float, Optional) Percentage of the rows of the table,
+        sampled randomly by BigQuery, to read.
+      max_streams: (int, Optional) Maximum number of streams read in parallel.
+        Defaults to the number of CPUs.
+      client: (bigquery_storage.BigQueryReadClient, Optional) Client of the
+        BigQuery Storage Read API, e.g. a fake one in tests.
+
+    Returns:
+      pandas.DataFrame
+    """
+
+    table_project, dataset_name, table_name = full_table_path.rsplit('.', 2)
+    if client is None:
+        client = bigquery_storage.BigQueryReadClient()
+
+    # An empty list of selected fields reads all the columns.
+    selected_fields = []
+    if metadata.FEATURE_NAMES is not None:
+        selected_fields = metadata.FEATURE_NAMES + [metadata.TARGET_NAME]
+    read_options = bigquery_storage.types.ReadSession.TableReadOptions(
+        selected_fields=selected_fields,
+        row_restriction=metadata.BIGQUERY_ROW_RESTRICTION)
+    if sample_percentage:
+        read_options.sample_percentage = sample_percentage
+
+    session = client.create_read_session(
+        parent='projects/{}'.format(project_id or table_project),
+        read_session=bigquery_storage.types.ReadSession(
+            table='projects/{}/datasets/{}/tables/{}'.format(
+                table_project, dataset_name, table_name),
+            data_format=bigquery_storage.types.DataFormat.ARROW,
+            read_options=read_options),
+        max_stream_count=max_streams or os.cpu_count())
+    schema = pa.ipc.read_schema(
+        pa.py_buffer(session.arrow_schema.serialized_schema))
+
+    lock = threading.Lock()
+    num_rows = [0]
+    enough_rows = threading.Event()
+
+    def read_stream(stream):
+        batches = []
+        for page in client.read_rows(stream.name).rows(session).pages:
+            if enough_rows.is_set():
+                break
+            batch = page.to_arrow()
+            batches.append(batch)
+            with lock:
+                num_rows[0] += batch.num_rows
+                if num_samples and num_rows[0] >= num_samples:
+                    enough_rows.set()
+        return batches
+
+    batches = []
+    if session.streams:
+        with futures.ThreadPoolExecutor(len(session.streams)) as executor:
+            for stream_batches in executor.map(read_stream, session.streams):
+                batches.extend(stream_batches)
+
+    table = pa.Table.from_batches(batches, schema=schema)
+    if num_samples:
+        table = table.slice(0, num_samples)
+    data_df = _arrow_table_to_df(table)
 
     return data_df
 
 
-def read_df_from_gcs(file_pattern):
+def _read_csv_file(filepath, engine):
+    """Read one CSV file with the dtypes of metadata.CSV_COLUMN_DTYPES.
+
+    Args:
+      filepath: (string) path of the file, local or on GCS.
+      engine: (string) pandas CSV parser engine, 'c' or 'pyarrow'.
+
+    Returns:
+      pandas.DataFrame
+    """
+
+    # Download the whole file first, in binary mode, so the downloads of the
+    # files don't wait for each other's parsing.
+    with tf.io.gfile.GFile(filepath, 'rb') as f:
+        data = io.BytesIO(f.read())
+
+    if metadata.CSV_COLUMNS is None:
+        return pd.read_csv(data, dtype=metadata.CSV_COLUMN_DTYPES,
+                           engine=engine)
+    return pd.read_csv(data, names=metadata.CSV_COLUMNS, header=None,
+                       dtype=metadata.CSV_COLUMN_DTYPES, engine=engine)
+
+
+def _concat_dataframes(df_list):
+    """Concatenate the DataFrames, keeping the categorical columns categorical.
+
+    pd.concat converts the categorical columns to object if their categories
+    differ between the DataFrames, so they are set to the union of the
+    categories first.
+
+    Args:
+      df_list: (List[pandas.DataFrame]) DataFrames with the same columns.
+
+    Returns:
+      pandas.DataFrame
+    """
+
+    if len(df_list) > 1:
+        for column in df_list[0].columns:
+            if isinstance(df_list[0][column].dtype, pd.CategoricalDtype):
+                categories = union_categoricals(
+                    [df[column] for df in df_list]).categories
+                for df in df_list:
+                    df[column] = df[column].cat.set_categories(categories)
+
+    return pd.concat(df_list, ignore_index=True, copy=False)
+
+
+def _cache_key(filepaths, stats):
+    """Hash the paths, sizes and modification times of the files, and the
+    metadata used to parse them, into the name of their cached DataFrame.
+
+    Args:
+      filepaths: (List[string]) paths of the files, in the order they are read.
+      stats: (List[tf.io.gfile.FileStatistics]) statistics of the files.
+
+    Returns:
+      string
+    """
+
+    key = hashlib.sha256()
+    for filepath, stat in zip(filepaths, stats):
+        key.update('{}\t{}\t{}\n'.format(
+            filepath, stat.length, stat.mtime_nsec).encode('utf-8'))
+    key.update(json.dumps([metadata.CSV_COLUMNS, metadata.CSV_COLUMN_DTYPES],
+                          sort_keys=True).encode('utf-8'))
+    return key.hexdigest()
+
+
+def _read_from_cache(cache_path):
+    """Read a cached DataFrame, memory-mapping its Feather file.
+
+    Args:
+      cache_path: (string) path of the Feather file.
+
+    Returns:
+      pandas.DataFrame, or None if the file isn't in the cache.
+    """
+
+    try:
+        # The modification time of the files orders them for LRU eviction.
+        os.utime(cache_path)
+        table = feather.read_table(cache_path, memory_map=True)
+    except FileNotFoundError:
+        return None
+    logging.info('Read the cached data %s', cache_path)
+    return table.to_pandas()
+
+
+def _write_to_cache(data_df, cache_path, max_cache_size_mb):
+    """Write a DataFrame to the cache, and evict the least recently used
+    DataFrames until the cache is smaller than max_cache_size_mb.
+
+    Args:
+      data_df: (pandas.DataFrame) DataFrame to cache.
+      cache_path: (string) path of the Feather file.
+      max_cache_size_mb: (int) maximum size of the cache directory, in MB.
+
+    Returns:
+      None
+    """
+
+    cache_dir = os.path.dirname(cache_path)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Uncompressed Feather files can be memory-mapped when they are read.
+    # Write to a temporary file first, so concurrent trials never read a
+    # partial file.
+    temp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+    feather.write_feather(data_df, temp_path, compression='uncompressed')
+    os.replace(temp_path, cache_path)
+
+    entries = []
+    for file_name in os.listdir(cache_dir):
+        if file_name.endswith('.feather'):
+            path = os.path.join(cache_dir, file_name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    cache_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if cache_size <= max_cache_size_mb * 1024 * 1024:
+            break
+        logging.info('Evicting the cached data %s', path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        cache_size -= size
+
+
+def read_df_from_gcs(file_pattern, engine='c', num_threads=None,
+                     cache_dir=None, max_cache_size_mb=10240):
     """Read data from Google Cloud Storage, split into train and validation sets.
 
     Assume that the data on GCS is in csv format without header.
     The column names will be provided through metadata
 
+    The files are downloaded and parsed concurrently in a thread pool, with
+    the dtypes of metadata.CSV_COLUMN_DTYPES, and concatenated once.
+
     Args:
       file_pattern: (string) pattern of the files containing training data.
       For example: [gs://bucket/folder_name/prefix]
+      engine: (string, Optional) pandas CSV parser engine, 'c' or 'pyarrow'.
+        The 'pyarrow' engine requires pyarrow, and parses each file with
+        multiple threads.
+      num_threads: (int, Optional) Number of files read concurrently.
+        Defaults to the default of concurrent.futures.ThreadPoolExecutor.
+      cache_dir: (string, Optional) Local directory caching the parsed
+        DataFrames as Feather files, keyed on the paths, sizes and
+        modification times of the files. If the files were already read, the
+        cached DataFrame is memory-mapped instead of parsing the files.
+      max_cache_size_mb: (int, Optional) Maximum size of cache_dir, in MB.
+        The least recently used DataFrames are evicted first.
 
     Returns:
       pandas.DataFrame
     """
 
-    # Download the files to local /tmp/ folder
-    df_list = []
+    filepaths = tf.io.gfile.glob(file_pattern)
+    if not filepaths:
+        raise ValueError('No files match {}'.format(file_pattern))
 
-    for filepath in tf.io.gfile.glob(file_pattern):
-        with tf.io.gfile.GFile(filepath, 'r') as f:
-            if metadata.CSV_COLUMNS is None:
-                df_list.append(pd.read_csv(f))
-            else:
-                df_list.append(pd.read_csv(f, names=metadata.CSV_COLUMNS,
-                                           header=None))
+    with futures.ThreadPoolExecutor(num_threads) as executor:
+        if cache_dir:
+            stats = list(executor.map(tf.io.gfile.stat, filepaths))
+            cache_path = os.path.join(
+                cache_dir, _cache_key(filepaths, stats) + '.feather')
+            data_df = _read_from_cache(cache_path)
+            if data_df is not None:
+                return data_df
+
+        df_list = list(executor.map(
+            lambda filepath: _read_csv_file(filepath, engine), filepaths))
 
-    data_df = pd.concat(df_list)
+    data_df = _concat_dataframes(df_list)
+
+    if cache_dir:
+        _write_to_cache(data_df, cache_path, max_cache_size_mb)
 
     return data_df
 
 
+def read_df_chunks_from_gcs(file_pattern, chunk_size):
+    """Read data from Google Cloud Storage, one chunk of rows at a time.
+
+    Only one chunk is held in memory, and only the columns of
+    metadata.FEATURE_NAMES and metadata.TARGET_NAME are read. CSV files are
+    parsed with the dtypes of metadata.CSV_COLUMN_DTYPES, and the files with
+    the .parquet extension are read as Parquet files.
+
+    Args:
+      file_pattern: (string) pattern of the files containing training data.
+      For example: [gs://bucket/folder_name/prefix]
+      chunk_size: (int) Number of rows of each chunk.
+
+    Yields:
+      pandas.DataFrame
+    """
+
+    filepaths = tf.io.gfile.glob(file_pattern)
+    if not filepaths:
+        raise ValueError('No files match {}'.format(file_pattern))
+
+    usecols = metadata.FEATURE_NAMES + [metadata.TARGET_NAME]
+
+    for filepath in filepaths:
+        # pandas wraps binary file objects in an io.TextIOWrapper, which GFile
+        # doesn't support, so the CSV files are opened in text mode.
+        mode = 'rb' if filepath.endswith('.parquet') else 'r'
+        with tf.io.gfile.GFile(filepath, mode) as f:
+            if filepath.endswith('.parquet'):
+                batches = parquet.ParquetFile(f).iter_batches(
+                    batch_size=chunk_size, columns=usecols)
+                reader = (batch.to_pandas() for batch in batches)
+            elif metadata.CSV_COLUMNS is None:
+                reader = pd.read_csv(f, dtype=metadata.CSV_COLUMN_DTYPES,
+                                     usecols=usecols, chunksize=chunk_size)
+            else:
+                reader = pd.read_csv(f, names=metadata.CSV_COLUMNS,
+                                     header=None,
+                                     dtype=metadata.CSV_COLUMN_DTYPES,
+                                     usecols=usecols, chunksize=chunk_size)
+            for chunk in reader:
+                yield chunk
+
+
+class DataFrameChunksIter(xgboost.DataIter):
+    """XGBoost data iterator streaming the chunks of read_df_chunks_from_gcs.
+
+    The rows of each chunk are assigned to the training or the validation
+    subset by a random generator, seeded again at the start of every pass
+    over the files: XGBoost reads the files several times, and the training
+    and validation iterators must see the same split.
+    """
+
+    def __init__(self, file_pattern, chunk_size, subset='train',
+                 test_size=0.2, seed=None, cache_prefix=None):
+        """
+        Args:
+          file_pattern: (string) pattern of the files containing training
+            data, CSV or Parquet.
+          chunk_size: (int) Number of rows read at once.
+          subset: (string) 'train' or 'validation', the rows of each chunk to
+            stream.
+          test_size: (float) fraction of the rows in the validation subset.
+          seed: (int, Optional) seed of the split of the rows.
+          cache_prefix: (string, Optional) prefix of the files caching the
+            pages of an external memory xgboost.DMatrix.
+        """
+        if subset not in ('train', 'validation'):
+            raise ValueError('Unknown subset: %s' % subset)
+        self._file_pattern = file_pattern
+        self._chunk_size = chunk_size
+        self._subset = subset
+        self._test_size = test_size
+        self._seed = seed
+        self._chunks = None
+        self._rng = None
+        super(DataFrameChunksIter, self).__init__(cache_prefix=cache_prefix)
+
+    def reset(self):
+        self._chunks = None
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = read_df_chunks_from_gcs(self._file_pattern,
+                                                   self._chunk_size)
+            self._rng = np.random.RandomState(self._seed)
+        for chunk in self._chunks:
+            validation = self._rng.random_sample(len(chunk)) < self._test_size
+            if self._subset == 'train':
+                chunk = chunk[~validation]
+            else:
+                chunk = chunk[validation]
+            if len(chunk):
+                input_data(
+                    data=chunk[metadata.FEATURE_NAMES].to_numpy(np.float32),
+                    label=chunk[metadata.TARGET_NAME].to_numpy())
+                return 1
+        return 0
+
+
+class HypertuneCallback(xgboost.callback.TrainingCallback):
+    """Reports the accuracy on a validation set to hypertune after every
+    boosting round, as the intermediate steps of the trial.
+
+    The error metric of the validation set must be evaluated, e.g. with
+    eval_metric='error'.
+    """
+
+    def __init__(self, data_name, metric_tag):
+        """
+        Args:
+          data_name: (string) name of the validation set in the evaluation
+            log, e.g. 'validation_0' for the first eval_set of fit.
+          metric_tag: (string) hyperparameter_metric_tag of the accuracy.
+        """
+        self._data_name = data_name
+        self._metric_tag = metric_tag
+        self._hpt = hypertune.HyperTune()
+        super(HypertuneCallback, self).__init__()
+
+    def after_iteration(self, model, epoch, evals_log):
+        error = evals_log[self._data_name]['error'][-1]
+        self._hpt.report_hyperparameter_tuning_metric(
+            hyperparameter_metric_tag=self._metric_tag,
+            metric_value=1. - error,
+            global_step=epoch)
+        # Never stop the training, the early stopping callback does it.
+        return False
+
+
 def copy_file(old_path, new_path):
     """Copy the file from old_path to new_path
     The paths can be local or on GCS
@@ -115,43 +609,279 @@ def copy_file(old_path, new_path):
       None
     """
 
-    # Make sure the local nested directory already exists:
-    out_dir = ntpath.split(new_path)[0]
-    if not (out_dir.startswith('gs://') and os.path.exists(out_dir)):
-        os.makedirs(out_dir)
+    # Make sure the nested directory already exists:
+    out_dir = os.path.dirname(new_path)
+    if out_dir and not tf.io.gfile.exists(out_dir):
+        tf.io.gfile.makedirs(out_dir)
 
     tf.io.gfile.copy(old_path, new_path, overwrite=True)
 
 
-def save_model(estimator, output_path, how='pickle'):
-    temp_file = '/tmp/modelfile'
-    if how == 'pickle':
-        pickle.dump(estimator, open(temp_file, 'w'))
-    elif how == 'pickle':
-        joblib.dump(estimator, open(temp_file, 'w'))
-    elif how == 'bst':
-        estimator.save_model(temp_file)
-    else:
-        raise Exception('Unknown method for saving: %s' % how)
+# The file extensions of the model formats of save_model. 'bst' is the
+# legacy binary format of XGBoost, 'json' and 'ubj' are its JSON and
+# UBJSON (binary JSON) formats.
+MODEL_EXTENSIONS = {
+    'bst': '.bst',
+    'json': '.json',
+    'ubj': '.ubj',
+    'joblib': '.joblib',
+    'pickle': '.pkl',
+}
+
+
+# The suffix of the manifests of the models saved by save_model.
+MANIFEST_SUFFIX = '.manifest.json'
+
+# The raw formats of Booster.save_raw of the model formats of the booster.
+# 'deprecated' is the legacy binary format of XGBoost.
+_RAW_FORMATS = {'bst': 'deprecated', 'json': 'json', 'ubj': 'ubj'}
+
+# The size of the chunks of the resumable uploads of save_model to Google
+# Cloud Storage, a multiple of 256 KiB. One chunk is held in memory.
+UPLOAD_CHUNK_SIZE = 32 * 1024 * 1024
+
+
+class _ChecksumWriter(object):
+    """Binary file object computing the SHA-256 checksum and the size of the
+    data written to the underlying file object."""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        if not isinstance(data, (bytes, bytearray)):
+            data = bytes(data)
+        self._fileobj.write(data)
+        self.sha256.update(data)
+        self.size += len(data)
+        return len(data)
 
-    copy_file(temp_file, output_path)
+    def tell(self):
+        return self.size
 
+    def flush(self):
+        try:
+            self._fileobj.flush()
+        except io.UnsupportedOperation:
+            # The uploads to Google Cloud Storage are only flushed when they
+            # are closed.
+            pass
 
-def dump_object(object_to_dump, output_path):
-    """Pickle the object and save to the output_path.
+
+@contextlib.contextmanager
+def _atomic_writer(output_path):
+    """Write a file, local or on Google Cloud Storage, atomically.
+
+    The data is streamed to a temporary file with a unique name next to
+    output_path, which is renamed to output_path once it is complete. On
+    Google Cloud Storage, the temporary object is written with a resumable
+    upload, holding one chunk of UPLOAD_CHUNK_SIZE bytes in memory instead
+    of staging the whole file on the local disk, and the rename is a copy
+    within the bucket. The readers of output_path, and the other writers,
+    never see a partially written file.
+
+    Args:
+      output_path: (string) output path which can be Google Cloud Storage
+
+    Yields:
+      _ChecksumWriter, the binary file object to write to
+    """
+
+    if output_path.startswith('gs://'):
+        bucket_name, blob_name = output_path[len('gs://'):].split('/', 1)
+        bucket = storage.Client().bucket(bucket_name)
+        temp_blob = bucket.blob(
+            '{}.tmp-{}'.format(blob_name, uuid.uuid4().hex))
+        try:
+            with temp_blob.open('wb', chunk_size=UPLOAD_CHUNK_SIZE) as f:
+                yield _ChecksumWriter(f)
+            bucket.copy_blob(temp_blob, bucket, blob_name)
+        finally:
+            try:
+                temp_blob.delete()
+            except exceptions.NotFound:
+                pass
+        return
+
+    out_dir = os.path.dirname(output_path)
+    if out_dir and not tf.io.gfile.exists(out_dir):
+        tf.io.gfile.makedirs(out_dir)
+
+    temp_path = '{}.tmp-{}'.format(output_path, uuid.uuid4().hex)
+    try:
+        with tf.io.gfile.GFile(temp_path, 'wb') as f:
+            yield _ChecksumWriter(f)
+        tf.io.gfile.rename(temp_path, output_path, overwrite=True)
+    except BaseException:
+        if tf.io.gfile.exists(temp_path):
+            tf.io.gfile.remove(temp_path)
+        raise
+
+
+def save_model(estimator, output_path, how='bst', compression=None):
+    """Save the model to the output_path, with a manifest.
+
+    The model is serialized straight to output_path, through a temporary
+    file renamed once it is complete, so concurrent trials writing to the
+    same path never clobber each other. The format, the size and the
+    SHA-256 checksum of the model are written to the manifest
+    output_path + MANIFEST_SUFFIX, as JSON.
 
     Args:
-      object_to_dump: Python object to be pickled
+      estimator: (xgboost.XGBModel or xgboost.Booster) the trained model
+      output_path: (string) output path which can be Google Cloud Storage
+      how: (string) One of MODEL_EXTENSIONS. The 'bst', 'json' and 'ubj'
+        formats only save the booster, with XGBoost's save_raw. The
+        'joblib' and 'pickle' formats save the whole Python object.
+      compression: (string, Optional) One of COMPRESSIONS, for the 'joblib'
+        format.
+
+    Returns:
+      dict, the manifest of the model
+    """
+
+    if how not in MODEL_EXTENSIONS:
+        raise ValueError('Unknown method for saving: %s' % how)
+
+    with _atomic_writer(output_path) as f:
+        if how == 'joblib':
+            compress = 0
+            if compression and compression != 'none':
+                compress = (compression, 3)
+            joblib.dump(estimator, f, compress=compress)
+        elif how == 'pickle':
+            pickle.dump(estimator, f, protocol=pickle.HIGHEST_PROTOCOL)
+        else:
+            booster = estimator
+            if hasattr(estimator, 'get_booster'):
+                booster = estimator.get_booster()
+            f.write(booster.save_raw(raw_format=_RAW_FORMATS[how]))
+
+    manifest = {
+        'file': os.path.basename(output_path),
+        'format': how,
+        'compression': compression if how == 'joblib' else None,
+        'size': f.size,
+        'sha256': f.sha256.hexdigest(),
+        'xgboost_version': xgboost.__version__,
+    }
+    with _atomic_writer(output_path + MANIFEST_SUFFIX) as manifest_file:
+        manifest_file.write(json.dumps(manifest, indent=2,
+                                       sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def save_flat_trees(flat_trees, output_path):
+    """Save flattened trees to the output_path, as a .npz file.
+
+    Args:
+      flat_trees: (flat_trees.FlatTrees) the flattened trees of a model
       output_path: (string) output path which can be Google Cloud Storage
 
     Returns:
       None
     """
 
-    if not tf.io.gfile.exists(output_path):
-        tf.io.gfile.makedirs(os.path.dirname(output_path))
-    with tf.io.gfile.GFile(output_path, 'w') as wf:
-        joblib.dump(object_to_dump, wf)
+    temp_dir = tempfile.mkdtemp()
+    try:
+        temp_file = os.path.join(temp_dir, os.path.basename(output_path))
+        flat_trees.save(temp_file)
+        copy_file(temp_file, output_path)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def load_model(input_path, how='bst'):
+    """Load a model saved by save_model.
+
+    Args:
+      input_path: (string) input path which can be Google Cloud Storage
+      how: (string) One of MODEL_EXTENSIONS, the format of the model.
+
+    Returns:
+      xgboost.XGBClassifier
+    """
+
+    if how not in MODEL_EXTENSIONS:
+        raise ValueError('Unknown method for loading: %s' % how)
+    if how == 'joblib':
+        return load_object(input_path)
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        temp_file = os.path.join(temp_dir, 'model' + MODEL_EXTENSIONS[how])
+        tf.io.gfile.copy(input_path, temp_file)
+        if how == 'pickle':
+            with open(temp_file, 'rb') as f:
+                return pickle.load(f)
+        estimator = xgboost.XGBClassifier()
+        estimator.load_model(temp_file)
+        return estimator
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def available_cpu_count():
+    """Count the CPUs that this process is allowed to use.
+
+    The count is the number of CPUs of the affinity mask of the process,
+    capped by the CPU quota of its cgroup (e.g. the CPU limit of its
+    container), so the parallel jobs don't oversubscribe the CPUs.
+
+    Returns:
+      int
+    """
+
+    if hasattr(os, 'sched_getaffinity'):
+        cpu_count = len(os.sched_getaffinity(0))
+    else:
+        cpu_count = os.cpu_count() or 1
+
+    quota, period = None, None
+    try:
+        # cgroup v2: "<quota> <period>", or "max <period>" without quota.
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            values = f.read().split()
+        if values[0] != 'max':
+            quota, period = int(values[0]), int(values[1])
+    except (IOError, ValueError, IndexError):
+        try:
+            # cgroup v1: a quota of -1 means no quota.
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+                quota = int(f.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+                period = int(f.read())
+        except (IOError, ValueError):
+            pass
+
+    if quota is not None and quota > 0 and period:
+        cpu_count = min(cpu_count, max(1, int(math.ceil(quota / period))))
+    return cpu_count
+
+
+def load_object(input_path, mmap_mode=None):
+    """Load an object saved with joblib, e.g. by save_model.
+
+    Args:
+      input_path: (string) input path which can be Google Cloud Storage
+      mmap_mode: (string, Optional) 'r' to memory-map the numpy arrays of an
+        uncompressed object instead of reading them in memory. The arrays of
+        a compressed object are always read in memory.
+
+    Returns:
+      The loaded object.
+    """
+
+    if input_path.startswith('gs://'):
+        # Only local files can be memory-mapped. The local copy is kept as
+        # long as the process runs, as the arrays may be mapped to it.
+        local_path = os.path.join(tempfile.mkdtemp(),
+                                  os.path.basename(input_path))
+        tf.io.gfile.copy(input_path, local_path)
+        input_path = local_path
+    return joblib.load(input_path, mmap_mode=mmap_mode)
 
 
 def boolean_mask(columns, target_columns):